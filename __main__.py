@@ -0,0 +1,129 @@
+import argparse
+import glob
+import os
+import sys
+# Modules of the repo import each other by name, also when run as python -m from the parent directory.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Command line of the repo, run as python <repo directory> <command>. Commands import what they need when they run.
+
+
+def adapt(args):
+    import packetAdaptation
+    if args.chunked:
+        packetAdaptation.chunkedAdaptation(args.seed, args.chunk_size)
+    else:
+        packetAdaptation.runAdaptation(args.seed, args.backend, args.force)
+
+
+def generate(args):
+    import packetAdaptation
+    config = dict(packetAdaptation.DEFAULT_SCENARIO)
+    overrides = {"nDestinations": args.destinations, "option": args.option, "minVol": args.min_vol,
+                 "minDim": args.min_dim, "minWeight": args.min_weight, "containerVolume": args.container_volume,
+                 "containers": args.containers, "weightRatioBounds": args.weight_ratio_bounds,
+                 "volRatioBounds": args.vol_ratio_bounds, "adrDist": args.adr_dist, "priorityDist": args.priority_dist,
+                 "subgroupsDist": args.subgroups_dist}
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    if config["option"] == 1 and args.subgroups_dist is None:
+        # Mediamarkt packets are never part of a subgroup with other packets.
+        config["subgroupsDist"] = [1, 0]
+    if args.count == 1 and args.round is None:
+        # A single scenario is generated in this process, with the seed as given.
+        if args.workers is not None:
+            raise SystemExit("Error: --workers only applies to batches of scenarios, with --count or --round.")
+        packetAdaptation.scenarioGeneration(seed=args.seed, keepDataset=not args.descriptions_only,
+                                            datasetFormat=args.format, **config)
+    else:
+        results = packetAdaptation.generateScenarios([config] * args.count, args.workers, args.seed, args.round,
+                                                     not args.descriptions_only, args.format)
+        print(str(len([r for r in results if r is not None])) + " scenarios generated.")
+
+
+def describe(args):
+    from description import describeDatasets
+    paths = sorted(set(p for pattern in args.patterns for p in glob.glob(pattern)))
+    summaryTable = describeDatasets(paths, summaryPath=args.summary)
+    if args.summary is None:
+        print(summaryTable.to_string(index=False))
+
+
+def catalogue(args):
+    from catalogue import ScenarioCatalogue
+    import packetAdaptation
+    with ScenarioCatalogue(packetAdaptation.scenariosPath) as scenarioCatalogue:
+        if args.refresh:
+            print(scenarioCatalogue.refresh())
+        for path in scenarioCatalogue.datasetPaths(args.where):
+            print(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="packets", description="Packets data processing.")
+    parser.add_argument("--trace", default=None,
+                        help="write a JSON trace of the time, memory and counts of every step there (file or directory).")
+    parser.add_argument("--no-trace-memory", action="store_true", help="trace without tracemalloc, tracing is cheaper but without peak memory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("adapt", help="adapt the scraped data into the reference datasets.")
+    command.add_argument("--seed", type=int, default=None)
+    command.add_argument("--backend", choices=["json", "pkt", "parquet"], default="json")
+    command.add_argument("--force", action="store_true", help="adapt every stage from scratch.")
+    command.add_argument("--chunked", action="store_true",
+                         help="stream the data in chunks of records, with bounded memory, JSON only.")
+    command.add_argument("--chunk-size", type=int, default=50000)
+    command.set_defaults(run=adapt)
+
+    command = commands.add_parser("generate", help="generate scenarios, by default the former import-time one.")
+    command.add_argument("--count", type=int, default=1)
+    command.add_argument("--destinations", type=int, default=None)
+    command.add_argument("--option", type=int, choices=[0, 1, 2], default=None,
+                         help="reference data: 0 mixed, 1 mediamarkt, 2 ikea.")
+    command.add_argument("--min-vol", type=float, default=None)
+    command.add_argument("--min-dim", type=float, default=None)
+    command.add_argument("--min-weight", type=float, default=None)
+    command.add_argument("--container-volume", type=float, default=None)
+    command.add_argument("--containers", nargs="+", default=None,
+                         help="container types of the scenario, one per container, e.g. trailer container20.")
+    command.add_argument("--weight-ratio-bounds", nargs=2, type=float, default=None,
+                         help="bounds of the weight ratio of each container. Defaults to 0 1.")
+    command.add_argument("--vol-ratio-bounds", nargs=2, type=float, default=None,
+                         help="bounds of the volume ratio between the scenario and its containers.")
+    command.add_argument("--adr-dist", nargs=2, type=float, default=None,
+                         help="weights of the packets without and with dangerous goods.")
+    command.add_argument("--priority-dist", nargs="+", type=float, default=None,
+                         help="weight of each priority level, from the lowest.")
+    command.add_argument("--subgroups-dist", nargs=2, type=float, default=None,
+                         help="weights of the single packet and multi packet subgroups. Defaults to 1 0 with --option 1.")
+    command.add_argument("--seed", type=int, default=None)
+    command.add_argument("--round", default=None, help="round subdirectory of a batch.")
+    command.add_argument("--workers", type=int, default=None)
+    command.add_argument("--format", choices=["json", "pkt", "parquet"], default="json")
+    command.add_argument("--descriptions-only", action="store_true")
+    command.set_defaults(run=generate)
+
+    command = commands.add_parser("describe", help="describe scenario datasets in a single summary table.")
+    command.add_argument("patterns", nargs="+", help="globs of the datasets.")
+    command.add_argument("--summary", default=None, help="writes the table there (.csv or JSON) instead of printing it.")
+    command.set_defaults(run=describe)
+
+    command = commands.add_parser("catalogue", help="print the dataset paths of the catalogued scenarios.")
+    command.add_argument("--refresh", action="store_true", help="synchronize the catalogue with the scenarios first.")
+    command.add_argument("--where", default=None, help='SQL condition, e.g. "option = \'m\' AND perc_prio > 0.05".')
+    command.set_defaults(run=catalogue)
+
+    args = parser.parse_args(argv)
+    if args.trace is None:
+        args.run(args)
+        return
+    import instrumentation
+    instrumentation.startTrace(args.trace, not args.no_trace_memory)
+    try:
+        with instrumentation.span(args.command):
+            args.run(args)
+    finally:
+        print("Trace written to " + instrumentation.stopTrace())
+
+
+if __name__ == "__main__":
+    main()
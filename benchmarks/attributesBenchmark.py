@@ -0,0 +1,52 @@
+import argparse
+import os
+import random
+import sys
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from generator import drawSubgroupAttributes  # noqa: E402
+from benchmarkUtils import syntheticSubgroups, timeIt  # noqa: E402
+
+
+def rowwiseAssignment(data, nDestinations, adrDist, priorityDist):
+    # Former generator implementation, one lambda per group and attribute.
+    destinations = list(range(nDestinations))
+    data["dstCode"] = data.groupby("subgroupId")["id"].transform(
+        lambda x: random.choice(destinations))
+    data["priority"] = data.groupby("subgroupId")["id"].transform(
+        lambda x: random.choices([0, 1], priorityDist)[0])
+    data["ADR"] = data.groupby("subgroupId")["id"].transform(
+        lambda x: random.choices([0, 1], adrDist)[0])
+    return data
+
+
+def vectorizedAssignment(data, nDestinations, adrDist, priorityDist, attributeDists=None):
+    subgroupCodes, subgroups = pd.factorize(data["subgroupId"])
+    for column, values in drawSubgroupAttributes(len(subgroups), nDestinations, adrDist, priorityDist, np.random.default_rng(0), attributeDists).items():
+        data[column] = values[subgroupCodes]
+    return data
+
+
+def benchmark(sizes, rowwiseLimit):
+    print(f"{'packets':>10} {'row-wise (s)':>14} {'vectorized (s)':>16} {'packets/s':>12} {'multi-level (s)':>17}")
+    for n in sizes:
+        data = syntheticSubgroups(n)
+        vectorized, _ = timeIt(lambda: vectorizedAssignment(
+            data.copy(), 4, [1, 0], [0.94, 0.06]))
+        # Weighted destinations, three priority levels and an extra attribute.
+        multiLevel, _ = timeIt(lambda: vectorizedAssignment(data.copy(), [0.4, 0.3, 0.2, 0.1], [0.99, 0.01], [
+                            0.9, 0.07, 0.03], {"temperature": {"ambient": 0.8, "chilled": 0.15, "frozen": 0.05}}))
+        rowwise = f"{timeIt(lambda: rowwiseAssignment(data.copy(), 4, [1, 0], [0.94, 0.06]))[0]:.3f}" if n <= rowwiseLimit else "skipped"
+        print(f"{n:>10} {rowwise:>14} {vectorized:>16.3f} {n / vectorized:>12.0f} {multiLevel:>17.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Subgroup level attribute assignment, groupby lambdas against one draw per subgroup.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    parser.add_argument("--rowwise-limit", type=int, default=1000000,
+                        help="largest size for which the (slow) groupby lambdas are timed.")
+    args = parser.parse_args()
+    benchmark(args.sizes, args.rowwise_limit)
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+from functools import lru_cache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lazy import lazyImport  # noqa: E402
+np = lazyImport("numpy")
+gen = lazyImport("generator")
+pa = lazyImport("packetAdaptation")
+sc = lazyImport("syntheticCatalogue")
+
+# Timing and synthetic data shared by the benchmarks. Every dataset is derived from the synthetic catalogues of
+# syntheticCatalogue.py, so that the benchmarks measure packets with the spread of the scraped ones, and is built from a
+# seed so that the former and the current implementations of a benchmark get the same data. The data modules are
+# imported lazily, the scraper benchmarks only use timeIt.
+DIMENSIONS = ["width", "height", "length"]
+
+
+def timeIt(function, repeat=1):
+    """
+    Mean wall time of calling function repeat times.
+
+    Returns:
+        [float]: seconds per call.
+        [object]: result of the last call.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+@lru_cache(maxsize=1)
+def catalogueModel():
+    return sc.fitCatalogueModel()
+
+
+def syntheticPackets(n, seed=0):
+    """Dimensions, in cm, of the packets of a synthetic Mediamarkt catalogue.
+    """
+    return sc.syntheticCatalogue("mediamarkt", n, catalogueModel(), seed)[DIMENSIONS]
+
+
+def syntheticSubgroups(n, seed=0):
+    """Packet ids grouped in the subgroups of a synthetic Ikea catalogue.
+    """
+    return sc.syntheticCatalogue("ikea", n, catalogueModel(), seed)[["subgroupId"]].assign(id=np.arange(n))
+
+
+def syntheticReference(n, seed=0):
+    """Adapted Ikea packets with orientation constraints, as the reference datasets of the scenarios.
+    """
+    rng = np.random.default_rng(seed)
+    return gen.assignIDs(pa.adaptIkea(sc.syntheticCatalogue("ikea", n, catalogueModel(), rng), rng)[1].reset_index(drop=True))
+
+
+def syntheticScenario(n, seed=0):
+    """Scenario dataset of n packets generated out of a synthetic reference, without filtering out the small ones.
+    """
+    return gen.generator(syntheticReference(n, seed), 4, [0.99, 0.01], [0.94, 0.06], minVol=0, minWeight=0, minDim=0,
+                         rng=seed)
+
+
+@lru_cache(maxsize=1)
+def catalogueVocabulary():
+    """Distinct space-separated words of the names and descriptions of the Mediamarkt catalogue.
+    """
+    words = set(w for text in catalogueModel()["texts"].ravel() if isinstance(text, str) for w in text.split(" "))
+    return sorted(words - {""})
+
+
+def syntheticTexts(n, seed=0):
+    """Product names of a synthetic Mediamarkt catalogue.
+    """
+    return sc.syntheticCatalogue("mediamarkt", n, catalogueModel(), seed)["name"].fillna("").astype(str)
@@ -0,0 +1,78 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from description import describeDatasets  # noqa: E402
+from storage import writeDataset  # noqa: E402
+from benchmarkUtils import syntheticScenario, timeIt  # noqa: E402
+
+
+def formerDescription(dataset, ID):
+    # Former datasetDescription, along with the tuple column its callers built.
+    dataset["dimensionUnique"] = dataset.apply(lambda x: tuple(
+        sorted([x["width"], x["height"], x["length"]], reverse=True)), 1)
+    return {"ID": ID,
+            "packets_product": len(dataset),
+            "orders_subgroups": dataset.groupby(["subgroupId"]).ngroups,
+            "unique_dim": dataset.groupby(["dimensionUnique"]).ngroups,
+            "unique_dim_weight": dataset.groupby(["dimensionUnique", "weight"]).ngroups,
+            "max_dim": dataset[["width", "height", "length"]].max().max(), "min_dim": dataset[["width", "height", "length"]].min().min(),
+            "max_w": dataset.weight.max(), "min_w": dataset.weight.min(),
+            "w_mean": round(dataset.weight.mean(), 2), "w_median": round(dataset.weight.median(), 2),
+            "w_std": round(dataset.weight.std(), 2), "t_weight": round(dataset.weight.sum(), 2),
+            "max_v": dataset.volume.max(), "min_v": dataset.volume.min(),
+            "v_mean": round(dataset.volume.mean(), 2), "v_median": round(dataset.volume.median(), 2),
+            "v_std": round(dataset.volume.std(), 2), "t_vol": round(dataset.volume.sum(), 2),
+            "n_dst": dataset.dstCode.unique().shape[0],
+            "n_prio": dataset[dataset["priority"] > 0].shape[0],
+            "n_frag": dataset[dataset["fragility"] == 1].shape[0],
+            "n_adr": dataset[dataset["ADR"] == 1].shape[0],
+            "n_only_item_sub": dataset[dataset["subgroupId"] == dataset["productId"]].shape[0],
+            "n_mult_item_sub": dataset[dataset["subgroupId"] != dataset["productId"]].shape[0],
+            "perc_mult": round(dataset[dataset["subgroupId"] != dataset["productId"]].shape[0]/len(dataset), 2),
+            "perc_unique": round(dataset.groupby(["dimensionUnique"]).ngroups/len(dataset), 2),
+            "perc_prio": round(dataset[dataset["priority"] > 0].shape[0]/len(dataset), 2),
+            }
+
+
+def benchmark(files, packets):
+    # Scenarios cut out of a single synthetic one, generating each of them would take longer than describing it.
+    scenarios = syntheticScenario(files * packets)
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(files):
+            data = scenarios.iloc[i * packets:(i + 1) * packets].reset_index(drop=True).assign(id=np.arange(packets))
+            path = writeDataset(data, os.path.join(directory, str(i) + "-scenario.json"))
+            writeDataset(data, path, "pkt")
+        paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+
+        def former():
+            descriptions = []
+            for path in paths:
+                with open(path, 'r') as f:
+                    descriptions.append(formerDescription(pd.DataFrame(json.load(f)), os.path.basename(path).split("-")[0]))
+            return pd.DataFrame(descriptions)
+        formerTime, formerTable = timeIt(former)
+        print(f"{files} datasets of {packets} packets")
+        print(f"{'former, json':>22}: {formerTime:.2f}s")
+        for backend in ["pkt", "json"]:
+            if backend == "json":
+                # Stale binary versions are ignored.
+                for path in glob.glob(os.path.join(directory, "*.pkt")):
+                    os.utime(path, (0, 0))
+            describeTime, table = timeIt(lambda: describeDatasets(paths))
+            assert np.allclose(table.drop(columns=["ID"]).to_numpy(float), formerTable.drop(columns=["ID"]).to_numpy(float))
+            print(f"{'describeDatasets, ' + backend:>22}: {describeTime:.2f}s, {formerTime / describeTime:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Batch description of scenario datasets, former per-file loop against describeDatasets.")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--packets", type=int, default=400)
+    args = parser.parse_args()
+    benchmark(args.files, args.packets)
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+import requests
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "scrapers"))
+from fetcher import FetchEngine  # noqa: E402
+from localServer import startServer  # noqa: E402
+from benchmarkUtils import timeIt  # noqa: E402
+
+
+def grouper(iterable, n, fillvalue=None):
+    args = [iter(iterable)] * n
+    return zip_longest(*args, fillvalue=fillvalue)
+
+
+def batchFetch(urls, concurrency):
+    # Former scrapers: a new pool and bare requests.get per batch, every batch waits for its slowest page.
+    fetched = 0
+    for urlsSlice in grouper(urls, concurrency, None):
+        urlsSlice = list(filter(lambda x: x is not None, urlsSlice))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            fetched += len(list(pool.map(requests.get, urlsSlice)))
+    return fetched
+
+
+def engineFetch(urls, concurrency):
+    with FetchEngine(maxInFlight=concurrency, maxPerHost=concurrency) as engine:
+        return sum(1 for _, response, _ in engine.fetchAll(urls) if response is not None)
+
+
+def benchmark(pages, concurrency, delay, slowDelay, slowShare):
+    server, baseUrl = startServer(
+        b"<html>" + b"x" * 50000 + b"</html>", delay, slowDelay, slowShare)
+    urls = [baseUrl + "p/" + str(i) for i in range(pages)]
+    print(f"{'engine':>8} {'pages':>7} {'time (s)':>10} {'pages/s':>9}")
+    try:
+        for name, function in [("batch", batchFetch), ("pooled", engineFetch)]:
+            elapsed, fetched = timeIt(lambda: function(urls, concurrency))
+            print(f"{name:>8} {fetched:>7} {elapsed:>10.2f} {fetched / elapsed:>9.0f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Product pages fetch against a local stand-in server, per-batch pools against the shared engine.")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--delay", type=float, default=0.01,
+                        help="mean latency of a page in seconds.")
+    parser.add_argument("--slow-delay", type=float, default=0.3,
+                        help="mean latency of a slow page in seconds.")
+    parser.add_argument("--slow-share", type=float, default=0.02,
+                        help="share of slow pages.")
+    args = parser.parse_args()
+    benchmark(args.pages, args.concurrency, args.delay,
+              args.slow_delay, args.slow_share)
@@ -0,0 +1,56 @@
+import argparse
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fragility import FragilityMatcher  # noqa: E402
+from benchmarkUtils import catalogueVocabulary, syntheticTexts, timeIt  # noqa: E402
+
+
+def rowwiseFragility(data, fragileWords, where="description"):
+    # Former assignFragility.
+    return data.apply(lambda x: 1 if any(list(
+        map(lambda y: y in fragileWords, x[where].split(" ")))) else 0, axis=1)
+
+
+def benchmark(sizes, keywordCounts, rowwiseLimit, phraseShare):
+    rng = np.random.default_rng(0)
+    # Keys drawn out of the words of the product names, so that some of them match.
+    vocabulary = catalogueVocabulary()
+    print(f"{'texts':>9} {'keywords':>9} {'row-wise (s)':>13} {'plain regex (s)':>16} {'compiled (s)':>13} "
+          f"{'compile (ms)':>13} {'speedup':>8}")
+    for keywords in keywordCounts:
+        fragileWords = list(rng.choice(vocabulary, keywords, replace=False))
+        # A share of the keys are phrases of two words, only found by the compiled matcher.
+        phrases = int(keywords * phraseShare)
+        fragileWords[:phrases] = [a + " " + b for a, b in zip(fragileWords[:phrases], rng.choice(vocabulary, phrases))]
+        compileTime, matcher = timeIt(lambda: FragilityMatcher(fragileWords))
+        plain = re.compile(r"(?<![^ ])(?:" + "|".join(map(re.escape, fragileWords)) + r")(?![^ ])")
+        for n in sizes:
+            data = pd.DataFrame({"description": syntheticTexts(n, rng)})
+            compiledTime, flags = timeIt(lambda: matcher.flags(data["description"]))
+            plainTime, plainFlags = timeIt(lambda: data["description"].str.contains(plain).astype(int))
+            assert (flags == plainFlags).all()
+            if n <= rowwiseLimit:
+                rowwiseTime, rowwise = timeIt(lambda: rowwiseFragility(data, fragileWords[phrases:]))
+                # Without phrases both classifiers agree, with them the compiled one can only find more.
+                assert (rowwise <= flags).all()
+                print(f"{n:>9} {keywords:>9} {rowwiseTime:>13.3f} {plainTime:>16.3f} {compiledTime:>13.3f} "
+                      f"{compileTime * 1000:>13.1f} {rowwiseTime / compiledTime:>7.1f}x")
+            else:
+                print(f"{n:>9} {keywords:>9} {'skipped':>13} {plainTime:>16.3f} {compiledTime:>13.3f} "
+                      f"{compileTime * 1000:>13.1f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fragility classification, row-wise token lookups against the compiled multi-pattern matcher.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--keywords", type=int, nargs="+", default=[10, 1000, 4000])
+    parser.add_argument("--rowwise-limit", type=int, default=10000,
+                        help="largest size for which the (slow) row-wise version is timed.")
+    parser.add_argument("--phrases", type=float, default=0.1, help="share of two-word keys.")
+    args = parser.parse_args()
+    benchmark(args.sizes, args.keywords, args.rowwise_limit, args.phrases)
@@ -0,0 +1,33 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from benchmarkUtils import timeIt
+
+repositoryPath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["storage", "generator", "description", "catalogue", "editFiles", "packetAdaptation"]
+
+
+def importTime(module, repeats):
+    """Median wall time, in ms, of importing a module in a fresh interpreter, minus the one of the interpreter alone.
+    """
+    def run(statement):
+        return timeIt(lambda: subprocess.run([sys.executable, "-c", statement], cwd=repositoryPath, check=True))[0]
+    times = [run("import " + module) - run("pass") for _ in range(repeats)]
+    return statistics.median(times) * 1000
+
+
+def benchmark(modules, repeats):
+    print(f"median of {repeats} fresh interpreters")
+    for module in ["pandas"] + modules:
+        print(f"{'import ' + module:>24}: {importTime(module, repeats):7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Startup cost of importing the modules of the repo against importing pandas.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeats", type=int, default=7)
+    args = parser.parse_args()
+    benchmark(args.modules, args.repeats)
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instrumentation  # noqa: E402
+from instrumentation import traced  # noqa: E402
+from generator import SubgroupIndex  # noqa: E402
+from packetAdaptation import buildScenario  # noqa: E402
+from description import datasetDescription  # noqa: E402
+from benchmarkUtils import syntheticReference  # noqa: E402
+
+
+def plain():
+    pass
+
+
+@traced()
+def decorated():
+    pass
+
+
+def scenarios(index, count):
+    for seed in range(count):
+        partition, _, _ = buildScenario(index.data, 4, minVol=0.001, minDim=5, minWeight=0.1, rng=seed, index=index)
+        datasetDescription(partition, str(seed))
+
+
+def benchmark(packets, count):
+    calls = 10**6
+    overhead = (timeit.timeit(decorated, number=calls) - timeit.timeit(plain, number=calls)) / calls
+    print(f"disabled traced call: {overhead * 10**9:.0f} ns more than a plain call")
+    index = SubgroupIndex(syntheticReference(packets))
+    scenarios(index, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        for label, memory in [("disabled", None), ("timers", False), ("timers and tracemalloc", True)]:
+            if memory is not None:
+                instrumentation.startTrace(directory, memory)
+            seconds = min(timeit.repeat(lambda: scenarios(index, count), number=1, repeat=3)) / count
+            if memory is not None:
+                spans = len(instrumentation.activeTrace.records) // 3 // count
+                instrumentation.stopTrace()
+            print(f"{label:>24}: {seconds * 1000:.2f} ms per scenario")
+    print(f"{spans} spans per scenario, {spans * overhead / seconds * 100:.4f}% of it while disabled")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cost of the instrumentation on scenario generation, disabled and enabled.")
+    parser.add_argument("--packets", type=int, default=50000, help="packets of the synthetic reference data.")
+    parser.add_argument("--count", type=int, default=20, help="scenarios per measure.")
+    args = parser.parse_args()
+    benchmark(args.packets, args.count)
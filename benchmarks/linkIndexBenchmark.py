@@ -0,0 +1,91 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "scrapers"))
+from linkIndex import LinkIndex  # noqa: E402
+from benchmarkUtils import timeIt  # noqa: E402
+
+
+def syntheticBatches(links, batchSize, outdatedShare, duplicateShare, rng):
+    """Parsed batches as the pipeline yields them. Some links are redirected to their section and some give the product of
+    another link, as products listed in several sections do.
+    """
+    for start in range(0, len(links), batchSize):
+        parsedSlice = []
+        for position in range(start, min(start + batchSize, len(links))):
+            link = links[position]
+            if rng.random() < outdatedShare:
+                parsedSlice.append((link, "https://shop.example/section/" + str(position % 50), ("hash", []), None, {}))
+                continue
+            product = rng.randrange(position) if position and rng.random() < duplicateShare else position
+            packets = [{"productId": product, "subgroupId": product}] * (1 + product % 3)
+            parsedSlice.append((link, link, ("hash", packets), None, {}))
+        yield parsedSlice
+
+
+def formerBatch(parsedSlice, productsLinks):
+    # Former checks of the scrapers: list membership within the batch and, for batches with an outdated link, a filter
+    # of the whole list of links.
+    linksSlice = list(map(lambda x: x[0], parsedSlice))
+    wrongResponseLinks = list(
+        filter(lambda x: x is not None and x not in linksSlice, list(map(lambda y: y[1], parsedSlice))))
+    if len(wrongResponseLinks):
+        productsLinks = list(filter(lambda x: x not in wrongResponseLinks, productsLinks))
+    batchPackets = []
+    for link, url, result, err, validators in parsedSlice:
+        if url in wrongResponseLinks:
+            continue
+        batchPackets.extend(result[1])
+    return batchPackets
+
+
+def benchmark(nLinks, batchSize, formerBatches, outdatedShare, duplicateShare):
+    rng = random.Random(0)
+    links = ["https://shop.example/products/" + str(i) for i in range(nLinks)]
+    batches = list(syntheticBatches(links, batchSize, outdatedShare, duplicateShare, rng))
+    lastLink = links[-batchSize]
+    print(f"{nLinks} links in {len(batches)} batches of {batchSize}")
+
+    formerResume, position = timeIt(lambda: links.index(lastLink) if lastLink in links else None)
+    formerCheck, formerPackets = timeIt(lambda: sum(len(formerBatch(b, links)) for b in batches[:formerBatches]))
+    formerCheck = formerCheck / min(formerBatches, len(batches)) * len(batches)
+
+    with tempfile.TemporaryDirectory() as directory:
+        build, linkIndex = timeIt(lambda: LinkIndex(directory, links))
+        resume, indexPosition = timeIt(lambda: linkIndex.position(lastLink))
+        assert indexPosition == position
+
+        def checkBatches():
+            packets, scraped = 0, 0
+            for batch, parsedSlice in enumerate(batches):
+                outdated = linkIndex.redirected(parsedSlice)
+                for link, url, result, err, validators in parsedSlice:
+                    if link not in outdated:
+                        scraped += len(result[1])
+                        packets += len(linkIndex.newPackets(link, result[1]))
+                linkIndex.commit(batch + 1)
+            return packets, scraped
+        check, (packets, scraped) = timeIt(checkBatches)
+        currentLinks = linkIndex.currentLinks()
+
+    print(f"{'resume point':>28}: former {formerResume * 1000:.1f} ms, index {resume * 1000:.3f} ms "
+          f"(built once in {build * 1000:.0f} ms)")
+    print(f"{'checks of every batch':>28}: former {formerCheck:.1f} s (extrapolated from {formerBatches} batches, "
+          f"{formerPackets} packets), index {check:.2f} s with persistence, {formerCheck / check:.0f}x")
+    print(f"{'outdated links removed':>28}: {nLinks - len(currentLinks)}")
+    print(f"{'packets kept':>28}: {packets}, {scraped - packets} duplicates dropped from products listed several times")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Link and subgroup checks of the scrapers on a synthetic list of links, former list scans against LinkIndex.")
+    parser.add_argument("--links", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--former-batches", type=int, default=200)
+    parser.add_argument("--outdated-share", type=float, default=0.001)
+    parser.add_argument("--duplicate-share", type=float, default=0.05)
+    args = parser.parse_args()
+    benchmark(args.links, args.batch_size, args.former_batches, args.outdated_share, args.duplicate_share)
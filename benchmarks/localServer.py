@@ -0,0 +1,62 @@
+import hashlib
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the page of every path after a random latency, a share of the pages are slow. Pages carry an ETag and
+    conditional requests are answered with 304 Not Modified.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        delay = server.slowDelay if random.random() < server.slowShare else server.delay
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        page = server.page(self.path) if callable(server.page) else server.page
+        if page is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"' + hashlib.sha1(page).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def startServer(page=b"<html><body>product</body></html>", delay=0.01, slowDelay=0.2, slowShare=0.01):
+    """
+    Starts a local stand-in of the scraped sites on a free port, in a background thread.
+
+    Args:
+        page ([bytes], optional): body served for every path, or function from the path to its body (None for 404).
+        delay (float, optional): mean latency of a page in seconds. Defaults to 0.01.
+        slowDelay (float, optional): mean latency of a slow page in seconds. Defaults to 0.2.
+        slowShare (float, optional): share of slow pages. Defaults to 0.01.
+
+    Returns:
+        [tuple]: (server, base url), call server.shutdown() to stop it.
+    """
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    server.page, server.delay, server.slowDelay, server.slowShare = page, delay, slowDelay, slowShare
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:" + str(server.server_address[1]) + "/"
@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from orientations import assignOrientations, randomFeasibleOrientations, createRandomFeasibleOrientations, determineCurrentOrientation  # noqa: E402
+from benchmarkUtils import syntheticPackets, timeIt  # noqa: E402
+
+
+def benchmark(sizes, rowwiseLimit):
+    print(f"{'packets':>10} {'row-wise (s)':>14} {'vectorized (s)':>16} {'speedup':>9}")
+    for n in sizes:
+        data = syntheticPackets(n)
+        vectorized, _ = timeIt(lambda: randomFeasibleOrientations(
+            assignOrientations(data.copy())["or"], np.random.default_rng(0)))
+        if n <= rowwiseLimit:
+            def rowwise():
+                rowData = data.copy().apply(determineCurrentOrientation, 1)
+                rowData.apply(createRandomFeasibleOrientations, 1)
+            rowwiseTime, _ = timeIt(rowwise)
+            print(f"{n:>10} {rowwiseTime:>14.3f} {vectorized:>16.3f} {rowwiseTime / vectorized:>8.1f}x")
+        else:
+            print(f"{n:>10} {'skipped':>14} {vectorized:>16.3f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Orientation assignment, row-wise apply against the vectorized engine.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    parser.add_argument("--rowwise-limit", type=int, default=1000000,
+                        help="largest size for which the (slow) row-wise version is timed.")
+    args = parser.parse_args()
+    benchmark(args.sizes, args.rowwise_limit)
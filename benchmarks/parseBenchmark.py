@@ -0,0 +1,80 @@
+import argparse
+import html
+import json
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "scrapers"))
+import ikeaParser  # noqa: E402
+import mediamarktParser  # noqa: E402
+from fetcher import FetchEngine  # noqa: E402
+from pipeline import ScrapePipeline  # noqa: E402
+from localServer import startServer  # noqa: E402
+from benchmarkUtils import timeIt  # noqa: E402
+
+
+def filler(rows):
+    # Navigation, scripts and tables that surround the product data in the real pages.
+    return "".join(f'<div class="nav"><a href="/c/{i}">Category {i} &amp; more</a><span>text {i}</span></div>'
+                   f'<table><tr><td class="spec-line-name">Color</td><td class="spec-line-value">Negro {i}</td></tr></table>'
+                   f'<script>var x{i} = {{"a": {i}}};</script>' for i in range(rows))
+
+
+def ikeaPage(rows=600):
+    packages = [{"name": "TUFJORD", "typeName": "Upholstered bed frame", "articleNumber": {"value": "204.580.37"},
+                 "quantity": {"value": 1}, "measurements": [[]]}]
+    for i in range(2):
+        packages.append({"name": "TUFJORD", "typeName": "Bed part " + str(i), "articleNumber": {"value": "00" + str(i) + ".123.45"},
+                         "quantity": {"value": 2}, "measurements": [[{"label": "Width", "value": "24 cm"}, {"label": "Height", "value": "14 cm"},
+                                                                     {"label": "Length", "value": "213 cm"}, {"label": "Weight", "value": "20.41 kg"}]]})
+    props = {"productDetailsProps": {"accordionObject": {
+        "packaging": {"contentProps": {"packages": packages}}}}}
+    return ('<html><body>' + filler(rows) + '<div class="js-product-information-section range-revamp-product-information-section" '
+            'data-initial-props="' + html.escape(json.dumps(props)) + '"></div>' + filler(rows) + '</body></html>').encode()
+
+
+def mediamarktPage(rows=600):
+    product = {"id": 1438765, "title": "TV LED 55\" Samsung UE55TU7105, 4K", "type": "TV"}
+    script = ('var MRParams = { "total_quantity" : "0",\n "product" : ' + json.dumps(product) + ';')
+    specs = "".join(f'<tr><td class="spec-line-name">{name}</td><td class="spec-line-value">{value}</td></tr>'
+                    for name, value in [("Peso del embalaje", "17.6 kg"), ("Largo del embalaje", "1380 mm"),
+                                        ("Alto del embalaje", "84 cm"), ("Ancho embalado", "0.15 m")])
+    return ('<html><body>' + filler(rows) + '<script>' + script + '</script><table>' + specs + '</table>' + filler(rows) +
+            '</body></html>').encode()
+
+
+def parsers(repeat):
+    print(f"{'site':>11} {'page (KiB)':>11} {'soup (ms)':>10} {'targeted (ms)':>14} {'speedup':>8}")
+    for site, page, module in [("ikea", ikeaPage(), ikeaParser), ("mediamarkt", mediamarktPage(), mediamarktParser)]:
+        soupTime, soupResult = timeIt(
+            lambda: module.soupProductBuilder(page), max(1, repeat // 50))
+        targetedTime, targetedResult = timeIt(
+            lambda: module.productBuilder(page), repeat)
+        assert soupResult == targetedResult and targetedResult, site
+        print(f"{site:>11} {len(page) / 1024:>11.0f} {soupTime * 1000:>10.2f} {targetedTime * 1000:>14.3f} {soupTime / targetedTime:>7.0f}x")
+
+
+def pipeline(pages, workers):
+    server, baseUrl = startServer(mediamarktPage(), delay=0.005)
+    try:
+        for parse in [mediamarktParser.soupProductBuilder, mediamarktParser.productBuilder]:
+            with FetchEngine(maxInFlight=32) as engine:
+                scrapePipeline = ScrapePipeline(engine, parse, workers)
+                parsed = sum(1 for _, _, packet, _, _ in scrapePipeline.run(
+                    baseUrl + "p/" + str(i) for i in range(pages)) if packet is not None)
+            print(f"{parse.__name__}, {parsed} packets:\n" + scrapePipeline.report())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Product page parsing, full BeautifulSoup DOM against the targeted extraction, and the whole pipeline.")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=200,
+                        help="pages scraped from the local stand-in server.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parser processes. Defaults to the number of CPUs.")
+    args = parser.parse_args()
+    parsers(args.repeat)
+    pipeline(args.pages, args.workers)
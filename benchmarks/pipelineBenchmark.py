@@ -0,0 +1,473 @@
+import argparse
+import contextlib
+import functools
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import generator as gen  # noqa: E402
+import packetAdaptation as pa  # noqa: E402
+import storage  # noqa: E402
+from container import Container, CONTAINER_TYPES  # noqa: E402
+from syntheticCatalogue import syntheticCatalogue, writeCatalogue  # noqa: E402
+from benchmarkUtils import catalogueModel, timeIt  # noqa: E402
+
+# Times every public function of packetAdaptation and generator on synthetic catalogues of increasing size (see
+# syntheticCatalogue.py), both sources get the given number of rows. Each size works in its own temporary directory,
+# the dataset paths of packetAdaptation are pointed to it. A case whose time, extrapolated linearly from the previous
+# size, exceeds the budget is skipped, so that row-wise steps do not stall runs up to 1e7 rows.
+# Results can be saved as a baseline (benchmarks/baseline.json is the one of the repository, recorded with the numpy and
+# pandas of requirements.txt) and later runs compared against it, the exit status is 1 if a case got slower than the
+# tolerance allows.
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MODULES = [pa, gen]
+# Scenario config of the cases, containerVolume is scaled down for catalogues too small to fill the trailer.
+SCENARIO = dict(pa.DEFAULT_SCENARIO, option=0)
+
+
+class Catalogues:
+    """
+    Synthetic catalogues of a size and the datasets derived from them, built the first time a case needs them.
+
+    Args:
+        rows ([int]): rows of each source.
+        directory ([str]): directory of the datasets, with the layout of the repository.
+        model ([dict]): see syntheticCatalogue.fitCatalogueModel.
+        seed ([int]): seed of the catalogues and of every case.
+    """
+
+    def __init__(self, rows, directory, model, seed):
+        self.rows = rows
+        self.directory = directory
+        self.seed = seed
+        self.ikeaRaw = syntheticCatalogue("ikea", rows, model, [seed, 0])
+        self.mmRaw = syntheticCatalogue("mediamarkt", rows, model, [seed, 1])
+
+    def rng(self):
+        return np.random.default_rng(self.seed)
+
+    @functools.cached_property
+    def files(self):
+        # Scraped data.json of both sources, where the adaptation reads them.
+        for data, path, source in [(self.ikeaRaw, pa.ikeaPath, "ikea"), (self.mmRaw, pa.mmPath, "mediamarkt")]:
+            os.makedirs(path, exist_ok=True)
+            writeCatalogue(data, path + 'data.json', source)
+        return pa.ikeaPath + 'data.json', pa.mmPath + 'data.json'
+
+    @functools.cached_property
+    def ikeaRecords(self):
+        with open(self.files[0], 'r') as f:
+            return json.load(f)
+
+    @functools.cached_property
+    def ikeaAdapted(self):
+        return pa.adaptIkea(self.ikeaRaw.copy(), self.rng())
+
+    @functools.cached_property
+    def mmAdapted(self):
+        return pa.adaptMediamarkt(self.mmRaw.copy(), self.rng())
+
+    @functools.cached_property
+    def reference(self):
+        # Mixed dataset with orientation constraints, the default reference of the scenarios.
+        mixed = pa.mixData(self.mmAdapted[0], self.ikeaAdapted[1], pa.MIXED_PARAMETERS["minWeightOrientationConstraints"])
+        return gen.assignIDs(mixed.reset_index(drop=True))
+
+    @functools.cached_property
+    def index(self):
+        return gen.SubgroupIndex(self.reference)
+
+    @functools.cached_property
+    def scenario(self):
+        # Half of the volume left by the filters of the scenario at most.
+        filtered = self.index.filtered(SCENARIO["minVol"], SCENARIO["minWeight"], SCENARIO["minDim"])
+        return dict(SCENARIO, containerVolume=round(min(SCENARIO["containerVolume"], filtered.volume.sum() / 2), 2))
+
+    @functools.cached_property
+    def container(self):
+        # Trailer shortened to a third of the volume of the packets that fit inside it at most.
+        trailer = CONTAINER_TYPES["trailer"]
+        fitting = self.index.filtered(SCENARIO["minVol"], SCENARIO["minWeight"], SCENARIO["minDim"], trailer)
+        ratio = min(1, fitting.volume.sum() / 3 / trailer.volume)
+        return Container("benchmark", trailer.width, round(trailer.length * ratio), trailer.height, trailer.maxWeight * ratio)
+
+    @functools.cached_property
+    def partition(self):
+        config = dict(self.scenario)
+        config.pop("option")
+        return pa.buildScenario(self.reference, rng=self.seed, index=self.index, **config)
+
+    @functools.cached_property
+    def selection(self):
+        # Arguments of volumeTargetedSelection over the filtered subgroups, and the subgroups it selects.
+        index = self.index.filtered(SCENARIO["minVol"], SCENARIO["minWeight"], SCENARIO["minDim"])
+        available = index.available()
+        volume = self.scenario["containerVolume"]
+        arguments = (index.volume[available], index.onlyItem[available], SCENARIO["subgroupsDist"],
+                     SCENARIO["volRatioBounds"][0] * volume, SCENARIO["volRatioBounds"][1] * volume)
+        selected, _ = gen.volumeTargetedSelection(*arguments, rng=self.seed)
+        return arguments, index.weight[available], selected
+
+    @functools.cached_property
+    def delta(self):
+        # Refresh replacing 1% of the Ikea subgroups, as written by scrapers/responseCache.py.
+        subgroups = pd.unique(self.ikeaRaw["subgroupId"])
+        replaced = set(subgroups[:max(1, len(subgroups) // 100)].tolist())
+        path = os.path.join(self.directory, 'delta.json')
+        with open(path, 'w') as f:
+            json.dump({"replacedSubgroups": sorted(replaced),
+                       "packets": [r for r in self.ikeaRecords if r["subgroupId"] in replaced]}, f)
+        return path
+
+    @functools.cached_property
+    def changedIkeaFiles(self):
+        # Scraped Ikea data before and after changing the weight of 1% of the subgroups, for incremental runs.
+        records = [dict(r) for r in self.ikeaRecords]
+        for r in records[:max(1, len(records) // 100)]:
+            r["weight"] = str(float(r["weight"]) + 0.5)
+        changed = os.path.join(self.directory, 'ikea-changed.json')
+        original = os.path.join(self.directory, 'ikea-original.json')
+        with open(changed, 'w') as f:
+            json.dump(records, f)
+        shutil.copy(self.files[0], original)
+        return [changed, original]
+
+    @functools.cached_property
+    def scenarioPaths(self):
+        partition, volRatio, report = self.partition
+        return pa.writeScenario(partition, volRatio, 0, "benchmark", seed=self.seed, config=self.scenario,
+                                samplingReport=report)
+
+
+def redirectPaths(directory):
+    """
+    Points the dataset paths of packetAdaptation to directory, with the layout of the repository.
+    """
+    moves = {}
+    for name in ["ikeaPath", "mmPath", "mixedPath", "scenariosPath"]:
+        current = getattr(pa, name)
+        moves[current] = os.path.join(directory, os.path.basename(os.path.normpath(current))) + os.path.sep
+        setattr(pa, name, moves[current])
+
+    def moved(path):
+        for current, new in moves.items():
+            if path.startswith(current):
+                return new + path[len(current):]
+        return path
+    # Lists shared with MIXED_OUTPUTS, updated in place.
+    pa.IKEA_OUTPUTS[:] = map(moved, pa.IKEA_OUTPUTS)
+    pa.MEDIAMARKT_OUTPUTS[:] = map(moved, pa.MEDIAMARKT_OUTPUTS)
+    pa.MIXED_OUTPUTS[:] = [(moved(m), moved(mm), moved(i), w) for m, mm, i, w in pa.MIXED_OUTPUTS]
+
+
+# -------------- Cases ---------------------------------
+# The case of a public function gets the catalogues of a size, does the untimed setup and returns either the arguments
+# of a single call to the function (see arguments) or the call to time. Cases run in the order of CASES, later ones use
+# the datasets written by the adaptation cases.
+FILTERS = (SCENARIO["minVol"], SCENARIO["minWeight"], SCENARIO["minDim"])
+
+
+def arguments(*args, **kwargs):
+    return args, kwargs
+
+
+def scrapedStage(**kwargs):
+    # Stages reading the scraped data.json of both sources.
+    def prepare(c):
+        c.files
+        return arguments(c.seed, **kwargs)
+    return prepare
+
+
+def mixedDataAdaptationCase(c):
+    # Needs the datasets of both sources.
+    for path in pa.MEDIAMARKT_OUTPUTS + pa.IKEA_OUTPUTS:
+        if pa.fileSignature(path) is None:
+            raise RuntimeError("source datasets missing, run the mediamarktAdaptation and ikeaAdaptation cases")
+    return arguments()
+
+
+def adaptSourceCase(c):
+    # Incremental run of the Ikea stage, 1% of the subgroups changed since the last one.
+    changed, original = c.changedIkeaFiles
+    stage = ("ikea", pa.ikeaPath, pa.adaptIkea, pa.IKEA_PARAMETERS, pa.IKEA_OUTPUTS, c.seed, "json", False)
+    pa.adaptSource(*stage)
+    shutil.copy(changed, c.files[0])
+    c.changedIkeaFiles.reverse()
+    return arguments(*stage)
+
+
+def loadReferenceDataCase(c):
+    c.files
+    if pa.fileSignature(pa.referencePath(0)) is None:
+        pa.runAdaptation(c.seed)
+
+    def coldLoad():
+        # Every call parses the dataset, the cached reads are timed by loadReferenceDataCached.
+        storage.datasetCache.clear()
+        return pa.loadReferenceData(0)
+    return coldLoad
+
+
+def loadReferenceDataCachedCase(c):
+    loadReferenceDataCase(c)()
+    return arguments(0)
+
+
+def scenarioWorkerCase(c):
+    pa.initScenarioWorker({0: c.index})
+    return arguments(("benchmark", c.scenario, c.seed, None, True, "json"))
+
+
+def weightTargetedSwapsCase(c):
+    (volumes, onlyItem, _, minVolume, maxVolume), weights, selected = c.selection
+    # A window above the weight of the selection, so that swaps are needed.
+    weight = weights[selected].sum()
+    order = np.random.default_rng(c.seed).permutation(volumes.size)
+    return arguments(volumes, weights, onlyItem, order, selected, minVolume, maxVolume, 1.2 * weight, 1.3 * weight)
+
+
+def expectedRejectionAttemptsCase(c):
+    (volumes, onlyItem, _, minVolume, maxVolume), _, selected = c.selection
+    return arguments(volumes, onlyItem, selected, minVolume, maxVolume)
+
+
+def sampleContainerPartitionCase(c):
+    # Fresh index, the feasibility mask of the container is part of the cost.
+    return lambda: gen.sampleContainerPartition(gen.SubgroupIndex(c.reference), [c.container], SCENARIO["subgroupsDist"],
+                                                SCENARIO["volRatioBounds"], [0, 1], c.seed, None, *FILTERS)
+
+
+# Module to case name to the case, a (case name, function name) key times the function under another name.
+MODULE_CASES = {
+    pa: {
+        "cilindricalToBox": lambda c: arguments(c.ikeaRaw.copy()),
+        "volumeProcessor": lambda c: arguments(pa.cilindricalToBox(c.ikeaRaw.copy())),
+        "adaptIkea": lambda c: arguments(c.ikeaRaw.copy(), c.rng()),
+        "adaptMediamarkt": lambda c: arguments(c.mmRaw.copy(), c.rng()),
+        "cleanDensityMistakes": lambda c: arguments(c.mmAdapted[0].copy()),
+        "mixData": lambda c: arguments(c.mmAdapted[0].copy(), c.ikeaAdapted[1].copy(),
+                                       pa.MIXED_PARAMETERS["minWeightOrientationConstraints"]),
+        "fingerprint": lambda c: arguments([pa.ADAPTATION_VERSION, pa.MEDIAMARKT_PARAMETERS, c.seed, "json"]),
+        "subgroupFingerprints": lambda c: arguments(c.ikeaRecords),
+        "recordsToFrame": lambda c: arguments(c.ikeaRecords),
+        "writeAdapted": lambda c: arguments(c.ikeaAdapted[1].copy(), os.path.join(c.directory, 'adapted.json'), "json"),
+        "mediamarktAdaptation": scrapedStage(),
+        "ikeaAdaptation": scrapedStage(),
+        "readDelta": lambda c: arguments(c.delta),
+        "mixedDataAdaptation": mixedDataAdaptationCase,
+        "runAdaptation": scrapedStage(force=True),
+        "adaptSource": adaptSourceCase,
+        "fileSignature": lambda c: arguments(c.files[0]),
+        "readManifest": lambda c: arguments(pa.ikeaPath),
+        "adaptInChunks": lambda c: arguments(c.files[0], pa.adaptIkea, [os.path.join(c.directory, 'chunked-' + str(i) + '.json')
+                                                                       for i in range(len(pa.IKEA_OUTPUTS))], c.rng(), 50000),
+        "chunkedAdaptation": scrapedStage(),
+        "adjustVolRatio": lambda c: arguments([1, 1.1], 1.25, 1.2),
+        "referencePath": lambda c: arguments(0),
+        "loadReferenceData": loadReferenceDataCase,
+        ("loadReferenceDataCached", "loadReferenceData"): loadReferenceDataCachedCase,
+        "buildScenario": lambda c: arguments(c.reference, rng=c.seed, index=c.index,
+                                             **{k: v for k, v in c.scenario.items() if k != "option"}),
+        "writeScenario": lambda c: arguments(*c.partition[:2], 0, "benchmark", seed=c.seed, config=c.scenario,
+                                             samplingReport=c.partition[2]),
+        "fileHash": lambda c: arguments(pa.resolveDatasetPath(pa.referencePath(0))),
+        "catalogueScenarios": lambda c: arguments([c.scenarioPaths]),
+        "regenerateScenario": lambda c: arguments(c.scenarioPaths[1]),
+        "scenarioGeneration": lambda c: arguments(**c.scenario, seed=c.seed),
+        "newSeed": lambda c: arguments(),
+        "initScenarioWorker": lambda c: arguments({0: c.index}),
+        "scenarioWorker": scenarioWorkerCase,
+        "generateScenarios": lambda c: arguments([c.scenario] * 4, workers=1, seed=c.seed, roundName="benchmark"),
+    },
+    gen: {
+        "assignIDs": lambda c: arguments(c.reference.copy()),
+        "generator": lambda c: arguments(c.reference.copy(), 4, rng=c.seed),
+        "drawCategorical": lambda c: arguments([0.94, 0.06], len(c.index), c.seed),
+        "drawSubgroupAttributes": lambda c: arguments(len(c.index), 4, [1, 0], [0.94, 0.06], c.seed),
+        "packetFilterMask": lambda c: arguments(c.reference, *FILTERS),
+        "SubgroupIndex": lambda c: arguments(c.reference),
+        "getPartition": lambda c: arguments(c.reference, SCENARIO["subgroupsDist"], c.scenario["containerVolume"],
+                                            SCENARIO["volumeOffset"], rng=c.seed, index=c.index.filtered(*FILTERS)),
+        "volumeTargetedSelection": lambda c: arguments(*c.selection[0], rng=c.seed),
+        "weightTargetedSwaps": weightTargetedSwapsCase,
+        "expectedRejectionAttempts": expectedRejectionAttemptsCase,
+        "sampleVolumeTargetedPartition": lambda c: arguments(c.reference, SCENARIO["subgroupsDist"],
+                                                             c.scenario["containerVolume"], SCENARIO["volRatioBounds"],
+                                                             c.seed, c.index.filtered(*FILTERS)),
+        "sampleContainerPartition": sampleContainerPartitionCase,
+        "getStats": lambda c: arguments(c.partition[0]),
+        "dataFeasibleOrientationsTupleSerializer": lambda c: arguments(c.reference.copy()),
+    },
+}
+
+
+def preparedCall(function, prepare):
+    def prepareCall(c):
+        prepared = prepare(c)
+        if callable(prepared):
+            return prepared
+        args, kwargs = prepared
+        return lambda: function(*args, **kwargs)
+    return prepareCall
+
+
+# Qualified case name to the function of the catalogues returning the call to time.
+CASES = {module.__name__ + "." + (key if isinstance(key, str) else key[0]):
+         preparedCall(getattr(module, key if isinstance(key, str) else key[1]), prepare)
+         for module, cases in MODULE_CASES.items() for key, prepare in cases.items()}
+
+
+# -------------- Harness ---------------------------------
+
+
+def publicFunctions(module):
+    """
+    Public functions and classes defined in a module.
+    """
+    return [name for name, member in inspect.getmembers(module, lambda m: inspect.isfunction(m) or inspect.isclass(m))
+            if not name.startswith("_") and member.__module__ == module.__name__]
+
+
+def uncoveredFunctions():
+    return [module.__name__ + "." + name for module in MODULES for name in publicFunctions(module)
+            if module.__name__ + "." + name not in CASES]
+
+
+def measure(prepare, catalogues, repeat, budget):
+    """
+    Best time of the case out of repeat runs, a single run if it takes more than the budget divided by repeat.
+    """
+    best = None
+    for _ in range(repeat):
+        seconds, _ = timeIt(prepare(catalogues))
+        best = seconds if best is None else min(best, seconds)
+        if seconds * repeat > budget:
+            break
+    return best
+
+
+def run(sizes, names, repeat, budget, seed):
+    """
+    Times the cases at every size.
+
+    Returns:
+        [dict]: case name to size (as a string) to seconds.
+        [dict]: case name to size to the reason it was not timed.
+    """
+    model = catalogueModel()
+    results, skipped = {name: {} for name in names}, {name: {} for name in names}
+    last = {}
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            redirectPaths(directory)
+            seconds, catalogues = timeIt(lambda: Catalogues(rows, directory, model, seed))
+            print(f"{rows} rows per source, synthesised in {seconds:.1f} s")
+            for name in names:
+                if name in last and last[name][1] * rows / last[name][0] > budget:
+                    skipped[name][str(rows)] = "over budget"
+                    continue
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        seconds = measure(CASES[name], catalogues, repeat, budget)
+                except Exception as e:
+                    skipped[name][str(rows)] = type(e).__name__ + ": " + str(e)
+                    print(f"{name:>58}: {skipped[name][str(rows)]}")
+                    continue
+                results[name][str(rows)] = round(seconds, 6)
+                last[name] = (rows, seconds)
+                print(f"{name:>58}: {seconds * 1000:10.2f} ms")
+    return results, skipped
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {"commit": gitCommit(), "created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, tolerance, floor):
+    """
+    Cases slower than the baseline by more than tolerance (a ratio) and by more than floor seconds.
+
+    Returns:
+        [list]: (case, size, baseline seconds, seconds) of every regression.
+    """
+    regressions = []
+    print(f"\nagainst the baseline of commit {baseline.get('commit')} ({baseline.get('created')}, "
+          f"pandas {baseline.get('pandas')}, {baseline.get('machine')})")
+    for name, times in results.items():
+        for size, seconds in times.items():
+            before = baseline["results"].get(name, {}).get(size)
+            if before is None:
+                continue
+            slower = seconds > before * (1 + tolerance) and seconds - before > floor
+            if slower:
+                regressions.append((name, size, before, seconds))
+            if slower or seconds < before / (1 + tolerance) and before - seconds > floor:
+                print(f"{name:>58} {size:>9}: {before * 1000:10.2f} ms -> {seconds * 1000:10.2f} ms "
+                      f"({'slower' if slower else 'faster'}, x{seconds / before:.2f})")
+    print(f"{len(regressions)} regression(s) over {tolerance:.0%} and {floor * 1000:.0f} ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Times every public function of packetAdaptation and generator on synthetic catalogues.")
+    parser.add_argument("--sizes", default="1e3,1e4,1e5",
+                        help="comma separated rows of each source, e.g. 1e3,1e4,1e5,1e6,1e7.")
+    parser.add_argument("--cases", default=None,
+                        help="comma separated cases to run, e.g. adaptIkea,generator. Defaults to all of them.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each case, the best one is kept.")
+    parser.add_argument("--budget", type=float, default=60,
+                        help="seconds a case may take, larger sizes of a case over it are skipped.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help="write the results as a baseline. Defaults to benchmarks/baseline.json.")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help="compare the results with a baseline. Defaults to benchmarks/baseline.json.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown ratio tolerated by --compare.")
+    parser.add_argument("--floor", type=float, default=0.005,
+                        help="slowdowns under these seconds are ignored by --compare, they are noise.")
+    args = parser.parse_args()
+    missing = uncoveredFunctions()
+    if missing:
+        print("Warning: public functions without a case: " + ", ".join(missing))
+    names = list(CASES)
+    if args.cases is not None:
+        wanted = args.cases.split(",")
+        names = [n for n in names if n in wanted or n.split(".", 1)[1] in wanted]
+    # Worker processes of generateScenarios must inherit the redirected paths.
+    if "fork" in multiprocessing.get_all_start_methods():
+        multiprocessing.set_start_method("fork")
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    results, skipped = run(sizes, names, args.repeat, args.budget, args.seed)
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.floor)
+    if args.save is not None:
+        baseline = dict(environment(), sizes=sizes, repeat=args.repeat, results=results,
+                        skipped={n: s for n, s in skipped.items() if s})
+        with open(args.save, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print("baseline written to " + args.save)
+    if args.compare is not None and regressions:
+        sys.exit(1)
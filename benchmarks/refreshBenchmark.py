@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from functools import partial
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "scrapers"))
+import mediamarktParser  # noqa: E402
+from checkpoint import ScrapeCheckpoint  # noqa: E402
+from fetcher import FetchEngine  # noqa: E402
+from pipeline import ScrapePipeline  # noqa: E402
+from responseCache import ResponseCache, hashedProductBuilder, refreshCatalogue  # noqa: E402
+from localServer import startServer  # noqa: E402
+from parseBenchmark import mediamarktPage  # noqa: E402
+from benchmarkUtils import timeIt  # noqa: E402
+
+
+class Catalogue:
+    """Product pages served by the local server, each path is a product whose page can be edited or removed.
+    """
+
+    def __init__(self, products, rows):
+        self.template = mediamarktPage(rows).decode()
+        self.versions = {i: 0 for i in range(products)}
+
+    def page(self, path):
+        product = int(path.rstrip("/").split("/")[-1])
+        if product not in self.versions:
+            return None
+        # Product id and weight follow the path and the version of the page.
+        return self.template.replace("1438765", str(1000000 + product)).replace(
+            "17.6 kg", str(10 + self.versions[product]) + " kg").encode()
+
+
+def crawl(links, dataDirectory, workers):
+    productBuilder = partial(hashedProductBuilder, mediamarktParser.extractPayload, mediamarktParser.payloadToPackets)
+    checkpoint, cache = ScrapeCheckpoint(dataDirectory), ResponseCache(dataDirectory)
+    checkpoint.resume(links)
+    with FetchEngine(maxInFlight=32) as engine:
+        scrapePipeline = ScrapePipeline(engine, productBuilder, workers)
+        for link, url, (payloadHash, packets), err, validators in scrapePipeline.run(links):
+            cache.record(link, validators, payloadHash, packets)
+            checkpoint.commitBatch(packets, link, 0)
+    cache.commit()
+    checkpoint.close()
+    checkpoint.compact()
+    cache.publish(links)
+    return scrapePipeline
+
+
+def refresh(links, dataDirectory, workers):
+    productBuilder = partial(hashedProductBuilder, mediamarktParser.extractPayload, mediamarktParser.payloadToPackets)
+    with FetchEngine(maxInFlight=32) as engine:
+        scrapePipeline = ScrapePipeline(engine, productBuilder, workers)
+        delta = refreshCatalogue(links, ResponseCache(dataDirectory), scrapePipeline, ScrapeCheckpoint(dataDirectory))
+    return scrapePipeline, delta
+
+
+def benchmark(products, changedShare, removedShare, addedShare, rows, workers):
+    catalogue = Catalogue(products, rows)
+    server, baseUrl = startServer(catalogue.page, delay=0.005, slowShare=0)
+    rng = random.Random(0)
+    try:
+        with tempfile.TemporaryDirectory() as dataDirectory:
+            links = [baseUrl + "p/" + str(i) for i in range(products)]
+            crawlTime, scrapePipeline = timeIt(lambda: crawl(links, dataDirectory, workers))
+            print(f"full crawl: {crawlTime:.2f}s, {scrapePipeline.stats['fetch'].bytes / 2**20:.1f} MiB")
+
+            # Nightly changes of the catalogue.
+            for product in rng.sample(range(products), int(products * changedShare)):
+                catalogue.versions[product] += 1
+            removed = set(rng.sample(range(products), int(products * removedShare)))
+            for product in removed:
+                del catalogue.versions[product]
+            for product in range(products, products + int(products * addedShare)):
+                catalogue.versions[product] = 0
+            links = [baseUrl + "p/" + str(i) for i in sorted(catalogue.versions)]
+
+            refreshTime, (scrapePipeline, delta) = timeIt(lambda: refresh(links, dataDirectory, workers))
+            print(f"refresh: {refreshTime:.2f}s, {scrapePipeline.stats['fetch'].bytes / 2**20:.1f} MiB, "
+                  f"{refreshTime / crawlTime:.1%} of the full crawl")
+            print({k: v for k, v in delta.items() if k not in ["packets", "replacedSubgroups"]},
+                  len(delta["packets"]), "packets in the delta")
+            with open(os.path.join(dataDirectory, "data.json")) as f:
+                print(len(json.load(f)), "packets in the refreshed data.json")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Nightly refresh with conditional requests against a full crawl of a local stand-in catalogue.")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--changed", type=float, default=0.02)
+    parser.add_argument("--removed", type=float, default=0.01)
+    parser.add_argument("--added", type=float, default=0.01)
+    parser.add_argument("--rows", type=int, default=600,
+                        help="filler rows of the pages, 600 is about 270 KiB.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parser processes. Defaults to the number of CPUs.")
+    args = parser.parse_args()
+    benchmark(args.products, args.changed, args.removed,
+              args.added, args.rows, args.workers)
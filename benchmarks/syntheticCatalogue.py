@@ -0,0 +1,168 @@
+import argparse
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+
+# Synthetic scraped catalogues, in the layout of the Mediamarkt and Ikea data.json, at any size.
+# Width, height, length and weight are drawn from a joint log-normal fitted to the checked-in mediamarktData/data.json,
+# so their spread, their correlations (heavy packets are big ones) and their outliers (the density mistakes the
+# adaptation cleans) follow the scraped data. Mediamarkt names and descriptions are drawn from the scraped ones.
+# No Ikea scrape is checked in, the packets per subgroup follow IKEA_SUBGROUP_SIZES, shares set by hand after the
+# product pages: most products are a single package, the rest are combined products (one article per package, the
+# subgroup is the combination) or several units of the same article (same packet repeated, an only item subgroup).
+MEDIAMARKT_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mediamarktData', 'data.json')
+MEASUREMENTS = ["width", "height", "length", "weight"]
+IKEA_SUBGROUP_SIZES = {1: 0.72, 2: 0.12, 3: 0.06, 4: 0.04, 5: 0.02, 6: 0.015, 8: 0.01, 10: 0.01, 16: 0.005}
+# Share of the subgroups with several packets that are combined products.
+IKEA_COMBINED_SHARE = 0.6
+# Share of the articles with a cylindrical packaging, scraped with a diameter instead of a width and a height.
+IKEA_ROUNDED_SHARE = 0.03
+IKEA_TYPE_NAMES = {"Shelf": 0.14, "Chair": 0.12, "Table": 0.1, "Wardrobe": 0.08, "Chest of drawers": 0.08,
+                   "Bed frame": 0.06, "Sofa": 0.06, "Box": 0.08, "Cushion": 0.06, "Glass-door cabinet": 0.04,
+                   "Mirror": 0.04, "Table lamp": 0.04, "LED bulb": 0.03, "Vase": 0.03, "Tealight holder": 0.04}
+
+
+def fitCatalogueModel(path=MEDIAMARKT_DATA):
+    """
+    Fits the measurement distribution of a scraped catalogue.
+
+    Args:
+        path (str, optional): scraped data.json. Defaults to the Mediamarkt one.
+
+    Returns:
+        [dict]: mean and covariance of the logarithm of the measurements, and the (name, description) of every packet.
+    """
+    data = pd.read_json(path)
+    measurements = data[MEASUREMENTS].to_numpy(dtype=float)
+    logs = np.log(measurements[(measurements > 0).all(axis=1)])
+    return {"rows": len(logs), "mean": logs.mean(axis=0).tolist(), "cov": np.cov(logs, rowvar=False).tolist(),
+            "texts": data[["name", "description"]].to_numpy(dtype=object)}
+
+
+def drawMeasurements(model, size, rng):
+    """
+    Width, height, length (cm) and weight (kg) of size packets, with the precision of the scraped data.
+    """
+    measurements = np.exp(rng.multivariate_normal(model["mean"], model["cov"], size))
+    measurements[:, :3] = np.maximum(np.round(measurements[:, :3], 1), 0.1)
+    measurements[:, 3] = np.maximum(np.round(measurements[:, 3], 3), 0.001)
+    return measurements
+
+
+def mediamarktCatalogue(rows, model, rng):
+    """
+    Mediamarkt packets, one per product.
+    """
+    measurements = drawMeasurements(model, rows, rng)
+    texts = model["texts"][rng.integers(0, len(model["texts"]), rows)]
+    productId = 10**12 + rng.permutation(rows)
+    return pd.DataFrame({"id": "", "name": texts[:, 0], "description": texts[:, 1], "productId": productId,
+                         "subgroupId": productId, "rounded": 0, **dict(zip(MEASUREMENTS, measurements.T))})
+
+
+def subgroupSizes(rows, rng):
+    """
+    Packets of each subgroup, adding up to rows.
+    """
+    values, shares = np.array(list(IKEA_SUBGROUP_SIZES)), np.array(list(IKEA_SUBGROUP_SIZES.values()))
+    sizes = np.empty(0, dtype=np.int64)
+    while sizes.sum() < rows:
+        expected = math.ceil((rows - sizes.sum()) / (values * shares).sum() * 1.1) + 1
+        sizes = np.concatenate([sizes, rng.choice(values, expected, p=shares / shares.sum())])
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), rows) + 1]
+    sizes[-1] -= sizes.sum() - rows
+    return sizes
+
+
+def ikeaCatalogue(rows, model, rng):
+    """
+    Ikea packets, grouped in subgroups of IKEA_SUBGROUP_SIZES.
+    """
+    sizes = subgroupSizes(rows, rng)
+    combined = (sizes > 1) & (rng.random(sizes.size) < IKEA_COMBINED_SHARE)
+    # Units of the same article share the article, every package of a combined product has its own.
+    articlesPerSubgroup = np.where(combined, sizes, 1)
+    articleSubgroups = np.repeat(np.arange(sizes.size), articlesPerSubgroup)
+    articleSizes = np.where(combined[articleSubgroups], 1, sizes[articleSubgroups])
+    nArticles = articleSizes.size
+    articles = np.repeat(np.arange(nArticles), articleSizes)
+    subgroups = np.repeat(np.arange(sizes.size), sizes)
+    # Article numbers, those of the combinations come after the ones of the articles.
+    articleIds = 10**7 + rng.permutation(nArticles)
+    firstArticles = np.cumsum(articlesPerSubgroup) - articlesPerSubgroup
+    subgroupIds = np.where(combined, 10**7 + nArticles + np.arange(sizes.size), articleIds[firstArticles])
+    measurements = drawMeasurements(model, nArticles, rng)
+    rounded = rng.random(nArticles) < IKEA_ROUNDED_SHARE
+    typeNames = np.array(list(IKEA_TYPE_NAMES))
+    shares = np.array(list(IKEA_TYPE_NAMES.values()))
+    types = typeNames[rng.choice(typeNames.size, nArticles, p=shares / shares.sum())]
+    data = pd.DataFrame({"id": "", "name": np.char.add("ARTICLE ", articleIds.astype(str))[articles],
+                         "description": types[articles], "productId": articleIds[articles],
+                         "subgroupId": subgroupIds[subgroups], "rounded": rounded[articles].astype(int),
+                         **dict(zip(MEASUREMENTS, measurements[articles].T))})
+    # Cylindrical packagings only have a length, a weight and a diameter.
+    roundedRows = rounded[articles]
+    data["diameter"] = np.where(roundedRows, data["width"], np.nan)
+    data.loc[roundedRows, ["width", "height"]] = np.nan
+    return data
+
+
+CATALOGUES = {"mediamarkt": mediamarktCatalogue, "ikea": ikeaCatalogue}
+
+
+def syntheticCatalogue(source, rows, model=None, rng=None):
+    """
+    Synthetic scraped catalogue, as pd.read_json reads the data.json of the source.
+
+    Args:
+        source ([str]): "mediamarkt" or "ikea".
+        rows ([int]): number of packets.
+        model ([dict], optional): see fitCatalogueModel. Defaults to the fit of the Mediamarkt data.
+        rng ([Generator], optional): numpy random generator or seed. Defaults to None.
+
+    Returns:
+        [df]: scraped packets.
+    """
+    if model is None:
+        model = fitCatalogueModel()
+    return CATALOGUES[source](rows, model, np.random.default_rng(rng))
+
+
+def writeCatalogue(data, path, source, chunkSize=100000):
+    """
+    Writes a synthetic catalogue as the scrapers do, chunk by chunk: Ikea measurements are the scraped strings and
+    cylindrical packagings have no width nor height.
+    """
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'w') as f:
+        f.write("[")
+        for start in range(0, len(data), chunkSize):
+            chunk = data.iloc[start:start + chunkSize]
+            columns = {c: chunk[c].tolist() for c in chunk.columns}
+            for i in range(len(chunk)):
+                record = {}
+                for c, values in columns.items():
+                    value = values[i]
+                    if isinstance(value, float):
+                        if value != value:
+                            continue
+                        if source == "ikea" and c in MEASUREMENTS + ["diameter"]:
+                            value = repr(value)
+                    record[c] = value
+                f.write(("\n" if start + i == 0 else ",\n") + json.dumps(record, ensure_ascii=False))
+        f.write("\n]")
+    os.replace(tmpPath, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes a synthetic scraped catalogue, see syntheticCatalogue.")
+    parser.add_argument("source", choices=list(CATALOGUES))
+    parser.add_argument("rows", type=float)
+    parser.add_argument("path", help="destination data.json.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    model = fitCatalogueModel()
+    print(f"fitted on {model['rows']} packets, log mean {np.round(model['mean'], 2).tolist()}")
+    writeCatalogue(syntheticCatalogue(args.source, int(args.rows), model, args.seed), args.path, args.source)
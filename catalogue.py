@@ -0,0 +1,249 @@
+import json
+import os
+import re
+import sqlite3
+from storage import EXTENSIONS, READ_PREFERENCE, backendOf, basePathOf
+from lazy import lazyImport
+pd = lazyImport("pandas")
+
+# SQLite index of the generated scenarios, one row per scenario (round and ID) with the path of its dataset, the path
+# of its description, every field of the description and the parameters encoded in the dataset filename:
+# ddHHMMSS-nPackets-nOrders-uniqueDim-volRatio-dst-ADR-prio-frag-minVol-option.
+# Columns are added as new description fields appear, nested fields (config, sampling) are kept as JSON text.
+CATALOGUE_FILENAME = 'catalogue.sqlite'
+# Description fields encoded in the filename, in order after the ID, used for datasets without a description.
+FILENAME_FIELDS = ["packets_product", "orders_subgroups", "unique_dim", "vol_ratio",
+                   "n_dst", "n_adr", "n_prio", "n_frag", "min_vol", "option"]
+BASE_COLUMNS = ["round", "ID", "dataset", "description", "datasetMtime", "descriptionMtime"]
+# Dataset directory of a round solved by an algorithm, e.g. round3pso, see scenarioKey.
+ALGORITHM_ROUND = re.compile(r"^(round\d+)([a-z]+)$")
+
+
+def parseScenarioFilename(filename):
+    """
+    Parameters encoded in the filename of a scenario dataset.
+
+    Args:
+        filename ([str]): dataset path or filename.
+
+    Returns:
+        [dict]: FILENAME_FIELDS values plus the ID, None if the filename does not follow the scheme.
+    """
+    parts = basePathOf(os.path.basename(filename)).split("-", 9)
+    # minVol may have a dash of its own, e.g. 1e-05, the option is the last field.
+    if len(parts) < 10 or "-" not in parts[9]:
+        return None
+    parts = parts[:9] + parts[9].rsplit("-", 1)
+    try:
+        values = [int(v) for v in parts[1:4]] + [float(parts[4])] + \
+            [int(v) for v in parts[5:9]] + [float(parts[9]), parts[10]]
+    except ValueError:
+        return None
+    return dict(zip(FILENAME_FIELDS, values), ID=parts[0])
+
+
+def scenarioKey(path, root):
+    """
+    (round, ID) of a dataset or description path below root, round is "" for files directly in root.
+    Rounds solved by a given algorithm keep their datasets in <round><algorithm>, e.g. round3pso, with the IDs of the
+    derived scenarios prefixed R<ALGORITHM> (RPSO26025824) while their descriptions are in <round> with an R prefix
+    (R26025824), both are keyed as the latter so that they join.
+    """
+    roundName = os.path.relpath(os.path.dirname(os.path.abspath(path)), os.path.abspath(root))
+    roundName = "" if roundName == "." else roundName
+    ID = basePathOf(os.path.basename(path)).split("-")[0]
+    algorithmRound = ALGORITHM_ROUND.match(roundName)
+    if algorithmRound is not None:
+        roundName, algorithm = algorithmRound.groups()
+        if ID.startswith("R" + algorithm.upper()):
+            ID = "R" + ID[len(algorithm) + 1:]
+    return roundName, ID
+
+
+def sqliteValue(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    # 64 bits seeds do not fit in a SQLite integer.
+    if isinstance(value, int) and not -2**63 <= value < 2**63:
+        return str(value)
+    return value
+
+
+def quoted(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+class ScenarioCatalogue:
+    """
+    Persistent index of the scenarios in <scenariosPath>/datasets and <scenariosPath>/description.
+
+    Args:
+        scenariosPath ([str]): scenarios directory.
+        path (str, optional): SQLite file. Defaults to <scenariosPath>/catalogue.sqlite.
+    """
+
+    def __init__(self, scenariosPath, path=None):
+        self.scenariosPath = scenariosPath
+        self.datasetsPath = os.path.join(scenariosPath, 'datasets')
+        self.descriptionPath = os.path.join(scenariosPath, 'description')
+        self.path = path if path is not None else os.path.join(scenariosPath, CATALOGUE_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Worker processes may record scenarios at the same time, they wait for each other's transactions.
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS scenarios (" + ", ".join(
+                quoted(c) for c in BASE_COLUMNS) + ", PRIMARY KEY (round, ID))")
+        self.columns = self.readColumns()
+
+    def readColumns(self):
+        return [row[1] for row in self.connection.execute("PRAGMA table_info(scenarios)")]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        self.close()
+
+    # -------------- Updates ---------------------------------
+
+    def upsert(self, row):
+        """
+        Inserts or replaces the row of a scenario, adding the columns it needs.
+        """
+        row = {k: sqliteValue(v) for k, v in row.items()}
+        for column in row:
+            if column not in self.columns:
+                # No declared type, values keep their own.
+                self.connection.execute("ALTER TABLE scenarios ADD COLUMN " + quoted(column))
+                self.columns.append(column)
+        self.connection.execute("INSERT OR REPLACE INTO scenarios (" + ", ".join(quoted(c) for c in row) + ") VALUES (" +
+                                ", ".join("?" * len(row)) + ")", list(row.values()))
+
+    def scenarioRow(self, roundName, ID, datasetPath=None, descriptionPath=None):
+        row = {"round": roundName, "ID": ID}
+        if datasetPath is not None:
+            row.update({k: v for k, v in (parseScenarioFilename(datasetPath) or {}).items() if k != "ID"})
+            row["dataset"] = os.path.relpath(datasetPath, self.scenariosPath)
+            row["datasetMtime"] = os.stat(datasetPath).st_mtime_ns
+        if descriptionPath is not None:
+            with open(descriptionPath, 'r') as f:
+                description = json.load(f)
+            # Same ID as the dataset, the description one may be that of the scenario it was derived from.
+            row.update({k: v for k, v in description.items() if k != "ID"})
+            row["description"] = os.path.relpath(descriptionPath, self.scenariosPath)
+            row["descriptionMtime"] = os.stat(descriptionPath).st_mtime_ns
+        return row
+
+    def record(self, datasetPath=None, descriptionPath=None):
+        """
+        Records a scenario just written, either path can be None or missing, e.g. if only the description was kept.
+        """
+        datasetPath = datasetPath if datasetPath is not None and os.path.exists(datasetPath) else None
+        descriptionPath = descriptionPath if descriptionPath is not None and os.path.exists(descriptionPath) else None
+        if datasetPath is None and descriptionPath is None:
+            return
+        roundName, ID = scenarioKey(datasetPath, self.datasetsPath) if datasetPath is not None else scenarioKey(
+            descriptionPath, self.descriptionPath)
+        with self.connection:
+            self.upsert(self.scenarioRow(roundName, ID, datasetPath, descriptionPath))
+
+    def refresh(self):
+        """
+        Synchronizes the catalogue with the scenarios directory, only reading the descriptions that changed.
+
+        Returns:
+            [dict]: number of scenarios added or updated, removed and unchanged.
+        """
+        found = {}
+        for root, kind in [(self.datasetsPath, "dataset"), (self.descriptionPath, "description")]:
+            for directory, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    extension = os.path.splitext(filename)[1]
+                    if extension not in EXTENSIONS.values() or (kind == "description" and extension != EXTENSIONS["json"]):
+                        continue
+                    entry = found.setdefault(scenarioKey(path, root), {})
+                    # Of several versions of a dataset, the preferred backend.
+                    if kind in entry and kind == "dataset" and READ_PREFERENCE.index(backendOf(entry[kind])) <= READ_PREFERENCE.index(backendOf(path)):
+                        continue
+                    entry[kind] = path
+        known = {(r[0], r[1]): r[2:] for r in self.connection.execute(
+            "SELECT round, ID, dataset, description, datasetMtime, descriptionMtime FROM scenarios")}
+        counts = {"updated": 0, "removed": 0, "unchanged": 0}
+        with self.connection:
+            for key, entry in found.items():
+                datasetPath, descriptionPath = entry.get("dataset"), entry.get("description")
+                current = tuple([os.path.relpath(p, self.scenariosPath) if p is not None else None for p in [datasetPath, descriptionPath]] +
+                                [os.stat(p).st_mtime_ns if p is not None else None for p in [datasetPath, descriptionPath]])
+                if known.get(key) == current:
+                    counts["unchanged"] += 1
+                    continue
+                if key in known:
+                    # Columns of fields the scenario no longer has are cleared.
+                    self.connection.execute("DELETE FROM scenarios WHERE round = ? AND ID = ?", key)
+                self.upsert(self.scenarioRow(*key, datasetPath, descriptionPath))
+                counts["updated"] += 1
+            for key in set(known) - set(found):
+                self.connection.execute("DELETE FROM scenarios WHERE round = ? AND ID = ?", key)
+                counts["removed"] += 1
+        return counts
+
+    # -------------- Queries ---------------------------------
+
+    def conditions(self, filters):
+        """
+        SQL conditions and parameters of the filters: a value for equality, a list of values for membership and a
+        (low, high) tuple for an inclusive range, None leaving an end open.
+        """
+        clauses, parameters = [], []
+        # Other processes may have added columns.
+        self.columns = self.readColumns()
+        for column, value in filters.items():
+            if column not in self.columns:
+                raise ValueError("Unknown catalogue field: " + column)
+            if isinstance(value, tuple):
+                low, high = value
+                if low is not None:
+                    clauses.append(quoted(column) + " >= ?")
+                    parameters.append(low)
+                if high is not None:
+                    clauses.append(quoted(column) + " <= ?")
+                    parameters.append(high)
+            elif isinstance(value, list):
+                clauses.append(quoted(column) + " IN (" + ", ".join("?" * len(value)) + ")")
+                parameters.extend(value)
+            elif value is None:
+                clauses.append(quoted(column) + " IS NULL")
+            else:
+                clauses.append(quoted(column) + " = ?")
+                parameters.append(value)
+        return clauses, parameters
+
+    def query(self, where=None, parameters=(), **filters):
+        """
+        Scenarios matching every filter, e.g. query(option="m", perc_prio=(0.05, None), n_dst=4).
+
+        Args:
+            where (str, optional): extra SQL condition, e.g. "perc_prio > ?". Defaults to None.
+            parameters (tuple, optional): parameters of where. Defaults to ().
+            filters: field to a value, a list of values or an inclusive (low, high) range.
+
+        Returns:
+            [df]: matching rows, with every field.
+        """
+        clauses, values = self.conditions(filters)
+        if where is not None:
+            clauses.append("(" + where + ")")
+            values.extend(parameters)
+        sql = "SELECT * FROM scenarios" + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY round, ID"
+        return pd.read_sql_query(sql, self.connection, params=values)
+
+    def datasetPaths(self, where=None, parameters=(), **filters):
+        """
+        Paths of the datasets of the scenarios matching every filter, see query.
+        """
+        rows = self.query(where, parameters, **filters)
+        return [os.path.join(self.scenariosPath, p) for p in rows["dataset"].dropna()]
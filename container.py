@@ -0,0 +1,137 @@
+from packetStore import MASK_SUFFIX, feasibleOrientationsToMask
+from lazy import lazyImport
+np = lazyImport("numpy")
+
+# Containers of the scenarios, interior dimensions in cm (as the packets ones) and payload in kg. The trailer is the
+# 81.6 m3 container scenarios were generated for with a scalar volume.
+# Extents of a packet along the (width, length, height) of the container for each orientation code, as positions of
+# (width, length, height) of the packet, following the scheme of orientations.py: 1 (w, l, h), 2 (l, w, h),
+# 3 (w, h, l), 4 (l, h, w), 5 (h, w, l), 6 (h, l, w).
+ORIENTATION_AXES = [(0, 1, 2), (1, 0, 2), (0, 2, 1), (1, 2, 0), (2, 0, 1), (2, 1, 0)]
+
+
+class Container:
+    """
+    Container type of a scenario.
+
+    Args:
+        name ([str]): name of the type, recorded in the scenario descriptions.
+        width ([float]): interior width, in cm.
+        length ([float]): interior length, in cm.
+        height ([float]): interior height, in cm.
+        maxWeight ([float]): maximum payload, in kg.
+    """
+
+    def __init__(self, name, width, length, height, maxWeight):
+        self.name = name
+        self.width = width
+        self.length = length
+        self.height = height
+        self.maxWeight = maxWeight
+
+    @property
+    def dimensions(self):
+        return self.width, self.length, self.height
+
+    @property
+    def volume(self):
+        """
+        Interior volume, in m3 as the volume of the packets.
+        """
+        return self.width * self.length * self.height / 10**6
+
+    def config(self):
+        """
+        Name of the type if it is a known one, its dict otherwise, so that it can be kept in a scenario config.
+        """
+        if CONTAINER_TYPES.get(self.name) == self:
+            return self.name
+        return {"name": self.name, "width": self.width, "length": self.length, "height": self.height,
+                "maxWeight": self.maxWeight}
+
+    def key(self):
+        return self.name, self.width, self.length, self.height, self.maxWeight
+
+    def __eq__(self, other):
+        return isinstance(other, Container) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "Container(" + ", ".join(repr(v) for v in self.key()) + ")"
+
+
+CONTAINER_TYPES = {"trailer": Container("trailer", 240, 1360, 250, 24000),
+                   "container20": Container("container20", 235, 590, 239, 28200),
+                   "container40": Container("container40", 235, 1203, 239, 26700),
+                   "container40HC": Container("container40HC", 235, 1203, 269, 26500)}
+
+
+def containerOf(container):
+    """
+    Container given its type name, a dict of its fields or the container itself.
+    """
+    if isinstance(container, Container):
+        return container
+    if isinstance(container, dict):
+        return Container(**container)
+    if container not in CONTAINER_TYPES:
+        raise ValueError("Unknown container type: " + str(container) +
+                         ", known types are " + ", ".join(CONTAINER_TYPES) + ".")
+    return CONTAINER_TYPES[container]
+
+
+def containersOf(containers):
+    """
+    List of containers out of a single container or a sequence of them, see containerOf.
+    """
+    if isinstance(containers, (str, dict, Container)):
+        containers = [containers]
+    return [containerOf(c) for c in containers]
+
+
+def orientationMasks(data):
+    """
+    6-bit mask of the allowed orientations of each packet, all of them for packets without feasible orientations.
+
+    Args:
+        data ([df]): packets dataframe or packet table.
+    """
+    for column in ["f_or", "feasibleOr"]:
+        if column + MASK_SUFFIX in data.columns:
+            return data[column + MASK_SUFFIX].to_numpy(dtype=np.uint8)
+        if column in data.columns:
+            return feasibleOrientationsToMask(data[column].tolist())
+    return np.full(len(data), 63, dtype=np.uint8)
+
+
+def fittingOrientations(data, container):
+    """
+    Orientations in which each packet fits inside the container, as a (n, 6) boolean matrix, column i stands for
+    orientation i + 1.
+
+    Args:
+        data ([df]): packets dataframe, with width, length and height.
+        container ([Container]): container.
+    """
+    dimensions = data[["width", "length", "height"]].to_numpy(dtype=float)
+    limits = np.asarray(container.dimensions, dtype=float)
+    return np.column_stack([(dimensions[:, list(axes)] <= limits).all(axis=1) for axes in ORIENTATION_AXES])
+
+
+def feasibilityMask(data, container):
+    """
+    Packets that fit inside the container in at least one of their allowed orientations and weigh no more than its
+    payload.
+
+    Args:
+        data ([df]): packets dataframe.
+        container ([Container]): container.
+
+    Returns:
+        [array]: boolean mask of the feasible packets.
+    """
+    allowed = (orientationMasks(data)[:, None] >> np.arange(6, dtype=np.uint8)) & 1
+    return (fittingOrientations(data, container) & allowed.astype(bool)).any(axis=1) & \
+        (data["weight"].to_numpy(dtype=float) <= container.maxWeight)
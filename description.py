@@ -0,0 +1,113 @@
+import os
+from packetStore import dimensionKeys
+from storage import backendOf, readDataset, resolveDatasetPath, writeJsonAtomic
+from instrumentation import traced
+from lazy import lazyImport
+np = lazyImport("numpy")
+pd = lazyImport("pandas")
+
+# Descriptions are computed in one pass over the NumPy arrays of the dataset: every column is read once, the masks and
+# groupings shared by several statistics are computed once, and the sorted dimensions come as integer keys from
+# packetStore instead of a tuple column.
+
+
+def factorizedCount(values):
+    """
+    Number of distinct non-missing values and the code of each value, -1 for missing ones.
+    """
+    codes, uniques = pd.factorize(values)
+    return len(uniques), codes
+
+
+def summary(values):
+    """
+    Max, min, mean, median, std (ddof 1) and sum of a numeric column, as computed by pandas on a column without
+    missing values.
+    """
+    total = values.sum()
+    mean = total / len(values)
+    std = np.sqrt(((values - mean) ** 2).sum() / (len(values) - 1)) if len(values) > 1 else np.nan
+    return values.max(), values.min(), mean, np.median(values), std, total
+
+
+@traced()
+def datasetDescription(dataset, ID):
+    """
+    Generates stats on given dataset.
+
+    Args:
+        dataset ([df]): dataset, either in the JSON record layout or as a packet table.
+        ID ([type]): identification of the dataset (timestamp).
+
+    Returns:
+        [dict]: object containing relevant descriptive data on the dataset.
+    """
+    n = len(dataset)
+    weight = dataset["weight"].to_numpy(dtype=float)
+    volume = dataset["volume"].to_numpy(dtype=float)
+    dimensions = dataset[["width", "height", "length"]].to_numpy(dtype=float)
+    subgroupId = dataset["subgroupId"].to_numpy()
+    # Shared by the subgroup statistics.
+    multiItem = int((subgroupId != dataset["productId"].to_numpy()).sum())
+    nSubgroups = factorizedCount(subgroupId)[0]
+    # Shared by the unique dimension statistics.
+    nDimensions, dimensionCodes = factorizedCount(dimensionKeys(dataset))
+    nWeights, weightCodes = factorizedCount(weight)
+    known = weightCodes >= 0
+    nDimensionWeights = len(pd.unique(dimensionCodes[known].astype(np.int64) * nWeights + weightCodes[known]))
+    maxW, minW, meanW, medianW, stdW, totalW = summary(weight)
+    maxV, minV, meanV, medianV, stdV, totalV = summary(volume)
+    nPriority = int((dataset["priority"].to_numpy() > 0).sum())
+
+    return {"ID": ID,
+            "packets_product": n,
+            "orders_subgroups": nSubgroups,
+            "unique_dim": nDimensions,
+            "unique_dim_weight": nDimensionWeights,
+            "max_dim": dimensions.max(), "min_dim": dimensions.min(),
+            "max_w": maxW, "min_w": minW,
+            "w_mean": round(meanW, 2), "w_median": round(medianW, 2),
+            "w_std": round(stdW, 2), "t_weight": round(totalW, 2),
+            "max_v": maxV, "min_v": minV,
+            "v_mean": round(meanV, 2), "v_median": round(medianV, 2),
+            "v_std": round(stdV, 2), "t_vol": round(totalV, 2),
+            "n_dst": len(pd.unique(dataset["dstCode"].to_numpy())),
+            "n_prio": nPriority,
+            "n_frag": int((dataset["fragility"].to_numpy() == 1).sum()),
+            "n_adr": int((dataset["ADR"].to_numpy() == 1).sum()),
+            "n_only_item_sub": n - multiItem,
+            "n_mult_item_sub": multiItem,
+            "perc_mult": round(multiItem / n, 2),
+            "perc_unique": round(nDimensions / n, 2),
+            "perc_prio": round(nPriority / n, 2),
+            }
+
+
+@traced()
+def describeDatasets(paths, IDs=None, summaryPath=None):
+    """
+    Describes many scenario datasets in one call, e.g. to describe again every dataset of a round.
+
+    Args:
+        paths ([list]): dataset paths, each of them is read from its preferred up to date version.
+        IDs ([list], optional): identification of each dataset. Defaults to the timestamp prefix of the filenames.
+        summaryPath ([str], optional): writes the summary table there, as CSV if the extension is .csv and as JSON
+            records otherwise. Defaults to None.
+
+    Returns:
+        [df]: summary table, one description per row.
+    """
+    if IDs is None:
+        IDs = [os.path.basename(path).split("-")[0] for path in paths]
+    descriptions = []
+    for path, ID in zip(paths, IDs):
+        path = resolveDatasetPath(path)
+        # Binary versions are described as packet tables, without decoding their orientation masks.
+        descriptions.append(datasetDescription(readDataset(path, asPacketTable=backendOf(path) != "json"), ID))
+    summaryTable = pd.DataFrame(descriptions)
+    if summaryPath is not None:
+        if summaryPath.endswith(".csv"):
+            summaryTable.to_csv(summaryPath, index=False)
+        else:
+            writeJsonAtomic(summaryTable.to_dict(orient="records"), summaryPath)
+    return summaryTable
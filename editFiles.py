@@ -1,52 +1,143 @@
-import os
+import argparse
 import glob
-import json
-from packetAdaptation import datasetDescription
-import pandas as pd
-
-
-def getFilepaths():
-    return glob.glob(os.path.dirname(
-        __file__) + os.path.sep + "scenarios" + os.path.sep + "datasets" + os.path.sep + "round3pso" + os.path.sep + "*.json")
-
-
-# for i in getFilepaths():
-#     print(i)
-#     with open(i, "r+") as f:
-#         data = json.load(f)
-#         data["perc_mult"] = round(
-#             data["n_mult_item_sub"]/data["packets_product"], 2)
-#         data["perc_prio"] = round(data["n_prio"]/data["packets_product"], 2)
-#         data["perc_unique"] = round(
-#             data["unique_dim"]/data["packets_product"], 2)
-#     with open(i, "w+") as f:
-#         json.dump(data, f, indent=2, ensure_ascii=False)
-
-scenariosPath = os.path.dirname(
-    __file__) + os.path.sep + 'scenarios' + os.path.sep
-
-filepaths = getFilepaths()
-
-for i in filepaths:
-    with open(i, "r+") as f:
-        data = pd.DataFrame(json.load(f))
-        cummulativeVolume = data["volume"].sum()
-        meanVolume = data["volume"].mean()
-        containerVolume = 81.6
-        reducer = round((cummulativeVolume - containerVolume)/meanVolume) - 4
-        partition = data[round(reducer/2):-round(reducer/2)]
-    # Creo nuevo filepath para guardar el nuevo dataset
-    with open(scenariosPath + os.path.sep + 'datasets' + os.path.sep + 'round3pso' + os.path.sep + 'RPSO' + os.path.basename(i), "w+") as f:
-        json.dump(partition.to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
-
-    fId = os.path.basename(i).split("-")[0]
-    filenameDescription = 'R' + fId + '.json'
-
-    # Creo nuevo filepath para guardar el nuevo dataset
-    with open(scenariosPath + 'description' + os.path.sep + "round3" + os.path.sep + filenameDescription, "w+") as f:
-        partition["dimensionUnique"] = partition.apply(lambda x: tuple(
-            sorted([x["width"], x["height"], x["length"]], reverse=True)), 1)
-        description = datasetDescription(partition, fId)
-        # Separe extension from filepath string
-        json.dump(description, f, indent=2, ensure_ascii=False)
+import os
+from concurrent.futures import ProcessPoolExecutor
+from description import datasetDescription
+from generator import assignIDs
+from storage import readDataset, writeDataset, writeJsonAtomic
+
+# Batch post-processing of generated scenarios: every matching dataset goes through the chosen transforms in a pool of
+# processes, outputs are written atomically and files whose outputs are newer than them are skipped.
+scenariosPath = os.path.dirname(os.path.abspath(
+    __file__)) + os.path.sep + 'scenarios' + os.path.sep
+
+
+# -------------- Transforms --------------------------------
+
+
+def trimToVolume(data, containerVolume=81.6):
+    """
+    Drops the same number of packets from both ends of the dataset so that its volume gets close to the container one,
+    keeping 4 more packets than strictly needed.
+
+    Args:
+        data ([df]): scenario dataset.
+        containerVolume (float, optional): volume of the container. Defaults to 81.6.
+    """
+    reducer = round((data["volume"].sum() - containerVolume) /
+                    data["volume"].mean()) - 4
+    half = round(reducer/2)
+    # Datasets already fitting in the container are kept whole.
+    return data[half:-half] if half > 0 else data
+
+
+def reId(data):
+    """
+    Numbers the packets again from 0, e.g. after trimming them.
+    """
+    return assignIDs(data.reset_index(drop=True))
+
+
+DATASET_TRANSFORMS = {"trim": trimToVolume, "reid": reId}
+# The description is written apart from the dataset, after the dataset transforms.
+TRANSFORMS = list(DATASET_TRANSFORMS) + ["describe"]
+
+
+def isUpToDate(path, outputs):
+    return all(os.path.exists(o) and os.path.getmtime(o) >= os.path.getmtime(path) for o in outputs)
+
+
+def transformFile(task):
+    """
+    Applies the transforms to one dataset inside a worker process.
+
+    Args:
+        task (tuple): (path, transforms, dataset path, description path, containerVolume, force), output paths are None
+            if not written.
+
+    Returns:
+        [str]: "done", "skipped" or the error.
+    """
+    path, transforms, datasetPath, descriptionPath, containerVolume, force = task
+    outputs = [o for o in [datasetPath, descriptionPath] if o is not None]
+    if not force and isUpToDate(path, outputs):
+        return "skipped"
+    try:
+        data = readDataset(path)
+        for name in transforms:
+            if name == "trim":
+                data = trimToVolume(data, containerVolume)
+            elif name in DATASET_TRANSFORMS:
+                data = DATASET_TRANSFORMS[name](data)
+        if datasetPath is not None:
+            writeDataset(data, datasetPath)
+        if descriptionPath is not None:
+            writeJsonAtomic(datasetDescription(data, os.path.basename(
+                path).split("-")[0]), descriptionPath)
+    except Exception as e:
+        print("Error: could not process " + path + ": " + repr(e))
+        return repr(e)
+    return "done"
+
+
+def batchTransform(pattern, transforms, workers=None, outputDirectory=None, prefix="RPSO", descriptionDirectory=None, descriptionPrefix="R", containerVolume=81.6, force=False):
+    """
+    Transforms every dataset matching a glob in parallel.
+
+    Args:
+        pattern ([str]): glob of the input datasets.
+        transforms ([list]): names in TRANSFORMS, dataset transforms are applied in the given order.
+        workers (int, optional): number of worker processes. Defaults to the number of cpus.
+        outputDirectory (str, optional): directory of the transformed datasets. Defaults to the one of each input.
+        prefix (str, optional): prefix of the transformed datasets filenames, inputs starting with it are skipped when
+            writing next to them. Defaults to "RPSO".
+        descriptionDirectory (str, optional): directory of the descriptions. Defaults to scenarios/description/round3.
+        descriptionPrefix (str, optional): prefix of the description filenames, followed by the dataset ID. Defaults to "R".
+        containerVolume (float, optional): container volume of the trim transform. Defaults to 81.6.
+        force (bool, optional): transform also the files whose outputs are up to date. Defaults to False.
+
+    Returns:
+        [dict]: input path to its status, "done", "skipped" or the error.
+    """
+    unknown = [t for t in transforms if t not in TRANSFORMS]
+    if unknown:
+        raise ValueError("Unknown transforms: " + ", ".join(unknown))
+    writesDataset = any(t in DATASET_TRANSFORMS for t in transforms)
+    if descriptionDirectory is None:
+        descriptionDirectory = scenariosPath + 'description' + os.path.sep + 'round3'
+    tasks = []
+    for path in sorted(glob.glob(pattern)):
+        directory = outputDirectory if outputDirectory is not None else os.path.dirname(path)
+        # Outputs of a previous run next to the inputs.
+        if writesDataset and outputDirectory is None and os.path.basename(path).startswith(prefix):
+            continue
+        datasetPath = os.path.join(directory, prefix + os.path.basename(path)) if writesDataset else None
+        descriptionPath = os.path.join(descriptionDirectory, descriptionPrefix + os.path.basename(
+            path).split("-")[0] + '.json') if "describe" in transforms else None
+        tasks.append((path, list(transforms), datasetPath, descriptionPath, containerVolume, force))
+    for o in set(os.path.dirname(t[i]) for t in tasks for i in [2, 3] if t[i] is not None):
+        os.makedirs(o, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip([t[0] for t in tasks], pool.map(transformFile, tasks)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Applies transforms to every scenario dataset matching a glob, in parallel.")
+    parser.add_argument("pattern", nargs="?", default=scenariosPath + 'datasets' + os.path.sep + 'round3pso' + os.path.sep + '*.json',
+                        help="glob of the input datasets. Defaults to the round3pso datasets.")
+    parser.add_argument("--transforms", nargs="+", choices=TRANSFORMS, default=["trim", "describe"],
+                        help="dataset transforms run in the given order, describe writes the description of the result.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes. Defaults to the number of cpus.")
+    parser.add_argument("--output-directory", default=None, help="Defaults to the directory of each input.")
+    parser.add_argument("--prefix", default="RPSO")
+    parser.add_argument("--description-directory", default=None,
+                        help="Defaults to scenarios/description/round3.")
+    parser.add_argument("--description-prefix", default="R")
+    parser.add_argument("--container-volume", type=float, default=81.6)
+    parser.add_argument("--force", action="store_true", help="also transform files whose outputs are up to date.")
+    args = parser.parse_args()
+    statuses = batchTransform(args.pattern, args.transforms, args.workers, args.output_directory, args.prefix,
+                              args.description_directory, args.description_prefix, args.container_volume, args.force)
+    print(", ".join(str(list(statuses.values()).count(s)) + " " + s for s in ["done", "skipped"]) + ", " +
+          str(len([s for s in statuses.values() if s not in ["done", "skipped"]])) + " failed.")
@@ -0,0 +1,95 @@
+import re
+from functools import lru_cache
+from lazy import lazyImport
+pd = lazyImport("pandas")
+
+# Fragile words are matched as whole space-separated tokens, as when descriptions were split on spaces and every token
+# looked up in the list, and phrases of several words match the same sequence of tokens. The whole list is compiled
+# once into a single regular expression shaped as a prefix tree, so that the cost of a description depends on its
+# length and barely on the number of words.
+
+
+def trieExpression(words):
+    """
+    Regular expression alternation of the words, factorized by common prefixes.
+
+    Args:
+        words ([list]): non-empty strings.
+
+    Returns:
+        [str]: expression without anchors, matching exactly the given words.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        # The empty key marks the end of a word.
+        node[""] = {}
+
+    def expression(node):
+        ends = "" in node
+        branches = [re.escape(char) + expression(child) for char, child in sorted(node.items()) if char != ""]
+        if not branches:
+            return ""
+        alternation = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A word ending here is also a match on its own, e.g. "lamp" in lamp(?:s)?.
+        return "(?:" + alternation + ")?" if ends else alternation
+
+    return expression(trie)
+
+
+class FragilityMatcher:
+    """
+    Compiled list of fragile words.
+
+    Args:
+        fragileWords ([list]): words or phrases of several space-separated words.
+        caseSensitive (bool, optional): whether "Glass" only matches "Glass". Defaults to True.
+    """
+
+    def __init__(self, fragileWords, caseSensitive=True):
+        words = set(w if caseSensitive else w.lower() for w in fragileWords if w)
+        self.words = sorted(words)
+        self.caseSensitive = caseSensitive
+        # Tokens are delimited by spaces or by the ends of the description.
+        self.pattern = re.compile(r"(?<![^ ])(?:" + trieExpression(self.words) + r")(?![^ ])",
+                                  0 if caseSensitive else re.IGNORECASE) if self.words else None
+
+    def matches(self, text):
+        return self.pattern is not None and isinstance(text, str) and self.pattern.search(text) is not None
+
+    def flags(self, texts):
+        """
+        Fragility flag of every text at once, missing texts are not fragile.
+
+        Args:
+            texts ([Series]): descriptions.
+
+        Returns:
+            [Series]: 1 if the text contains any of the words, 0 otherwise.
+        """
+        if self.pattern is None:
+            return pd.Series(0, index=texts.index)
+        return texts.str.contains(self.pattern, na=False).astype(int)
+
+
+@lru_cache(maxsize=32)
+def compiledMatcher(fragileWords, caseSensitive=True):
+    return FragilityMatcher(fragileWords, caseSensitive)
+
+
+def assignFragility(data, fragileWords, where="description", caseSensitive=True):
+    """
+    Adds the 'fragility' column, 1 for the packets whose text contains any of the fragile words or phrases.
+
+    Args:
+        data ([df]): packets dataframe.
+        fragileWords ([list]): words or phrases of several space-separated words, or a FragilityMatcher.
+        where (str, optional): column with the text. Defaults to "description".
+        caseSensitive (bool, optional): whether matching is case sensitive. Defaults to True.
+    """
+    matcher = fragileWords if isinstance(fragileWords, FragilityMatcher) else compiledMatcher(
+        tuple(fragileWords), caseSensitive)
+    data["fragility"] = matcher.flags(data[where])
+    return data
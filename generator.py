@@ -1,5 +1,10 @@
-import random
-import pandas as pd
+import math
+from container import feasibilityMask
+from packetStore import dimensionKeys
+from instrumentation import traced, currentSpan
+from lazy import lazyImport
+np = lazyImport("numpy")
+pd = lazyImport("pandas")
 
 
 def assignIDs(data):
@@ -12,40 +17,189 @@ def assignIDs(data):
     return data
 
 
-def generator(data, nDestinations, adrDist=None, priorityDist=None, fragility=True, minVol=0.001, minWeight=0.1, minDim=5):
+@traced()
+def generator(data, nDestinations, adrDist=None, priorityDist=None, fragility=True, minVol=0.001, minWeight=0.1, minDim=5, rng=None, attributeDists=None):
     """
     Create dataset with desired conditions.
 
     Args:
         data ([df]): dataframe itself.
-        nDestinations ([int]): number of destinations used to stablish dst_codes.
+        nDestinations ([int or sequence]): number of destinations used to stablish dst_codes, or the weight of each destination.
         adrDist ([sequence]): distribution for the packets selected as ADR. [a, b] where a non-ADR and b ADR.
         priorityDist ([sequence]): distribution for the packets selected as prioritary. [a, b] where a non-prioritary weight and b prioritary weight.
+            More weights mean more priority levels, e.g. [a, b, c] for levels 0, 1 and 2.
         fragility ([Bool], optional): Set it to false in case you want a relaxation of the condition in the whole dataset. Defaults to True.
+        rng ([Generator], optional): numpy random generator or seed. Defaults to None.
+        attributeDists ([dict], optional): distributions of extra subgroup level columns, see drawCategorical. Defaults to None.
+    """
+    # Assign a dst_code to each packet, keeping in mind that all the packets inside the same subgroupId should go in the same container.
+    # One draw per subgroup, broadcast back to its packets through the factorized codes.
+    # Columns are added to a new frame, data may be a cached reference dataset shared by other scenarios.
+    subgroupCodes, subgroups = pd.factorize(data["subgroupId"])
+    data = data.assign(**{column: values[subgroupCodes] for column, values in drawSubgroupAttributes(
+        len(subgroups), nDestinations, adrDist, priorityDist, rng, attributeDists).items()})
+    data = data[packetFilterMask(data, minVol, minWeight, minDim)]
+    # Fragility should not be modified, but for the relaxation scenario we can modify it.
+    if not fragility:
+        data = data.assign(fragility=0)
+    return data
+
+
+def drawCategorical(distribution, size, rng=None):
+    """
+    Draws size values out of a categorical distribution in a single call.
+
+    Args:
+        distribution ([int, sequence or dict]): n for uniform values in range(n), a sequence of weights for values
+            range(len(weights)) or a dict from value to weight.
+        size ([int]): number of values to draw.
+        rng ([Generator], optional): numpy random generator or seed. Defaults to None.
+
+    Returns:
+        [array]: drawn values.
+    """
+    rng = np.random.default_rng(rng)
+    if isinstance(distribution, (int, np.integer)):
+        return rng.integers(0, distribution, size)
+    if isinstance(distribution, dict):
+        values, weights = list(distribution.keys()), list(distribution.values())
+    else:
+        values, weights = list(range(len(distribution))), distribution
+    weights = np.asarray(weights, dtype=float)
+    if weights.sum() <= 0 or (weights < 0).any():
+        raise ValueError("Invalid distribution weights: " + str(distribution))
+    return np.asarray(values)[rng.choice(len(values), size, p=weights/weights.sum())]
+
+
+def drawSubgroupAttributes(nSubgroups, nDestinations, adrDist=None, priorityDist=None, rng=None, attributeDists=None):
+    """
+    Draws the destination, priority and ADR of each subgroup, plus any extra attribute.
+
+    Args:
+        nSubgroups ([int]): number of subgroups.
+        nDestinations ([int or sequence]): number of destinations used to stablish dst_codes, or the weight of each destination.
+        adrDist ([sequence]): distribution for the packets selected as ADR. [a, b] where a non-ADR and b ADR.
+        priorityDist ([sequence]): distribution for the packets selected as prioritary. [a, b] where a non-prioritary weight and b prioritary weight.
+        rng ([Generator], optional): numpy random generator or seed. Defaults to None.
+        attributeDists ([dict], optional): column name to its distribution, see drawCategorical. Defaults to None.
+
+    Returns:
+        [dict]: column name to the array of values of each subgroup.
     """
     if priorityDist is None:
         priorityDist = [1, 0]
     if adrDist is None:
         adrDist = [1, 0]
+    rng = np.random.default_rng(rng)
+    attributes = {"dstCode": drawCategorical(nDestinations, nSubgroups, rng),
+                  "priority": drawCategorical(priorityDist, nSubgroups, rng),
+                  "ADR": drawCategorical(adrDist, nSubgroups, rng)}
+    for column, distribution in (attributeDists or {}).items():
+        attributes[column] = drawCategorical(distribution, nSubgroups, rng)
+    return attributes
 
-    # Assign a dst_code to each packet, keeping in mind that all the packets inside the same subgroupId should go in the same container.
-    destinations = list(range(nDestinations))
-    data["dstCode"] = data.groupby("subgroupId")["id"].transform(
-        lambda x: random.choice(destinations))
-    data["priority"] = data.groupby("subgroupId")["id"].transform(
-        lambda x: random.choices([0, 1], priorityDist)[0])
-    data["ADR"] = data.groupby("subgroupId")["id"].transform(
-        lambda x: random.choices([0, 1], adrDist)[0])
-    data = data[(data["volume"] >= minVol) & (data["weight"] >= minWeight)]
-    data = data[(data["width"] >= minDim) & (
-        data["height"] >= minDim) & (data["length"] >= minDim)]
-    # Fragility should not be modified, but for the relaxation scenario we can modify it.
-    if not fragility:
-        data["fragility"].values[:] = 0
-    return data
 
+def packetFilterMask(data, minVol=0.001, minWeight=0.1, minDim=5):
+    """
+    Packets big and heavy enough to be part of a scenario.
+    """
+    return ((data["volume"] >= minVol) & (data["weight"] >= minWeight) & (data["width"] >= minDim) &
+            (data["height"] >= minDim) & (data["length"] >= minDim)).to_numpy()
+
+
+class SubgroupIndex:
+    """
+    Per subgroup aggregates of a reference dataset (volume, weight, number of items and whether it is an only item
+    subgroup) along with the rows of each subgroup, stored contiguously. It is built once per reference dataset so that
+    partitions are assembled by gathering the rows of the selected subgroups instead of scanning the whole dataset.
 
-def getPartition(data, subgroupingDist, volume, volumeOffset=1.2, do=True):
+    Subgroups keep the position given by pd.factorize over the whole dataset, also in filtered indexes, so that values
+    drawn per subgroup (see drawSubgroupAttributes) can be indexed the same way in all of them.
+    """
+
+    def __init__(self, data, rowMask=None, subgroupCodes=None, subgroupIds=None):
+        """
+        Args:
+            data ([df]): reference dataset.
+            rowMask ([array], optional): boolean mask of the rows to index. Defaults to all of them.
+        """
+        self.data = data
+        if subgroupCodes is None:
+            subgroupCodes, subgroupIds = pd.factorize(data["subgroupId"])
+        self.subgroupCodes = subgroupCodes
+        self.subgroupIds = subgroupIds
+        rows = np.arange(len(data)) if rowMask is None else np.flatnonzero(rowMask)
+        codes = subgroupCodes[rows]
+        nSubgroups = len(subgroupIds)
+        # Rows grouped by subgroup, keeping the dataset order inside each subgroup.
+        self.memberRows = rows[np.argsort(codes, kind="stable")]
+        self.itemCount = np.bincount(codes, minlength=nSubgroups)
+        self.offsets = np.concatenate([[0], np.cumsum(self.itemCount)])
+        self.volume = np.bincount(codes, weights=data["volume"].to_numpy(dtype=float)[rows], minlength=nSubgroups)
+        self.weight = np.bincount(codes, weights=data["weight"].to_numpy(dtype=float)[rows], minlength=nSubgroups)
+        # Only item subgroups are the ones whose packets all belong to the subgroup product itself.
+        multiItemPackets = (data["subgroupId"] != data["productId"]).to_numpy(dtype=float)[rows]
+        self.onlyItem = np.bincount(codes, weights=multiItemPackets, minlength=nSubgroups) == 0
+        self.filteredIndexes = {}
+
+    def __len__(self):
+        return len(self.subgroupIds)
+
+    def available(self):
+        """
+        Positions of the subgroups with at least one indexed row.
+        """
+        return np.flatnonzero(self.itemCount)
+
+    def filtered(self, minVol=0.001, minWeight=0.1, minDim=5, container=None):
+        """
+        Index restricted to the packets that pass packetFilterMask and, given a container, that fit inside it (see
+        container.feasibilityMask), cached by its parameters.
+        """
+        key = (minVol, minWeight, minDim, container)
+        if key not in self.filteredIndexes:
+            rowMask = packetFilterMask(self.data, minVol, minWeight, minDim)
+            if container is not None:
+                rowMask = rowMask & feasibilityMask(self.data, container)
+            self.filteredIndexes[key] = SubgroupIndex(self.data, rowMask, self.subgroupCodes, self.subgroupIds)
+        return self.filteredIndexes[key]
+
+    def rows(self, selected):
+        """
+        Sorted row positions of the packets of the selected subgroups, in time proportional to their number.
+
+        Args:
+            selected ([array]): positions of the selected subgroups.
+        """
+        selected = np.asarray(selected, dtype=np.int64)
+        lengths = self.itemCount[selected]
+        firstPositions = np.cumsum(lengths) - lengths
+        positions = np.repeat(self.offsets[selected] - firstPositions, lengths) + np.arange(lengths.sum())
+        return np.sort(self.memberRows[positions])
+
+    def gather(self, selected, attributes=None):
+        """
+        Partition made of the packets of the selected subgroups, with normalized ids as getPartition returns it.
+
+        Args:
+            selected ([array]): positions of the selected subgroups.
+            attributes ([dict], optional): column name to the array of values of each subgroup. Defaults to None.
+        """
+        return self.gatherRows(self.rows(selected), attributes)
+
+    def gatherRows(self, rows, attributes=None):
+        """
+        Partition made of the packets at the given sorted row positions, e.g. the rows of several filtered indexes.
+        """
+        partition = self.data.iloc[rows]
+        if attributes:
+            codes = self.subgroupCodes[rows]
+            partition = partition.assign(**{column: values[codes] for column, values in attributes.items()})
+        return assignIDs(partition.drop(columns=["id"]).reset_index(drop=True))
+
+
+@traced()
+def getPartition(data, subgroupingDist, volume, volumeOffset=1.2, do=True, rng=None, index=None):
     """
     Gets a partition of the passed data with given conditions.
 
@@ -55,6 +209,8 @@ def getPartition(data, subgroupingDist, volume, volumeOffset=1.2, do=True):
         volume ([type]): volume of the container.
         volumeOffset (float, optional): Offset to improve approximation on volume. Defaults to 1,2.
         do (bool, optional): If we actually want to do the partition. Defaults to True.
+        rng ([Generator], optional): numpy random generator or seed used to sample the subgroups. Defaults to None.
+        index ([SubgroupIndex], optional): subgroup index of data, reuse it across calls. Defaults to None.
 
     Returns:
         [list]: partition dataset.
@@ -62,16 +218,18 @@ def getPartition(data, subgroupingDist, volume, volumeOffset=1.2, do=True):
 
     """
     if do:
+        rng = np.random.default_rng(rng)
+        if index is None:
+            index = SubgroupIndex(data)
         # Indicates whether it is a only item subgroup (true) or a multiple items subgroup (false).
-        data["NoSubg"] = data.apply(
-            lambda x: x.subgroupId == x.productId, axis=1)
-        subgroupAndTotalVolumeDf = data.groupby(
-            ["subgroupId", "NoSubg"])["volume"].sum().reset_index()
+        available = index.available()
+        onlyItemsSubgroups = available[index.onlyItem[available]]
+        multItemsSubgroups = available[~index.onlyItem[available]]
         # Get the ponderated volume means considering distribution.
-        onlyItemsVolMean = subgroupAndTotalVolumeDf[subgroupAndTotalVolumeDf["NoSubg"]]["volume"].mean(
+        onlyItemsVolMean = index.volume[onlyItemsSubgroups].mean(
         ) * subgroupingDist[0]
-        multItemsVolMean = subgroupAndTotalVolumeDf[subgroupAndTotalVolumeDf["NoSubg"]]["volume"].mean(
-        ) * subgroupingDist[1]
+        multItemsVolMean = index.volume[multItemsSubgroups].mean(
+        ) * subgroupingDist[1] if multItemsSubgroups.size else 0
         meanSubgroupsEstimation = round(
             (volume*volumeOffset)/(onlyItemsVolMean+multItemsVolMean))
         # Estimation of the distribution for only-item subgroups and item with several items.
@@ -79,34 +237,240 @@ def getPartition(data, subgroupingDist, volume, volumeOffset=1.2, do=True):
             subgroupingDist[0] * meanSubgroupsEstimation)
         multItemSubgroupEstimation = round(
             subgroupingDist[1] * meanSubgroupsEstimation)
-        # Get the subgroups ids.
-        onlyItemsSubgroupsId = subgroupAndTotalVolumeDf[subgroupAndTotalVolumeDf["NoSubg"]]["subgroupId"].sample(
-            n=onlyItemSubgroupEstimation)
-        multItemSubgroupsId = subgroupAndTotalVolumeDf[~subgroupAndTotalVolumeDf["NoSubg"]]["subgroupId"].sample(
-            n=multItemSubgroupEstimation)
-        partition = data[data["subgroupId"].isin(
-            pd.concat([onlyItemsSubgroupsId, multItemSubgroupsId]))]
-        return assignIDs(partition.drop(columns=["id", "NoSubg"]).reset_index(drop=True)), round(partition["volume"].sum()/volume, 2)
+        # Get the subgroups.
+        selected = np.concatenate([rng.choice(onlyItemsSubgroups, onlyItemSubgroupEstimation, replace=False),
+                                   rng.choice(multItemsSubgroups, multItemSubgroupEstimation, replace=False)])
+        partition = index.gather(selected)
+        return partition, round(partition["volume"].sum()/volume, 2)
     else:
         return data, round(data["volume"].sum()/volume, 2)
 
 
+@traced()
+def volumeTargetedSelection(volumes, onlyItem, subgroupingDist, minVolume, maxVolume, rng=None, maxAttempts=10, maxSwaps=32, weights=None, minWeight=0, maxWeight=math.inf):
+    """
+    Selects subgroups whose total volume lies within [minVolume, maxVolume] in a single pass: subgroups of both kinds are
+    shuffled and interleaved following subgroupingDist, the shortest prefix reaching the middle of the window is taken
+    and, if the last subgroup overshoots, it is swapped with an unselected subgroup of the same kind that fits.
+    Given the weights, the total weight is then brought within [minWeight, maxWeight] by swapping, one at a time, the
+    densest (or lightest per volume) selected subgroup for the unselected one of its kind that gets it closest to the
+    window while keeping the volume within its own.
+
+    Args:
+        volumes ([array]): total volume of each subgroup.
+        onlyItem ([array]): boolean mask, true for only item subgroups.
+        subgroupingDist ([type]): percentages of [only item subgroup, multiple items in subgroup].
+        minVolume ([float]): minimum total volume.
+        maxVolume ([float]): maximum total volume.
+        rng ([Generator], optional): numpy random generator or seed. Defaults to None.
+        maxAttempts (int, optional): reshuffles allowed before giving up. Defaults to 10.
+        maxSwaps (int, optional): selected subgroups tried for a swap, from the last one backwards, and weight swaps
+            allowed. Defaults to 32.
+        weights ([array], optional): total weight of each subgroup. Defaults to None, the weight is not targeted.
+        minWeight (float, optional): minimum total weight. Defaults to 0.
+        maxWeight (float, optional): maximum total weight. Defaults to no maximum.
+
+    Returns:
+        [array]: positions of the selected subgroups.
+        [dict]: attempts and swaps needed, and estimation of the attempts avoided with respect to rejection sampling.
+    """
+    rng = np.random.default_rng(rng)
+    volumes = np.asarray(volumes, dtype=float)
+    onlyItem = np.asarray(onlyItem, dtype=bool)
+    classes = [(np.flatnonzero(onlyItem), subgroupingDist[0]),
+               (np.flatnonzero(~onlyItem), subgroupingDist[1])]
+    classes = [(members, share) for members, share in classes if share > 0 and members.size]
+    available = sum(volumes[members].sum() for members, _ in classes)
+    if available < minVolume:
+        raise ValueError("Not enough volume in the data to reach " +
+                         str(round(minVolume, 2)) + ", only " + str(round(available, 2)) + " available.")
+    target = (minVolume + maxVolume) / 2
+    for attempt in range(1, maxAttempts + 1):
+        # Each kind takes slots spaced by 1/share, so any prefix keeps the subgrouping distribution.
+        order = np.concatenate([rng.permutation(members) for members, _ in classes])
+        slots = np.concatenate([(np.arange(members.size) + 0.5) / share for members, share in classes])
+        order = order[np.argsort(slots, kind="stable")]
+        cumulative = np.cumsum(volumes[order])
+        cut = min(int(np.searchsorted(cumulative, target)) + 1, order.size)
+        # The previous prefix may be closer to the target, or the only one within the window.
+        if cut > 1 and cumulative[cut - 2] >= minVolume and (cumulative[cut - 1] > maxVolume or target - cumulative[cut - 2] < cumulative[cut - 1] - target):
+            cut -= 1
+        selected, total, swaps = order[:cut].copy(), cumulative[cut - 1], 0
+        if not minVolume <= total <= maxVolume:
+            unselected = order[cut:]
+            for position in range(cut - 1, max(cut - 1 - maxSwaps, -1), -1):
+                removed = selected[position]
+                candidates = unselected[onlyItem[unselected] == onlyItem[removed]]
+                candidates = candidates[np.argsort(volumes[candidates])]
+                candidateVolumes = volumes[candidates]
+                rest = total - volumes[removed]
+                found = np.searchsorted(candidateVolumes, minVolume - rest)
+                if found < candidates.size and rest + candidateVolumes[found] <= maxVolume:
+                    selected[position] = candidates[found]
+                    total, swaps = rest + candidateVolumes[found], 1
+                    break
+        if weights is not None and minVolume <= total <= maxVolume:
+            selected, weightSwaps = weightTargetedSwaps(volumes, weights, onlyItem, order, selected, minVolume, maxVolume,
+                                                        minWeight, maxWeight, maxSwaps)
+            if not minWeight <= weights[selected].sum() <= maxWeight:
+                continue
+        if minVolume <= total <= maxVolume:
+            currentSpan().count(attempts=attempt, swaps=swaps, selected=len(selected))
+            report = {"attempts": attempt, "swaps": swaps,
+                      "avoidedAttempts": max(0, expectedRejectionAttempts(volumes, onlyItem, selected, minVolume, maxVolume) - attempt)}
+            if weights is not None:
+                report["weightSwaps"] = weightSwaps
+                currentSpan().count(weightSwaps=weightSwaps)
+            return selected, report
+    currentSpan().count(attempts=maxAttempts)
+    raise ValueError("Could not reach a total volume within [" + str(round(minVolume, 2)) + ", " +
+                     str(round(maxVolume, 2)) + "]" + ("" if weights is None else " and a total weight within [" +
+                                                       str(round(minWeight, 2)) + ", " + str(round(maxWeight, 2)) + "]") +
+                     " after " + str(maxAttempts) + " attempts.")
+
+
+def weightTargetedSwaps(volumes, weights, onlyItem, order, selected, minVolume, maxVolume, minWeight, maxWeight, maxSwaps=32):
+    """
+    Swaps selected subgroups for unselected ones of the same kind until the total weight lies within
+    [minWeight, maxWeight], keeping the total volume within [minVolume, maxVolume], see volumeTargetedSelection.
+
+    Returns:
+        [array]: positions of the selected subgroups.
+        [int]: swaps done.
+    """
+    selected = selected.copy()
+    isSelected = np.zeros(volumes.size, dtype=bool)
+    isSelected[selected] = True
+    totalVolume, totalWeight = volumes[selected].sum(), weights[selected].sum()
+    swaps = 0
+    while swaps < maxSwaps and not minWeight <= totalWeight <= maxWeight:
+        tooHeavy = totalWeight > maxWeight
+        density = weights[selected] / np.maximum(volumes[selected], 1e-9)
+        position = np.argmax(density) if tooHeavy else np.argmin(density)
+        removed = selected[position]
+        # Unselected subgroups in shuffled order, so that ties are broken at random.
+        candidates = order[~isSelected[order] & (onlyItem[order] == onlyItem[removed])]
+        newVolumes = totalVolume - volumes[removed] + volumes[candidates]
+        newWeights = totalWeight - weights[removed] + weights[candidates]
+        distances = np.maximum(minWeight - newWeights, 0) + np.maximum(newWeights - maxWeight, 0)
+        improves = (minVolume <= newVolumes) & (newVolumes <= maxVolume) & \
+            (distances < max(minWeight - totalWeight, totalWeight - maxWeight))
+        if not improves.any():
+            break
+        best = np.flatnonzero(improves)[np.argmin(distances[improves])]
+        added = candidates[best]
+        selected[position] = added
+        isSelected[removed], isSelected[added] = False, True
+        totalVolume, totalWeight = newVolumes[best], newWeights[best]
+        swaps += 1
+    return selected, swaps
+
+
+def expectedRejectionAttempts(volumes, onlyItem, selected, minVolume, maxVolume):
+    """
+    Estimates how many partitions of the same size getPartition would draw, on average, before landing within the
+    volume window. Normal approximation with the mean in the middle of the window, which is the best case for it.
+    """
+    variance = 0
+    for kind in [True, False]:
+        members = volumes[onlyItem == kind]
+        if members.size > 1:
+            variance += np.count_nonzero(onlyItem[selected] == kind) * members.var()
+    if variance == 0:
+        return 1
+    halfWindow = (maxVolume - minVolume) / 2 / np.sqrt(2 * variance)
+    probability = math.erf(halfWindow)
+    return int(round(1 / probability)) if probability > 0 else 0
+
+
+@traced()
+def sampleVolumeTargetedPartition(data, subgroupingDist, volume, volRatioBounds, rng=None, index=None, attributes=None):
+    """
+    Gets a partition of the passed data whose volume ratio lies within volRatioBounds, without the rejection loop over
+    getPartition.
+
+    Args:
+        data ([type]): dataset.
+        subgroupingDist ([type]): percentages of [only item subgroup, multiple items in subgroup]
+        volume ([type]): volume of the container.
+        volRatioBounds ([list]): max and min values for the volume ratio.
+        rng ([Generator], optional): numpy random generator or seed used to sample the subgroups. Defaults to None.
+        index ([SubgroupIndex], optional): subgroup index of data, reuse it across calls. Defaults to None.
+        attributes ([dict], optional): values of each subgroup to add to the partition, see SubgroupIndex.gather. Defaults to None.
+
+    Returns:
+        [list]: partition dataset.
+        [float]: volume ratio.
+        [dict]: sampling report, see volumeTargetedSelection.
+    """
+    if index is None:
+        index = SubgroupIndex(data)
+    available = index.available()
+    selected, report = volumeTargetedSelection(index.volume[available], index.onlyItem[available], subgroupingDist,
+                                               volRatioBounds[0] * volume, volRatioBounds[1] * volume, rng)
+    partition = index.gather(available[selected], attributes)
+    return partition, round(partition["volume"].sum()/volume, 2), report
+
+
+@traced()
+def sampleContainerPartition(index, containers, subgroupingDist, volRatioBounds, weightRatioBounds=None, rng=None, attributes=None, minVol=0.001, minWeight=0.1, minDim=5):
+    """
+    Gets a partition of the reference data for one or several containers in one pass. Each container takes, out of the
+    subgroups not taken yet, subgroups whose packets fit inside it (see container.feasibilityMask) with a volume ratio
+    within volRatioBounds and a weight ratio, with respect to its payload, within weightRatioBounds.
+
+    Args:
+        index ([SubgroupIndex]): subgroup index of the reference data.
+        containers ([list]): containers of the scenario, see container.Container.
+        subgroupingDist ([type]): percentages of [only item subgroup, multiple items in subgroup].
+        volRatioBounds ([list]): max and min values for the volume ratio of each container.
+        weightRatioBounds ([list], optional): max and min values for the weight ratio of each container. Defaults to [0, 1].
+        rng ([Generator], optional): numpy random generator or seed used to sample the subgroups. Defaults to None.
+        attributes ([dict], optional): values of each subgroup to add to the partition, see SubgroupIndex.gather. Defaults to None.
+        minVol, minWeight, minDim (optional): packet filters, see packetFilterMask.
+
+    Returns:
+        [df]: partition dataset.
+        [float]: volume ratio with respect to the total volume of the containers.
+        [dict]: sampling report, the sum of the reports of each container (see volumeTargetedSelection) along with them.
+    """
+    if weightRatioBounds is None:
+        weightRatioBounds = [0, 1]
+    rng = np.random.default_rng(rng)
+    taken = np.zeros(len(index), dtype=bool)
+    rows, reports = [], []
+    for container in containers:
+        containerIndex = index.filtered(minVol, minWeight, minDim, container)
+        available = containerIndex.available()
+        available = available[~taken[available]]
+        selected, report = volumeTargetedSelection(containerIndex.volume[available], containerIndex.onlyItem[available], subgroupingDist,
+                                                   volRatioBounds[0] * container.volume, volRatioBounds[1] * container.volume, rng,
+                                                   weights=containerIndex.weight[available], minWeight=weightRatioBounds[0] * container.maxWeight,
+                                                   maxWeight=weightRatioBounds[1] * container.maxWeight)
+        taken[available[selected]] = True
+        rows.append(containerIndex.rows(available[selected]))
+        reports.append(report)
+    partition = index.gatherRows(np.sort(np.concatenate(rows)), attributes)
+    report = {k: sum(r[k] for r in reports) for k in reports[0]}
+    if len(reports) > 1:
+        report["containers"] = reports
+    return partition, round(partition["volume"].sum()/sum(c.volume for c in containers), 2), report
+
+
+@traced()
 def getStats(data):
     """
     This function gets relevant stats like number of unique dimensions or destinations.
 
     Args:
-        data ([type]): dataFrame
+        data ([type]): dataFrame or packet table.
     """
-    data = dataFeasibleOrientationsTupleSerializer(data)
     destinations = data["dstCode"].nunique()
     # Consider unique dimension if ordered by value in descending order (dim1, dim2, dim3)
     # being dim any of [width, height, length].
-    data["dimensionUnique"] = data.apply(lambda x: tuple(
-        sorted([x["width"], x["height"], x["length"]], reverse=True)), 1)
-    uniqueDim = data.groupby(["dimensionUnique"]).ngroups
+    uniqueDim = np.unique(dimensionKeys(data)).shape[0]
     ADRcount = data[data["ADR"] == 1].shape[0]
-    priorityCount = data[data["priority"] == 1].shape[0]
+    priorityCount = data[data["priority"] > 0].shape[0]
     fragilityCount = data[data["fragility"] == 1].shape[0]
     nPackets = data.shape[0]
     nOrders = data.groupby(["subgroupId"]).ngroups
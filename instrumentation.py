@@ -0,0 +1,214 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Timers and peak memory of the pipeline steps, written as a JSON trace per run. Tracing is disabled unless startTrace
+# is called or the PACKETS_TRACE environment variable holds the path of the trace (a directory gets one file per run),
+# disabled spans are a shared no-op object and traced functions only check a global before running.
+# Spans record their parent, duration, counts (rows, loop iterations...) and, with memory tracing, the peak traced
+# memory while they ran. Spans opened in worker processes are not collected.
+TRACE_VARIABLE = "PACKETS_TRACE"
+
+
+class NullSpan:
+    """
+    Span returned while tracing is disabled, it ignores everything.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        return False
+
+    def count(self, **counts):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+
+    def __init__(self, trace, name, counts):
+        self.trace = trace
+        self.name = name
+        self.counts = dict(counts)
+        self.parent = None
+        self.peak = 0
+
+    def count(self, **counts):
+        """
+        Sets counts of the span, e.g. count(rows=len(data), attempts=3).
+        """
+        self.counts.update(counts)
+
+    def __enter__(self):
+        trace = self.trace
+        self.parent = trace.stack[-1] if trace.stack else None
+        if trace.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak counter is shared, the one of the parent is kept before restarting it.
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.startMemory = self.peak = current
+        # Position in the trace, parents come before their children.
+        self.index = len(trace.records)
+        trace.records.append(None)
+        trace.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        duration = time.perf_counter() - self.start
+        trace = self.trace
+        trace.stack.pop()
+        record = {"name": self.name, "parent": self.parent.index if self.parent is not None else None,
+                  "start": round(self.start - trace.start, 6), "seconds": round(duration, 6)}
+        if trace.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            record.update(peakMemory=self.peak, memoryDelta=current - self.startMemory)
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, self.peak)
+        if self.counts:
+            record["counts"] = self.counts
+        if excType is not None:
+            record["error"] = excType.__name__
+        trace.records[self.index] = record
+        return False
+
+
+class Trace:
+    """
+    Spans of a run.
+
+    Args:
+        path ([str]): JSON file of the trace, or a directory to write trace-<timestamp>-<pid>.json into.
+        memory (bool, optional): capture the peak memory of every span with tracemalloc, which slows the traced code
+            down. Defaults to True.
+    """
+
+    def __init__(self, path, memory=True):
+        self.path = path
+        self.memory = memory
+        self.pid = os.getpid()
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.stack = []
+        self.records = []
+        self.startedTracemalloc = memory and not tracemalloc.is_tracing()
+        if self.startedTracemalloc:
+            tracemalloc.start()
+
+    def totals(self):
+        """
+        Calls, seconds and summed counts of each span name.
+        """
+        totals = {}
+        for record in self.records:
+            if record is None:
+                continue
+            total = totals.setdefault(record["name"], {"calls": 0, "seconds": 0})
+            total["calls"] += 1
+            total["seconds"] = round(total["seconds"] + record["seconds"], 6)
+            if "peakMemory" in record:
+                total["peakMemory"] = max(total.get("peakMemory", 0), record["peakMemory"])
+            for key, value in record.get("counts", {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total[key] = total.get(key, 0) + value
+        return totals
+
+    def write(self):
+        """
+        Writes the trace, spans still open (e.g. after an error) are left as null.
+
+        Returns:
+            [str]: path of the trace.
+        """
+        path = self.path
+        if os.path.isdir(path):
+            path = os.path.join(path, "trace-" + self.started.strftime('%d%H%M%S') + "-" + str(self.pid) + ".json")
+        trace = {"started": self.started.isoformat(timespec="seconds"), "command": sys.argv,
+                 "seconds": round(time.perf_counter() - self.start, 6), "memory": self.memory,
+                 "totals": self.totals(), "spans": self.records}
+        with open(path, 'w') as f:
+            json.dump(trace, f, indent=2, ensure_ascii=False)
+        return path
+
+
+activeTrace = None
+
+
+def startTrace(path, memory=True):
+    """
+    Starts tracing the run, see Trace.
+    """
+    global activeTrace
+    activeTrace = Trace(path, memory)
+    return activeTrace
+
+
+def stopTrace():
+    """
+    Stops tracing and writes the trace.
+
+    Returns:
+        [str]: path of the trace, None if tracing was not active.
+    """
+    global activeTrace
+    trace, activeTrace = activeTrace, None
+    if trace is None or trace.pid != os.getpid():
+        return None
+    if trace.startedTracemalloc:
+        tracemalloc.stop()
+    return trace.write()
+
+
+def span(name, **counts):
+    """
+    Context manager timing a block, e.g. with span("batch", links=100) as s: ... s.count(packets=n).
+    """
+    if activeTrace is None or activeTrace.pid != os.getpid():
+        return NULL_SPAN
+    return Span(activeTrace, name, counts)
+
+
+def currentSpan():
+    """
+    Innermost open span, to add counts from inside a traced function.
+    """
+    if activeTrace is None or not activeTrace.stack or activeTrace.pid != os.getpid():
+        return NULL_SPAN
+    return activeTrace.stack[-1]
+
+
+def traced(name=None):
+    """
+    Decorator running the function inside a span named after it, with the rows of its first argument if it is a
+    dataframe.
+    """
+    def decorate(function):
+        spanName = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if activeTrace is None:
+                return function(*args, **kwargs)
+            counts = {"rows": len(args[0])} if args and hasattr(args[0], "shape") else {}
+            with span(spanName, **counts):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+if os.environ.get(TRACE_VARIABLE):
+    # Removed so that subprocesses do not write their own trace over this one.
+    startTrace(os.environ.pop(TRACE_VARIABLE))
+    atexit.register(stopTrace)
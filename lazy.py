@@ -0,0 +1,29 @@
+import importlib.util
+import sys
+
+# numpy and pandas take hundreds of milliseconds to import, the modules of this repo import them through lazyImport so
+# that loading them (e.g. the stats helpers in a notebook or a solver process) does not pay for it until an array or a
+# dataframe is actually used.
+
+
+def lazyImport(name):
+    """
+    Imports a module whose code only runs when one of its attributes is first accessed.
+
+    Args:
+        name ([str]): module name, e.g. "pandas".
+
+    Returns:
+        [module]: the module, already loaded if it was imported before.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError("No module named '" + name + "'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
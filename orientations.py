@@ -0,0 +1,159 @@
+import random
+from lazy import lazyImport
+np = lazyImport("numpy")
+
+# Orientation code given the order in which (width, length, height) appear once sorted in descending order,
+# indexed as first*3 + second. Codes follow the same scheme used by determineCurrentOrientation:
+# 1 (w, l, h), 2 (l, w, h), 3 (w, h, l), 4 (l, h, w), 5 (h, w, l), 6 (h, l, w).
+ORIENTATION_BY_PERMUTATION = (0, 1, 3, 2, 0, 4, 5, 6, 0)
+ALL_ORIENTATIONS = [1, 2, 3, 4, 5, 6]
+SPECIAL_ORIENTATIONS = [3, 4, 5, 6]
+# Sorted orientations for each of the 64 possible sets, bit i stands for orientation i + 1.
+ORIENTATIONS_BY_MASK = [tuple(o for o in ALL_ORIENTATIONS if mask >> (o - 1) & 1)
+                        for mask in range(64)]
+
+
+def determineOrientations(width, length, height):
+    """
+    Vectorized version of determineCurrentOrientation, it determines the orientation code of every packet at once.
+
+    Args:
+        width ([array]): widths of the packets.
+        length ([array]): lengths of the packets.
+        height ([array]): heights of the packets.
+
+    Returns:
+        [array]: orientation code (1 to 6) of each packet.
+    """
+    dimensions = np.column_stack([np.asarray(width, dtype=float), np.asarray(
+        length, dtype=float), np.asarray(height, dtype=float)])
+    # Stable sort keeps ties in (width, length, height) order, which is the order in which the row-wise checks resolve them.
+    order = np.argsort(-dimensions, axis=1, kind="stable")
+    return np.array(ORIENTATION_BY_PERMUTATION, dtype=np.int8)[order[:, 0] * 3 + order[:, 1]]
+
+
+def assignOrientations(data):
+    """
+    Adds the 'or' column to the whole dataframe, equivalent to applying determineCurrentOrientation row by row.
+
+    Args:
+        data ([df]): packets dataframe.
+    """
+    data["or"] = determineOrientations(
+        data["width"].to_numpy(), data["length"].to_numpy(), data["height"].to_numpy()).astype(int)
+    return data
+
+
+def rotatedOrientations(orientations):
+    """
+    Gets the next or previous orientation depending on the scheme of rotations, (1, 2), (3, 4) and (5, 6) are rotations.
+
+    Args:
+        orientations ([array]): orientation codes.
+    """
+    orientations = np.asarray(orientations)
+    return np.where(orientations % 2, orientations + 1, orientations - 1)
+
+
+def randomFeasibleOrientations(currentOrientations, rng=None, constrained=True, special=None, orientations=None):
+    """
+    Batch version of createRandomFeasibleOrientations. Half of the packets (on average) keep their current orientation, its
+    rotation and a random orientation with its rotation, the rest keep all the available orientations.
+
+    Args:
+        currentOrientations ([array]): current orientation code of each packet.
+        rng ([Generator], optional): numpy random generator or seed. Defaults to None.
+        constrained (bool, optional): whether to constrain the orientations at all. Defaults to True.
+        special ([array], optional): boolean mask of packets that can only lay on their sides. Defaults to None.
+        orientations ([list], optional): available orientations, it overrides special. Defaults to None.
+
+    Returns:
+        [list]: sorted feasible orientations of each packet.
+    """
+    rng = np.random.default_rng(rng)
+    current = np.asarray(currentOrientations, dtype=np.int64)
+    n = current.shape[0]
+    # Available orientations as a boolean matrix, column i stands for orientation i + 1.
+    available = np.zeros((n, 6), dtype=bool)
+    if orientations is not None:
+        available[:, np.asarray(orientations) - 1] = True
+    else:
+        special = np.zeros(n, dtype=bool) if special is None else np.asarray(
+            special, dtype=bool)
+        available[:, np.asarray(ALL_ORIENTATIONS) - 1] = ~special[:, None]
+        available[:, np.asarray(SPECIAL_ORIENTATIONS) - 1] |= special[:, None]
+    feasible = available.copy()
+    if constrained:
+        # Same coin flip as random.getrandbits(1), one per packet.
+        isConstrained = rng.integers(0, 2, size=n).astype(bool)
+        rows = np.flatnonzero(isConstrained)
+        currentRotated = rotatedOrientations(current[rows])
+        candidates = available[rows].copy()
+        candidates[np.arange(rows.size), current[rows] - 1] = False
+        candidates[np.arange(rows.size), currentRotated - 1] = False
+        # Packets without any other orientation available are left unconstrained.
+        counts = candidates.sum(axis=1)
+        hasCandidates = counts > 0
+        rows, currentRotated = rows[hasCandidates], currentRotated[hasCandidates]
+        candidates, counts = candidates[hasCandidates], counts[hasCandidates]
+        # Uniform pick among the remaining orientations of each packet.
+        picks = np.floor(rng.random(rows.size) * counts).astype(np.int64)
+        randomOrientation = np.argmax(
+            np.cumsum(candidates, axis=1) > picks[:, None], axis=1) + 1
+        constrainedFeasible = np.zeros((rows.size, 6), dtype=bool)
+        for column in [current[rows], currentRotated, randomOrientation, rotatedOrientations(randomOrientation)]:
+            constrainedFeasible[np.arange(rows.size), column - 1] = True
+        feasible[rows] = constrainedFeasible
+    masks = feasible.astype(np.uint8) @ (1 << np.arange(6, dtype=np.uint8))
+    return [list(ORIENTATIONS_BY_MASK[mask]) for mask in masks]
+
+
+def createRandomFeasibleOrientations(data, constrained=True, special=False, orientations=None):
+    """
+    Adds rotated and random feasible orientations to an item.
+
+    Args:
+        data ([type]): dataframe row.
+    """
+    if orientations is None:
+        if not special:
+            orientations = [1, 2, 3, 4, 5, 6]
+        else:
+            orientations = [3, 4, 5, 6]
+    if random.getrandbits(1) and constrained:
+        # Get next or previous depending on the scheme of rotations.
+        currentRotated = data["or"] + 1 if data["or"] % 2 else data["or"] - 1
+        # Get a random orientation from the rest of available orientations.
+        randomOrientation = random.sample(
+            [i for i in orientations if i not in [data["or"], currentRotated]], k=1)
+        randomOrientationRotated = [randomOrientation[0] + 1] if randomOrientation[0] % 2 else [
+            randomOrientation[0] - 1]
+        feasibleOrientations = [data["or"], currentRotated] + \
+            randomOrientation + randomOrientationRotated
+        return sorted(feasibleOrientations)
+    else:
+        return orientations
+
+
+def determineCurrentOrientation(data):
+    """
+    Determine the current orientation provided by the marketplace, based on some predefined orientations.
+
+    Args:
+        data ([type]): dataframe row.
+    """
+    dimensionsOrdered = sorted([data.width, data.height,
+                                data.length], reverse=True)
+    if [data.width, data.length, data.height] == dimensionsOrdered:
+        data["or"] = 1
+    elif [data.length, data.width, data.height] == dimensionsOrdered:
+        data["or"] = 2
+    elif [data.width, data.height, data.length] == dimensionsOrdered:
+        data["or"] = 3
+    elif [data.length, data.height, data.width] == dimensionsOrdered:
+        data["or"] = 4
+    elif [data.height, data.width, data.length] == dimensionsOrdered:
+        data["or"] = 5
+    else:
+        data["or"] = 6
+    return data
@@ -1,19 +1,26 @@
+import io
 import json
 import os
-import pandas as pd
-import random
+import hashlib
+import inspect
 import pathlib
-from generator import generator, getStats, getPartition, assignIDs
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from generator import getStats, assignIDs, sampleVolumeTargetedPartition, sampleContainerPartition, drawSubgroupAttributes, SubgroupIndex
+from container import containersOf
+from catalogue import ScenarioCatalogue
+from description import datasetDescription
+from storage import writeJsonAtomic, writeDataset, readCachedDataset, resolveDatasetPath, DatasetCache, iterJsonRecords, JsonRecordsWriter, EXTENSIONS
+from fragility import assignFragility
+from orientations import assignOrientations, randomFeasibleOrientations
+from instrumentation import traced, currentSpan
 from datetime import datetime
+from lazy import lazyImport
+np = lazyImport("numpy")
+pd = lazyImport("pandas")
 # -------------- Generic functions --------------------------------
 
 
-def assignFragility(data, fragileWords, where="description"):
-    data["fragility"] = data.apply(lambda x: 1 if any(list(
-        map(lambda y: y in fragileWords, x[where].split(" ")))) else 0, axis=1)
-    return data
-
-
 def volumeProcessor(data):
     data["volume"] = data.apply(
         lambda x: round((x["length"]*x["width"]*x["height"])/1000000, 5), axis=1)
@@ -27,208 +34,463 @@ def cilindricalToBox(data):
     Args:
         data ([type]): data to provide a box packaging.
     """
+    if "diameter" not in data.columns:
+        # None of the packets is rounded.
+        return data
     data.loc[data.rounded == 1, ['height', 'width']] = data.diameter
     return data.drop(columns=["diameter"])
 
 
-def createRandomFeasibleOrientations(data, constrained=True, special=False, orientations=None):
+def readDelta(deltaPath):
     """
-    Adds rotated and random feasible orientations to an item.
+    Reads the delta.json written when refreshing a scraped catalogue, see scrapers/responseCache.py.
 
     Args:
-        data ([type]): dataframe row.
-    """
-    if orientations is None:
-        if not special:
-            orientations = [1, 2, 3, 4, 5, 6]
-        else:
-            orientations = [3, 4, 5, 6]
-    if random.getrandbits(1) and constrained:
-        # Get next or previous depending on the scheme of rotations.
-        currentRotated = data["or"] + 1 if data["or"] % 2 else data["or"] - 1
-        # Get a random orientation from the rest of available orientations.
-        randomOrientation = random.sample(
-            [i for i in orientations if i not in [data["or"], currentRotated]], k=1)
-        randomOrientationRotated = [randomOrientation[0] + 1] if randomOrientation[0] % 2 else [
-            randomOrientation[0] - 1]
-        feasibleOrientations = [data["or"], currentRotated] + \
-            randomOrientation + randomOrientationRotated
-        return sorted(feasibleOrientations)
-    else:
-        return orientations
+        deltaPath ([str]): delta path, or None.
 
-
-def determineCurrentOrientation(data):
+    Returns:
+        [tuple]: (replaced subgroups, packets dataframe), None if deltaPath is None.
+    """
+    if deltaPath is None:
+        return None
+    with open(deltaPath, 'r') as f:
+        delta = json.load(f)
+    # Same conversions as reading a whole data.json.
+    packets = pd.read_json(io.StringIO(json.dumps(delta["packets"]))) if len(
+        delta["packets"]) else None
+    return delta["replacedSubgroups"], packets
+
+
+@traced()
+def writeAdapted(data, path, backend, delta=None):
     """
-    Determine the current orientation provided by the marketplace, based on some predefined orientations.
+    Writes an adapted dataset or, given a delta, replaces its subgroups in the existing dataset with the adapted packets.
 
     Args:
-        data ([type]): dataframe row.
-    """
-    dimensionsOrdered = sorted([data.width, data.height,
-                                data.length], reverse=True)
-    if [data.width, data.length, data.height] == dimensionsOrdered:
-        data["or"] = 1
-    elif [data.length, data.width, data.height] == dimensionsOrdered:
-        data["or"] = 2
-    elif [data.width, data.height, data.length] == dimensionsOrdered:
-        data["or"] = 3
-    elif [data.length, data.height, data.width] == dimensionsOrdered:
-        data["or"] = 4
-    elif [data.height, data.width, data.length] == dimensionsOrdered:
-        data["or"] = 5
-    else:
-        data["or"] = 6
-    return data
+        data ([df]): adapted packets, None if the delta does not have any.
+        path ([str]): dataset path.
+        backend ([str]): storage backend, see storage.EXTENSIONS.
+        delta ([tuple], optional): delta as returned by readDelta, for mixed datasets the replaced subgroups are a dict of
+            them by source. Defaults to None.
+    """
+    if delta is not None:
+        current = readCachedDataset(resolveDatasetPath(path))
+        if isinstance(delta[0], dict):
+            # Replaced subgroups of each source of a mixed dataset, see SOURCE_COLUMN.
+            stale = np.zeros(len(current), dtype=bool)
+            for source, subgroups in delta[0].items():
+                stale |= ((current[SOURCE_COLUMN] == source) & current["subgroupId"].isin(subgroups)).to_numpy()
+            current = current[~stale]
+        else:
+            current = current[~current["subgroupId"].isin(delta[0])]
+        data = pd.concat([current, data]) if data is not None else current
+    # Kept in the dataset cache, the mixed stage and the scenarios read it again.
+    writeDataset(assignIDs(data.reset_index(drop=True)), path, backend, cache=True)
 
 
 # ------ Ikea data manipulation ----------------------------------------------------
 ikeaPath = os.path.dirname(__file__) + os.path.sep + 'ikeaData' + os.path.sep
+IKEA_PARAMETERS = {"fragileWords": ["glass", "Glass", "Mirror",
+                                    "mirror", "lamp", "bulb", "LED", "Vase", "Tealight"]}
+# Datasets written by the adaptation, in the order adaptIkea returns them.
+IKEA_OUTPUTS = [ikeaPath + 'ikea-noOrientationConstraints-noDst.json',
+                ikeaPath + 'ikea-orientationConstraints-noDst.json']
 
 
-def ikeaAdaptation():
-    """Generates a dataset of preloaded Ikea data.
-    """
-    ikeaData = pd.read_json(ikeaPath + 'data.json')
+@traced()
+def adaptIkea(ikeaData, rng):
+    """Adapts raw Ikea packets.
+
+    Args:
+        ikeaData ([df]): packets as scraped.
+        rng ([Generator]): numpy random generator for the random feasible orientations.
 
+    Returns:
+        [list]: datasets without and with orientation constraints.
+    """
     # Give fragility based on description and process the data.
-    fragileWordsIkea = ["glass", "Glass", "Mirror",
-                        "mirror", "lamp", "bulb", "LED", "Vase", "Tealight"]
-    ikeaData = volumeProcessor(cilindricalToBox(assignFragility(
-        assignIDs(ikeaData), fragileWordsIkea))).apply(lambda x: determineCurrentOrientation(x), 1)
-    with open(ikeaPath + os.path.sep + 'ikea-noOrientationConstraints-noDst.json', 'w+') as f:
-        ikeaData["f_or"] = ikeaData.apply(
-            lambda x: createRandomFeasibleOrientations(x, constrained=False), 1)
-        json.dump(ikeaData.to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
-    with open(ikeaPath + os.path.sep + 'ikea-orientationConstraints-noDst.json', 'w+') as f:
-        ikeaData["f_or"] = ikeaData.apply(
-            lambda x: createRandomFeasibleOrientations(x), 1)
-        json.dump(ikeaData.to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
+    ikeaData = assignOrientations(volumeProcessor(cilindricalToBox(assignFragility(
+        assignIDs(ikeaData), IKEA_PARAMETERS["fragileWords"]))))
+    noOrientationConstraints = ikeaData.assign(f_or=randomFeasibleOrientations(
+        ikeaData["or"], rng, constrained=False))
+    orientationConstraints = ikeaData.assign(
+        f_or=randomFeasibleOrientations(ikeaData["or"], rng))
+    return [noOrientationConstraints, orientationConstraints]
+
+
+@traced()
+def ikeaAdaptation(seed=None, backend="json", deltaPath=None):
+    """Generates a dataset of preloaded Ikea data.
+
+    Args:
+        seed (int, optional): seed for the random feasible orientations. Defaults to None.
+        backend (str, optional): storage backend of the generated datasets, see storage.EXTENSIONS. Defaults to "json".
+        deltaPath (str, optional): delta of a refresh of the scraped data, only its packets are adapted and replace their
+            subgroups in the existing datasets. Defaults to None.
+    """
+    rng = np.random.default_rng(seed)
+    delta = readDelta(deltaPath)
+    ikeaData = pd.read_json(ikeaPath + 'data.json') if delta is None else delta[1]
+    # A delta with only removals has no packets to adapt.
+    adapted = adaptIkea(ikeaData, rng) if ikeaData is not None else [None] * len(IKEA_OUTPUTS)
+    for data, path in zip(adapted, IKEA_OUTPUTS):
+        writeAdapted(data, path, backend, delta)
 
 
 # -------------- Mediamarkt data manipulation -------------------------------
 mmPath = os.path.dirname(__file__) + os.path.sep + \
     'mediamarktData' + os.path.sep
+MEDIAMARKT_PARAMETERS = {"fragileWords": ["Monitores", "Figuras", "Iluminación inteligente", "TV"],
+                         "excludedDescriptions": ["Juguetes sexuales"], "minWeight": 0.001, "minVolume": 0.000125,
+                         "maxVolume": 15, "minDensity": 100, "maxWeight": 300}
+# Datasets written by the adaptation, in the order adaptMediamarkt returns them.
+MEDIAMARKT_OUTPUTS = [mmPath + 'mm-orientationConstraints-noDst.json',
+                      mmPath + 'mm-noOrientationConstraints-noDst.json']
 
 
-def mediamarktAdaptation():
-    """Generates a dataset of preloaded Mediamarkt data.
-    """
-    mmData = pd.read_json(mmPath + 'data.json')
+@traced()
+def adaptMediamarkt(mmData, rng):
+    """Adapts raw Mediamarkt packets.
 
+    Args:
+        mmData ([df]): packets as scraped.
+        rng ([Generator]): numpy random generator for the random feasible orientations.
+
+    Returns:
+        [list]: datasets with and without orientation constraints.
+    """
+    parameters = MEDIAMARKT_PARAMETERS
     # Bit of cleaning.
     mmData["description"] = mmData.apply(lambda x: x["description"].strip(), 1)
     mmData["name"] = mmData.apply(
         lambda x: x["name"].replace('&quot;', '')[:-6].strip(), 1)
 
     # Give fragility based on description and process the data.
-    fragileWordsMediamarkt = ["Monitores",
-                              "Figuras", "Iluminación inteligente", "TV"]
-    mmData = volumeProcessor(assignFragility(assignIDs(mmData), fragileWordsMediamarkt, "name")).apply(
-        lambda x: determineCurrentOrientation(x), 1)
+    mmData = assignOrientations(volumeProcessor(assignFragility(
+        assignIDs(mmData), parameters["fragileWords"], "name")))
     mmData.loc[(mmData["description"].str.contains("TV") | mmData["description"].str.contains("Monitores")) & ~(mmData["description"].str.contains(
         "Series") | mmData["description"].str.contains("Antena")) & ((mmData["or"] == 1) | (mmData["or"] == 2)), "or"] = 3
     mmData = cleanDensityMistakes(
-        mmData[mmData["description"] != "Juguetes sexuales"])
-    mmData = mmData[(mmData["weight"] >= 0.001) & (mmData["volume"] < 15) & (
-        mmData["volume"] > 0.000125)]
-    with open(mmPath + os.path.sep + 'mm-orientationConstraints-noDst.json', 'w+') as f:
-        def checkSpecial(description):
-            special = any(list(map(lambda x: x in description, ["TV", "Monitores"]))) and all(
-                list(map(lambda x: x not in description, ["Antena", "Series"])))
-            return special
-        mmData["f_or"] = mmData.apply(
-            lambda x: createRandomFeasibleOrientations(x, special=checkSpecial(x["description"])), 1)
-        json.dump(assignIDs(mmData.reset_index(drop=True)).to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
-    with open(mmPath + os.path.sep + 'mm-noOrientationConstraints-noDst.json', 'w+') as f:
-        mmData["f_or"] = mmData.apply(
-            lambda x: createRandomFeasibleOrientations(x, constrained=False), 1)
-        json.dump(assignIDs(mmData.reset_index(drop=True)).to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
+        mmData[~mmData["description"].isin(parameters["excludedDescriptions"])], parameters["minDensity"], parameters["maxWeight"])
+    mmData = mmData[(mmData["weight"] >= parameters["minWeight"]) & (mmData["volume"] < parameters["maxVolume"]) & (
+        mmData["volume"] > parameters["minVolume"])]
+    # Screens can only lay on their sides.
+    special = (mmData["description"].str.contains("TV", regex=False) | mmData["description"].str.contains("Monitores", regex=False)) & ~(
+        mmData["description"].str.contains("Antena", regex=False) | mmData["description"].str.contains("Series", regex=False))
+    orientationConstraints = mmData.assign(f_or=randomFeasibleOrientations(
+        mmData["or"], rng, special=special.to_numpy()))
+    noOrientationConstraints = mmData.assign(f_or=randomFeasibleOrientations(
+        mmData["or"], rng, constrained=False))
+    return [orientationConstraints, noOrientationConstraints]
+
+
+@traced()
+def mediamarktAdaptation(seed=None, backend="json", deltaPath=None):
+    """Generates a dataset of preloaded Mediamarkt data.
+
+    Args:
+        seed (int, optional): seed for the random feasible orientations. Defaults to None.
+        backend (str, optional): storage backend of the generated datasets, see storage.EXTENSIONS. Defaults to "json".
+        deltaPath (str, optional): delta of a refresh of the scraped data, only its packets are adapted and replace their
+            subgroups in the existing datasets. Defaults to None.
+    """
+    rng = np.random.default_rng(seed)
+    delta = readDelta(deltaPath)
+    mmData = pd.read_json(mmPath + 'data.json') if delta is None else delta[1]
+    # A delta with only removals has no packets to adapt.
+    adapted = adaptMediamarkt(mmData, rng) if mmData is not None else [None] * len(MEDIAMARKT_OUTPUTS)
+    for data, path in zip(adapted, MEDIAMARKT_OUTPUTS):
+        writeAdapted(data, path, backend, delta)
 
 
 # -------------- Mixed data ----------------------------------------------------
-pathlib.Path(os.path.dirname(__file__) + os.path.sep +
-             'mixedData').mkdir(parents=True, exist_ok=True)
 mixedPath = os.path.dirname(__file__) + os.path.sep + \
     'mixedData' + os.path.sep
 
 
-def cleanDensityMistakes(data):
+MIXED_PARAMETERS = {"minVolume": 0.001, "maxVolume": 10, "minDensity": 100, "maxWeight": 300,
+                    "minWeightNoOrientationConstraints": 0.05, "minWeightOrientationConstraints": 0.01}
+# Mixed packets keep the source they come from, Mediamarkt and Ikea subgroupIds are independent and may coincide, so
+# the delta of a source only replaces its own subgroups. The column is dropped when loading the reference data.
+SOURCE_COLUMN = "source"
+# Mixed datasets and the Mediamarkt and Ikea datasets they are made of.
+MIXED_OUTPUTS = [(mixedPath + 'data-noOrientationConstraints-noDst.json', MEDIAMARKT_OUTPUTS[1], IKEA_OUTPUTS[0], "minWeightNoOrientationConstraints"),
+                 (mixedPath + 'data-orientationConstraints-noDst.json', MEDIAMARKT_OUTPUTS[0], IKEA_OUTPUTS[1], "minWeightOrientationConstraints")]
+
+
+def cleanDensityMistakes(data, minDensity=100, maxWeight=300):
     data["density"] = data[data["volume"] > 0].apply(
         lambda x: x["weight"]/x["volume"], 1)
-    return data[(data["density"] >= 100) & (data["weight"] < 300)].drop(columns=["density"]).reset_index(drop=True)
+    return data[(data["density"] >= minDensity) & (data["weight"] < maxWeight)].drop(columns=["density"]).reset_index(drop=True)
 
 
-def mixedDataAdaptation():
+@traced()
+def mixData(mmData, ikeaData, minWeight):
+    """Mixes adapted Mediamarkt and Ikea packets, either of them can be None.
+
+    Args:
+        mmData ([df]): adapted Mediamarkt packets.
+        ikeaData ([df]): adapted Ikea packets.
+        minWeight ([float]): packets must be heavier than this.
+
+    Returns:
+        [df]: mixed packets without id, along with their SOURCE_COLUMN, None if there are none.
+    """
+    parameters = MIXED_PARAMETERS
+    sources = [d.assign(**{SOURCE_COLUMN: name}) for d, name in [(mmData, "mediamarkt"), (ikeaData, "ikea")]
+               if d is not None and len(d)]
+    if not sources:
+        return None
+    mixedData = pd.concat(sources)
+    mixedData["weight"] = mixedData.apply(
+        lambda x: round(x["weight"], 3), 1)
+    # Drop ridiculous dimensions items
+    mixedData = mixedData[(mixedData["volume"] >= parameters["minVolume"]) & (
+        mixedData["volume"] < parameters["maxVolume"]) & (mixedData["weight"] > minWeight)]
+    if not len(mixedData):
+        return None
+    mixedData = cleanDensityMistakes(
+        mixedData, parameters["minDensity"], parameters["maxWeight"])
+    return mixedData.drop(columns=["id"])
+
+
+@traced()
+def mixedDataAdaptation(backend="json"):
     """Generates a dataset of data from both MediaMarkt and Ikea preloaded data.
+
+    Args:
+        backend (str, optional): storage backend of the generated datasets, see storage.EXTENSIONS. Defaults to "json".
     """
-    with open(mixedPath + 'data-noOrientationConstraints-noDst.json', 'w+') as f:
-        mixedDataNoOrient = pd.concat([pd.read_json(
-            mmPath + 'mm-noOrientationConstraints-noDst.json'), pd.read_json(ikeaPath + 'ikea-noOrientationConstraints-noDst.json')])
-        mixedDataNoOrient["weight"] = mixedDataNoOrient.apply(
-            lambda x: round(x["weight"], 3), 1)
-        # Drop ridiculous dimensions items
-        mixedDataNoOrient = mixedDataNoOrient[(mixedDataNoOrient["volume"] >= 0.001) & (
-            mixedDataNoOrient["volume"] < 10) & (mixedDataNoOrient["weight"] > 0.05)]
-        mixedDataNoOrient = cleanDensityMistakes(mixedDataNoOrient)
-        json.dump(assignIDs(mixedDataNoOrient.drop(columns=["id"]).reset_index(drop=True)).to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
-    with open(mixedPath + 'data-orientationConstraints-noDst.json', 'w+') as f:
-        mixedDataOrient = pd.concat([pd.read_json(
-            mmPath + 'mm-orientationConstraints-noDst.json'), pd.read_json(ikeaPath + 'ikea-orientationConstraints-noDst.json')])
-        mixedDataOrient["weight"] = mixedDataOrient.apply(
-            lambda x: round(x["weight"], 3), 1)
-        # Drop ridiculous dimensions items
-        mixedDataOrient = mixedDataOrient[(mixedDataOrient["volume"] >= 0.001) & (mixedDataOrient["volume"] < 10) & (
-            mixedDataOrient["weight"] > 0.01)]
-        mixedDataOrient = cleanDensityMistakes(mixedDataOrient)
-        json.dump(assignIDs(mixedDataOrient.drop(columns=["id"]).reset_index(drop=True)).to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
+    pathlib.Path(mixedPath).mkdir(parents=True, exist_ok=True)
+    for path, mmDataPath, ikeaDataPath, minWeight in MIXED_OUTPUTS:
+        mixedData = mixData(readCachedDataset(resolveDatasetPath(mmDataPath)), readCachedDataset(
+            resolveDatasetPath(ikeaDataPath)), MIXED_PARAMETERS[minWeight])
+        writeDataset(assignIDs(mixedData.reset_index(drop=True)), path, backend, cache=True)
 
 
-# -------------- Scenarios dataset ------------
-pathlib.Path(os.path.dirname(__file__) + os.path.sep +
-             'scenarios').mkdir(parents=True, exist_ok=True)
+# -------------- Incremental adaptation ------------------------------------------
+# Every stage keeps a manifest next to its datasets with the fingerprint of its parameters, the signature of its inputs
+# and outputs and the fingerprint of every subgroup of its input records. A stage is skipped if nothing changed, and
+# otherwise only the subgroups whose records changed are adapted again, replacing them in the existing datasets.
+# Bump it when the adaptation code changes, so that every stage is computed again.
+ADAPTATION_VERSION = 3
+MANIFEST_FILENAME = 'adaptation-manifest.json'
+
+
+def fingerprint(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def fileSignature(path):
+    """
+    Size and modification time of the preferred version of a dataset, None if it does not exist.
+    """
+    try:
+        path = resolveDatasetPath(path)
+    except FileNotFoundError:
+        return None
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+
+
+def subgroupFingerprints(records):
+    """
+    Fingerprint of the records of each subgroup, as a list of [subgroupId, fingerprint] keeping the id type.
+    """
+    subgroups = {}
+    for record in records:
+        subgroups.setdefault(record["subgroupId"], []).append(record)
+    return [[subgroupId, fingerprint(subgroupRecords)] for subgroupId, subgroupRecords in subgroups.items()]
+
+
+def readManifest(directory):
+    try:
+        with open(directory + MANIFEST_FILENAME, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+@traced()
+def adaptSource(name, directory, adapt, parameters, outputs, seed, backend, force):
+    """
+    Runs the adaptation of a source incrementally.
+
+    Args:
+        name ([str]): source name, for the report.
+        directory ([str]): directory of the source, with its data.json.
+        adapt ([function]): adaptation of a dataframe of raw packets given a random generator.
+        parameters ([dict]): parameters of the adaptation.
+        outputs ([list]): paths of the datasets returned by adapt.
+        seed ([int]): seed of the adaptation.
+        backend ([str]): storage backend of the datasets.
+        force ([bool]): adapt every record again.
+
+    Returns:
+        [tuple]: (replaced subgroups, adapted datasets), replaced subgroups is None if every record was adapted and
+            the datasets are None if the stage was skipped.
+    """
+    manifest = readManifest(directory)
+    parametersFingerprint = fingerprint(
+        [ADAPTATION_VERSION, parameters, seed, backend])
+    inputSignature = fileSignature(directory + 'data.json')
+    valid = not force and manifest is not None and manifest["parameters"] == parametersFingerprint and manifest["outputs"] == [
+        fileSignature(o) for o in outputs]
+    if valid and manifest["input"] == inputSignature:
+        print(name + ": skipped, nothing changed.")
+        currentSpan().count(source=name, skipped=1)
+        return set(), None
+    with open(directory + 'data.json', 'r') as f:
+        records = json.load(f)
+    fingerprints = subgroupFingerprints(records)
+    replaced = None
+    if valid:
+        previous = {json.dumps(s): f for s, f in manifest["subgroups"]}
+        current = {json.dumps(s) for s, _ in fingerprints}
+        changed = set(s for s, f in fingerprints if previous.get(json.dumps(s)) != f)
+        replaced = changed | set(s for s, _ in manifest["subgroups"] if json.dumps(s) not in current)
+        records = [r for r in records if r["subgroupId"] in changed]
+        # New draws for every set of changes, reproducible given the seed.
+        rng = np.random.default_rng(
+            None if seed is None else [seed, int(fingerprint(sorted(map(str, changed)))[:8], 16)])
+        print(name + ": " + str(len(changed)) + " subgroups adapted, " +
+              str(len(replaced) - len(changed)) + " removed.")
+    else:
+        rng = np.random.default_rng(seed)
+        print(name + ": " + str(len(fingerprints)) + " subgroups adapted.")
+    currentSpan().count(source=name, records=len(records), subgroups=len(fingerprints))
+    adapted = [None] * len(outputs)
+    if records:
+        # Same conversions as reading the whole data.json.
+        adapted = adapt(pd.read_json(
+            io.StringIO(json.dumps(records))), rng)
+    delta = None if replaced is None else (sorted(replaced, key=str), None)
+    if replaced is None or replaced:
+        for data, path in zip(adapted, outputs):
+            writeAdapted(data, path, backend, delta)
+    writeJsonAtomic({"parameters": parametersFingerprint, "input": inputSignature, "outputs": [fileSignature(o) for o in outputs],
+                     "subgroups": fingerprints}, directory + MANIFEST_FILENAME)
+    return replaced, adapted
+
+
+@traced()
+def runAdaptation(seed=None, backend="json", force=False):
+    """
+    Adapts the Mediamarkt, Ikea and mixed datasets, only recomputing the stages and records whose inputs changed since
+    the last run. Parameters of the stages are MEDIAMARKT_PARAMETERS, IKEA_PARAMETERS and MIXED_PARAMETERS.
+
+    Args:
+        seed (int, optional): seed for the random feasible orientations. Defaults to None.
+        backend (str, optional): storage backend of the generated datasets, see storage.EXTENSIONS. Defaults to "json".
+        force (bool, optional): compute every stage from scratch. Defaults to False.
+    """
+    sourceOutputs = MEDIAMARKT_OUTPUTS + IKEA_OUTPUTS
+    sourcesBefore = [fileSignature(o) for o in sourceOutputs]
+    mmReplaced, mmAdapted = adaptSource("mediamarkt", mmPath, adaptMediamarkt,
+                                        MEDIAMARKT_PARAMETERS, MEDIAMARKT_OUTPUTS, seed, backend, force)
+    ikeaReplaced, ikeaAdapted = adaptSource("ikea", ikeaPath, adaptIkea,
+                                            IKEA_PARAMETERS, IKEA_OUTPUTS, seed, backend, force)
+    # Mixed stage, its inputs are the datasets of both sources.
+    pathlib.Path(mixedPath).mkdir(parents=True, exist_ok=True)
+    outputs = [o[0] for o in MIXED_OUTPUTS]
+    sourcesAfter = [fileSignature(o) for o in sourceOutputs]
+    manifest = readManifest(mixedPath)
+    parametersFingerprint = fingerprint(
+        [ADAPTATION_VERSION, MIXED_PARAMETERS, backend])
+    valid = not force and manifest is not None and manifest["parameters"] == parametersFingerprint and manifest["outputs"] == [
+        fileSignature(o) for o in outputs]
+    if valid and manifest["input"] == sourcesAfter:
+        print("mixed: skipped, nothing changed.")
+        return
+    # The changes of the sources can only be applied if the mixed datasets were up to date with them before this run.
+    if valid and manifest["input"] == sourcesBefore and mmReplaced is not None and ikeaReplaced is not None:
+        replaced = {"mediamarkt": sorted(mmReplaced, key=str), "ikea": sorted(ikeaReplaced, key=str)}
+        for path, mmDataPath, ikeaDataPath, minWeight in MIXED_OUTPUTS:
+            mixedData = mixData(mmAdapted[MEDIAMARKT_OUTPUTS.index(mmDataPath)] if mmAdapted else None,
+                                ikeaAdapted[IKEA_OUTPUTS.index(ikeaDataPath)] if ikeaAdapted else None, MIXED_PARAMETERS[minWeight])
+            writeAdapted(mixedData, path, backend, (replaced, None))
+        print("mixed: " + str(len(mmReplaced) + len(ikeaReplaced)) + " subgroups adapted.")
+    else:
+        mixedDataAdaptation(backend)
+        print("mixed: adapted.")
+    writeJsonAtomic({"parameters": parametersFingerprint, "input": sourcesAfter, "outputs": [fileSignature(o) for o in outputs]},
+                    mixedPath + MANIFEST_FILENAME)
+
+
+# -------------- Chunked adaptation ------------------------------------------
+# Every transform of the adaptation only depends on the packet itself, so catalogues that do not fit in memory are
+# adapted chunk by chunk, streaming the records from the scraped data.json to the JSON datasets.
+MEASUREMENT_COLUMNS = ["width", "height", "length", "weight", "diameter"]
 
 
-def datasetDescription(dataset, ID):
+def recordsToFrame(records):
     """
-    Generates stats on given dataset.
+    Dataframe of a chunk of raw records, with the conversions of reading a whole data.json.
+    """
+    data = pd.read_json(io.StringIO(json.dumps(records)))
+    # Measurements are floats even if every value of the chunk happens to be integer.
+    return data.astype({c: float for c in MEASUREMENT_COLUMNS if c in data.columns})
+
+
+@traced()
+def adaptInChunks(sourcePath, adapt, outputs, rng, chunkSize):
+    """
+    Adapts a source chunk by chunk, peak memory depends on the chunk size and not on the size of the source.
 
     Args:
-        dataset ([type]): [description]
-        ID ([type]): identification of the dataset (timestamp).
+        sourcePath ([str]): scraped data.json.
+        adapt ([function]): adaptation of a dataframe of raw packets given a random generator.
+        outputs ([list]): paths of the datasets returned by adapt.
+        rng ([Generator]): numpy random generator, shared by the chunks.
+        chunkSize ([int]): records per chunk.
 
     Returns:
-        [type]: object containing relevant descritive data on the dataset.
-    """
-
-    return {"ID": ID,
-            "packets_product": len(dataset),
-            "orders_subgroups": dataset.groupby(["subgroupId"]).ngroups,
-            "unique_dim": dataset.groupby(["dimensionUnique"]).ngroups,
-            "unique_dim_weight": dataset.groupby(["dimensionUnique", "weight"]).ngroups,
-            "max_dim": dataset[["width", "height", "length"]].max().max(), "min_dim": dataset[["width", "height", "length"]].min().min(),
-            "max_w": dataset.weight.max(), "min_w": dataset.weight.min(),
-            "w_mean": round(dataset.weight.mean(), 2), "w_median": round(dataset.weight.median(), 2),
-            "w_std": round(dataset.weight.std(), 2), "t_weight": round(dataset.weight.sum(), 2),
-            "max_v": dataset.volume.max(), "min_v": dataset.volume.min(),
-            "v_mean": round(dataset.volume.mean(), 2), "v_median": round(dataset.volume.median(), 2),
-            "v_std": round(dataset.volume.std(), 2), "t_vol": round(dataset.volume.sum(), 2),
-            "n_dst": dataset.dstCode.unique().shape[0],
-            "n_prio": dataset[dataset["priority"] == 1].shape[0],
-            "n_frag": dataset[dataset["fragility"] == 1].shape[0],
-            "n_adr": dataset[dataset["ADR"] == 1].shape[0],
-            "n_only_item_sub": dataset[dataset["subgroupId"] == dataset["productId"]].shape[0],
-            "n_mult_item_sub": dataset[dataset["subgroupId"] != dataset["productId"]].shape[0],
-            "perc_mult": round(dataset[dataset["subgroupId"] != dataset["productId"]].shape[0]/len(dataset), 2),
-            "perc_unique": round(dataset.groupby(["dimensionUnique"]).ngroups/len(dataset), 2),
-            "perc_prio": round(dataset[dataset["priority"] == 1].shape[0]/len(dataset), 2),
-            }
+        [list]: number of packets of each dataset.
+    """
+    writers = [JsonRecordsWriter(o) for o in outputs]
+    chunks = records = 0
+    try:
+        for chunk in iterJsonRecords(sourcePath, chunkSize):
+            chunks, records = chunks + 1, records + len(chunk)
+            for writer, data in zip(writers, adapt(recordsToFrame(chunk), rng)):
+                writer.write(data)
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    for writer in writers:
+        writer.close()
+    currentSpan().count(chunks=chunks, records=records)
+    return [writer.count for writer in writers]
+
+
+@traced()
+def chunkedAdaptation(seed=None, chunkSize=50000):
+    """
+    Generates the Mediamarkt, Ikea and mixed datasets reading and writing them in chunks of records. Same datasets as
+    ikeaAdaptation, mediamarktAdaptation and mixedDataAdaptation with the JSON backend, except for the random feasible
+    orientations, which are drawn chunk by chunk.
+
+    Args:
+        seed (int, optional): seed for the random feasible orientations. Defaults to None.
+        chunkSize (int, optional): records per chunk. Defaults to 50000.
+    """
+    for name, directory, adapt, outputs in [("mediamarkt", mmPath, adaptMediamarkt, MEDIAMARKT_OUTPUTS),
+                                            ("ikea", ikeaPath, adaptIkea, IKEA_OUTPUTS)]:
+        counts = adaptInChunks(directory + 'data.json', adapt, outputs, np.random.default_rng(seed), chunkSize)
+        print(name + ": " + ", ".join(str(c) for c in counts) + " packets.")
+    pathlib.Path(mixedPath).mkdir(parents=True, exist_ok=True)
+    for path, mmDataPath, ikeaDataPath, minWeight in MIXED_OUTPUTS:
+        with JsonRecordsWriter(path) as writer:
+            # Mediamarkt packets first, as in mixData.
+            for sourcePath, isIkea in [(mmDataPath, False), (ikeaDataPath, True)]:
+                for records in iterJsonRecords(sourcePath, chunkSize):
+                    chunk = [None, pd.DataFrame(records)] if isIkea else [pd.DataFrame(records), None]
+                    writer.write(mixData(*chunk, MIXED_PARAMETERS[minWeight]))
+        print("mixed: " + str(writer.count) + " packets.")
+
+
+# -------------- Scenarios dataset ------------
 
 
 def adjustVolRatio(volRatioBounds, volRatio, volumeOffset):
@@ -249,74 +511,319 @@ def adjustVolRatio(volRatioBounds, volRatio, volumeOffset):
     return volumeOffset
 
 
-def scenarioGeneration(nDestinations, volumeOffset=1.2, volRatioBounds=[1, 1.1], adrDist=None, priorityDist=None, fragility=True, minVol=0.01, option=0, containerVolume=81.6, minDim=10, minWeight=0.1, subgroupsDist=[0.85, 0.15]):
-    """Generate new scenario of packets given a set of parameters.
+scenariosPath = os.path.dirname(
+    __file__) + os.path.sep + 'scenarios' + os.path.sep
+options = ['m', 'mm', 'i']
+
+
+def referencePath(option):
+    """Path of the reference dataset used to generate scenarios.
 
     Args:
-        nDestinations (_type_): number of destinations.
-        volumeOffset (float, optional): Offset to calibrate the volume. Defaults to 1.2.
-        volRatioBounds (list, optional): Ratio bound between the volume of the container and the total dataset volume. Defaults to [1, 1.1].
-        adrDist (_type_, optional): Distribution of dangerous items. Defaults to None.
-        priorityDist (_type_, optional): Distribution of priority items. Defaults to None.
-        fragility (bool, optional): Default fragility activation. Defaults to True.
-        minVol (float, optional): Minimum volume of an item in the scenario. Defaults to 0.01.
-        option (int, optional): Indicator to choose a data set: 0 for mixed, 1 for mediamarkt, 2 for ikea. Defaults to 0.
-        containerVolume (float, optional): Volume of the container. Defaults to 81.6.
-        minDim (int, optional): Minimum dimension. Defaults to 10.
-        minWeight (float, optional): Minimum weight. Defaults to 0.1.
-        subgroupsDist (list, optional): Subgrouping distribution. Defaults to [0.85, 0.15].
+        option (int): Indicator to choose a data set: 0 for mixed, 1 for mediamarkt, 2 for ikea.
     """
     # Definition of the paths.
     mdPath = mixedPath + 'data-orientationConstraints-noDst.json'
     mmdPath = mmPath + 'mm-orientationConstraints-noDst.json'
     idPath = ikeaPath + 'ikea-orientationConstraints-noDst.json'
-    if option == 1 and subgroupsDist[1]:
-        print("Error: Mediamarkt dataset has no subgroupsDist")
-        return
+    return [mdPath, mmdPath, idPath][option]
+
 
-    paths = [mdPath, mmdPath, idPath]
-    actualPath = paths[option]
-    options = ['m', 'mm', 'i']
+@traced()
+def loadReferenceData(option):
+    """Loads the reference dataset used to generate scenarios, from its preferred up to date storage backend.
+    It goes through the dataset cache of storage.py, so scenarios generated by the same process parse it only once.
 
+    Args:
+        option (int): Indicator to choose a data set: 0 for mixed, 1 for mediamarkt, 2 for ikea.
+    """
     # Get the data with the specified path.
-    with open(actualPath, 'r') as f:
-        data = json.load(f)
-    referenceData = pd.DataFrame(data)
-    newData = generator(referenceData, nDestinations,
-                        adrDist, priorityDist, fragility, minVol=minVol, minWeight=minWeight, minDim=minDim)
+    data = readCachedDataset(resolveDatasetPath(referencePath(option)))
+    return data.drop(columns=[SOURCE_COLUMN]) if SOURCE_COLUMN in data.columns else data
+
+
+@traced()
+def buildScenario(referenceData, nDestinations, volumeOffset=1.2, volRatioBounds=[1, 1.1], adrDist=None, priorityDist=None, fragility=True, minVol=0.01, containerVolume=81.6, minDim=10, minWeight=0.1, subgroupsDist=[0.85, 0.15], rng=None, index=None, attributeDists=None, containers=None, weightRatioBounds=None):
+    """Builds a scenario partition out of already loaded reference data, see scenarioGeneration for the arguments.
+    Every random draw comes from rng, so the same reference data, arguments and seed give the same scenario.
+    The partition is drawn directly within volRatioBounds, volumeOffset is legacy and unused: it is only accepted so that
+    the configs recorded in the descriptions of older scenarios keep working.
+    Given containers, containerVolume is ignored and the partition is drawn for them, see generator.sampleContainerPartition.
+    Pass the SubgroupIndex of the reference data as index to reuse it across scenarios, the reference data is not modified.
+
+    Returns:
+        [df]: scenario dataset.
+        [float]: volume ratio.
+        [dict]: sampling report, see volumeTargetedSelection.
+    """
+    rng = np.random.default_rng(rng)
+    if index is None:
+        index = SubgroupIndex(referenceData)
+    # Same draws generator would do, only the ones of the selected subgroups end up in the partition.
+    attributes = drawSubgroupAttributes(
+        len(index), nDestinations, adrDist, priorityDist, rng, attributeDists)
+    # Fragility should not be modified, but for the relaxation scenario we can modify it.
+    if not fragility:
+        attributes["fragility"] = np.zeros(len(index), dtype=int)
 
     # volRatio is specially interesting to know how many packets volume/combinations has the experiment.
     # It is obvious that with a large ratio the algoritm may achieve better results because it allows to have more combinations.
     # However, in real examples this may not be true, that's the importance of this parameter.
-    # Fixed vol ratio number not within the bounds.
-    volRatio = volRatioBounds[1] + 1
-    partition = None
-    # Iterate until getting a partition whose volRatio is acceptable.
-    while not (volRatioBounds[0] <= volRatio <= volRatioBounds[1]):
-        partition, volRatio = getPartition(
-            newData, subgroupsDist, volume=containerVolume, volumeOffset=volumeOffset, do=True)
-        volumeOffset = adjustVolRatio(volRatioBounds, volRatio, volumeOffset)
+    if containers is not None:
+        return sampleContainerPartition(index, containersOf(containers), subgroupsDist, volRatioBounds, weightRatioBounds,
+                                        rng, attributes, minVol, minWeight, minDim)
+    return sampleVolumeTargetedPartition(referenceData, subgroupsDist, containerVolume, volRatioBounds, rng,
+                                         index.filtered(minVol, minWeight, minDim), attributes)
+
+
+@traced()
+def writeScenario(partition, volRatio, option, ID=None, roundName=None, seed=None, config=None, keepDataset=True, samplingReport=None, datasetFormat="json"):
+    """Writes the dataset and the description of a scenario, each of them atomically.
+    The description records the seed and the config, which are enough to regenerate the dataset with regenerateScenario.
 
+    Args:
+        partition ([df]): scenario dataset.
+        volRatio (float): volume ratio of the scenario.
+        option (int): Indicator of the reference data set: 0 for mixed, 1 for mediamarkt, 2 for ikea.
+        ID (str, optional): identification of the scenario. Defaults to the current timestamp.
+        roundName (str, optional): subdirectory of the round the scenario belongs to. Defaults to None.
+        seed (int, optional): seed the scenario was generated with. Defaults to None.
+        config (dict, optional): arguments of scenarioGeneration the scenario was generated with. Defaults to None.
+        keepDataset (bool, optional): whether to write the dataset or only its description. Defaults to True.
+        samplingReport (dict, optional): sampling report of the partition, recorded in the description. Defaults to None.
+        datasetFormat (str, optional): storage backend of the dataset, see storage.EXTENSIONS. Defaults to "json".
+
+    Returns:
+        [str]: path of the dataset.
+        [str]: path of the description.
+    """
     nPackets, nOrders, destinations, uniqueDim, ADRcount, priorityCount, fragilityCount, minVol = getStats(
         partition)
-    filename = datetime.now().strftime('%d%H%M%S') + '-' + str(nPackets) + '-' + str(nOrders) + '-' + str(uniqueDim) + '-' + str(volRatio) + '-' + str(destinations) + \
+    if ID is None:
+        ID = datetime.now().strftime('%d%H%M%S')
+    filename = ID + '-' + str(nPackets) + '-' + str(nOrders) + '-' + str(uniqueDim) + '-' + str(volRatio) + '-' + str(destinations) + \
         '-' + str(ADRcount) + '-' + str(priorityCount) + \
         '-' + str(fragilityCount) + '-' + str(round(minVol, 5)) + \
         '-' + options[option]
     # Dataset directory contains the dataset itself.
-    filenameDataset = filename + '.json'
+    filenameDataset = filename + EXTENSIONS[datasetFormat]
     # Description directory contains relevant data of the dataset for its use in tables and graphs.
     fId = filename.split("-")[0]
     filenameDescription = fId + '.json'
-    scenariosPath = os.path.dirname(
-        __file__) + os.path.sep + 'scenarios' + os.path.sep
-    with open(scenariosPath + os.path.sep + 'datasets' + os.path.sep + filenameDataset, 'w+') as f:
-        json.dump(partition.drop(columns=["f_or", "dimensionUnique"]).to_dict(orient="records"),
-                  f, indent=2, ensure_ascii=False)
-    with open(scenariosPath + os.path.sep + 'description' + os.path.sep + filenameDescription, 'w+') as f:
-        description = datasetDescription(partition, fId)
-        json.dump(description, f, indent=2, ensure_ascii=False)
-
-
-scenarioGeneration(nDestinations=4, volumeOffset=1.13, volRatioBounds=[1, 1.13], adrDist=[1, 0], priorityDist=[
-                   0.94, 0.06], fragility=True, minVol=0.03, option=0, containerVolume=81.6, minDim=25, minWeight=0.3, subgroupsDist=[0.97, 0.03])
+    datasetsPath = scenariosPath + 'datasets' + os.path.sep
+    descriptionPath = scenariosPath + 'description' + os.path.sep
+    if roundName is not None:
+        datasetsPath += roundName + os.path.sep
+        descriptionPath += roundName + os.path.sep
+    pathlib.Path(datasetsPath).mkdir(parents=True, exist_ok=True)
+    pathlib.Path(descriptionPath).mkdir(parents=True, exist_ok=True)
+    if keepDataset:
+        writeDataset(partition.drop(columns=["f_or"]).assign(feasibleOr=partition["f_or"]),
+                     datasetsPath + filenameDataset)
+    description = datasetDescription(partition, fId)
+    if seed is not None:
+        description["seed"] = seed
+        description["config"] = dict(config, option=option)
+        description["referenceHash"] = fileHash(
+            resolveDatasetPath(referencePath(option)))
+    if samplingReport is not None:
+        description["sampling"] = samplingReport
+    if config is not None and config.get("containers") is not None:
+        containers = containersOf(config["containers"])
+        description["containers"] = [c.name for c in containers]
+        description["weight_ratio"] = round(partition["weight"].sum() / sum(c.maxWeight for c in containers), 2)
+    writeJsonAtomic(description, descriptionPath + filenameDescription)
+    return datasetsPath + filenameDataset, descriptionPath + filenameDescription
+
+
+@traced()
+def scenarioGeneration(nDestinations, volumeOffset=1.2, volRatioBounds=[1, 1.1], adrDist=None, priorityDist=None, fragility=True, minVol=0.01, option=0, containerVolume=81.6, minDim=10, minWeight=0.1, subgroupsDist=[0.85, 0.15], seed=None, attributeDists=None, containers=None, weightRatioBounds=None, keepDataset=True, datasetFormat="json"):
+    """Generate new scenario of packets given a set of parameters.
+
+    Args:
+        nDestinations (_type_): number of destinations, or the weight of each destination.
+        volumeOffset (float, optional): Legacy, unused: the partition is drawn within volRatioBounds, see buildScenario. Defaults to 1.2.
+        volRatioBounds (list, optional): Ratio bound between the volume of the container and the total dataset volume. Defaults to [1, 1.1].
+        adrDist (_type_, optional): Distribution of dangerous items. Defaults to None.
+        priorityDist (_type_, optional): Distribution of priority items, one weight per priority level. Defaults to None.
+        fragility (bool, optional): Default fragility activation. Defaults to True.
+        minVol (float, optional): Minimum volume of an item in the scenario. Defaults to 0.01.
+        option (int, optional): Indicator to choose a data set: 0 for mixed, 1 for mediamarkt, 2 for ikea. Defaults to 0.
+        containerVolume (float, optional): Volume of the container. Defaults to 81.6.
+        minDim (int, optional): Minimum dimension. Defaults to 10.
+        minWeight (float, optional): Minimum weight. Defaults to 0.1.
+        subgroupsDist (list, optional): Subgrouping distribution. Defaults to [0.85, 0.15].
+        seed (int, optional): Seed of the scenario, recorded in its description. Defaults to a fresh one.
+        attributeDists (dict, optional): Distributions of extra subgroup level columns, see generator.drawCategorical. Defaults to None.
+        containers (list, optional): Containers of the scenario, as names of container.CONTAINER_TYPES, dicts of their fields
+            or container.Container, a single one or several for a multi-container scenario. Packets that fit in none of
+            their feasible orientations are dropped and volRatioBounds applies to each container. Defaults to None, a
+            single container of containerVolume without dimensions.
+        weightRatioBounds (list, optional): Ratio bound between the total weight and the payload of each container, only with containers. Defaults to [0, 1].
+        keepDataset (bool, optional): set it to false to only write the description, see writeScenario. Defaults to True.
+        datasetFormat (str, optional): storage backend of the dataset, see storage.EXTENSIONS. Defaults to "json".
+    """
+    if option == 1 and subgroupsDist[1]:
+        print("Error: Mediamarkt dataset has no subgroupsDist")
+        return
+    if seed is None:
+        seed = newSeed()
+    config = {"nDestinations": nDestinations, "volumeOffset": volumeOffset, "volRatioBounds": volRatioBounds, "adrDist": adrDist,
+              "priorityDist": priorityDist, "fragility": fragility, "minVol": minVol, "containerVolume": containerVolume,
+              "minDim": minDim, "minWeight": minWeight, "subgroupsDist": subgroupsDist, "attributeDists": attributeDists}
+    if containers is not None:
+        config.update(containers=[c.config() for c in containersOf(containers)], weightRatioBounds=weightRatioBounds)
+    partition, volRatio, samplingReport = buildScenario(
+        loadReferenceData(option), rng=seed, **config)
+    print("Volume ratio " + str(volRatio) + " reached in " + str(samplingReport["attempts"]) + " attempt(s), about " +
+          str(samplingReport["avoidedAttempts"]) + " rejection attempts avoided.")
+    catalogueScenarios([writeScenario(partition, volRatio, option, seed=seed, config=config, keepDataset=keepDataset,
+                                      samplingReport=samplingReport, datasetFormat=datasetFormat)])
+
+
+def catalogueScenarios(paths):
+    """Records written scenarios in the scenario catalogue, see catalogue.py.
+
+    Args:
+        paths (list): (dataset path, description path) of each scenario, None entries are skipped.
+    """
+    try:
+        with ScenarioCatalogue(scenariosPath) as catalogue:
+            for scenarioPaths in paths:
+                if scenarioPaths is not None:
+                    catalogue.record(*scenarioPaths)
+    except sqlite3.Error as e:
+        print("Warning: could not update the scenario catalogue: " + repr(e))
+
+
+def newSeed():
+    """Fresh 64 bits seed drawn from the OS entropy, small enough to be kept in the descriptions.
+    """
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0])
+
+
+# sha256 of every version of the files hashed by the process, keyed by path, size and modification time.
+fileHashes = {}
+
+
+def fileHash(path):
+    """sha256 of a file, used to check that a scenario is regenerated from the same reference data.
+    """
+    key = (os.path.abspath(path),) + DatasetCache.signature(path)
+    if key not in fileHashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fileHashes[key] = digest.hexdigest()
+    return fileHashes[key]
+
+
+def regenerateScenario(description):
+    """Regenerates the dataset of a scenario out of its description (reference data, config and seed).
+
+    Args:
+        description (dict or str): description of the scenario or path to it.
+
+    Returns:
+        [df]: scenario dataset, with the same layout it was written with.
+        [float]: volume ratio.
+    """
+    if isinstance(description, str):
+        with open(description, 'r') as f:
+            description = json.load(f)
+    if "seed" not in description:
+        raise ValueError("Scenario " + str(description["ID"]) +
+                         " was generated without a recorded seed, it cannot be regenerated.")
+    config = dict(description["config"])
+    option = config.pop("option")
+    if fileHash(resolveDatasetPath(referencePath(option))) != description["referenceHash"]:
+        print("Warning: reference data has changed since scenario " +
+              str(description["ID"]) + " was generated, the result will differ.")
+    partition, volRatio, _ = buildScenario(
+        loadReferenceData(option), rng=description["seed"], **config)
+    return partition.drop(columns=["f_or"]).assign(feasibleOr=partition["f_or"]), volRatio
+
+
+# -------------- Batch of scenarios ------------
+# Subgroup indexes of the reference datasets of the batch being generated, inherited by the worker processes.
+sharedReferences = {}
+
+
+def initScenarioWorker(references):
+    sharedReferences.update(references)
+
+
+def scenarioWorker(task):
+    """Generates and writes one scenario of a batch inside a worker process.
+
+    Args:
+        task (tuple): (ID, config, seed, roundName, keepDataset, datasetFormat).
+    """
+    ID, config, seed, roundName, keepDataset, datasetFormat = task
+    config = dict(config)
+    option = config.pop("option", 0)
+    index = sharedReferences[option]
+    partition, volRatio, samplingReport = buildScenario(
+        index.data, rng=seed, index=index, **config)
+    return writeScenario(partition, volRatio, option, ID, roundName, seed, config, keepDataset, samplingReport, datasetFormat)
+
+
+# Arguments of scenarioGeneration set for a whole batch, with the argument of generateScenarios that sets them.
+BATCH_ARGUMENTS = {"seed": "seed", "keepDataset": "writeDatasets", "datasetFormat": "datasetFormat"}
+
+
+@traced()
+def generateScenarios(configs, workers=None, seed=None, roundName=None, writeDatasets=True, datasetFormat="json"):
+    """Generates a batch of scenarios in parallel, loading every reference dataset only once.
+
+    Args:
+        configs (list): keyword arguments of scenarioGeneration for each scenario, except seed, keepDataset and datasetFormat,
+            which are set for the whole batch.
+        workers (int, optional): number of worker processes. Defaults to the number of cpus.
+        seed (int, optional): seed of the whole batch, each scenario gets its own stream out of it. Defaults to None.
+        roundName (str, optional): subdirectory of the round, e.g. 'round4'. Defaults to None.
+        writeDatasets (bool, optional): set it to false to only keep the descriptions, datasets can be regenerated from them. Defaults to True.
+        datasetFormat (str, optional): storage backend of the datasets, see storage.EXTENSIONS. Defaults to "json".
+
+    Returns:
+        [list]: (dataset path, description path) of each generated scenario, None for invalid configs.
+    """
+    # Checked here, a wrong key would only raise in the worker processes, as a TypeError of buildScenario.
+    scenarioKeys = set(inspect.signature(scenarioGeneration).parameters) - set(BATCH_ARGUMENTS)
+    for c in configs:
+        wrongKeys = sorted(set(c) - scenarioKeys)
+        if wrongKeys:
+            raise ValueError("Scenario config keys " + str(wrongKeys) + " are not scenarioGeneration arguments, or are batch "
+                             "arguments of generateScenarios (" + ", ".join(BATCH_ARGUMENTS.values()) + ").")
+    # Containers are kept in the descriptions by name, or as dicts for custom ones.
+    configs = [dict(c, containers=[k.config() for k in containersOf(c["containers"])]) if c.get("containers") is not None else c
+               for c in configs]
+    valid = [not (c.get("option", 0) == 1 and c.get("subgroupsDist", [0.85, 0.15])[1])
+             for c in configs]
+    if not all(valid):
+        print("Error: Mediamarkt dataset has no subgroupsDist, skipping " +
+              str(valid.count(False)) + " scenarios.")
+    references = {o: SubgroupIndex(loadReferenceData(o)) for o in set(
+        c.get("option", 0) for c, v in zip(configs, valid) if v)}
+    seeds = [int(s.generate_state(1, np.uint64)[0])
+             for s in np.random.SeedSequence(seed).spawn(len(configs))]
+    # Unique ids within the batch, scenarios finishing in the same second would collide otherwise.
+    stamp = datetime.now().strftime('%d%H%M%S')
+    tasks = [(stamp + '_' + str(i).zfill(len(str(len(configs)))), c, s, roundName, writeDatasets, datasetFormat)
+             for i, (c, s, v) in enumerate(zip(configs, seeds, valid)) if v]
+    with ProcessPoolExecutor(max_workers=workers, initializer=initScenarioWorker, initargs=(references,)) as pool:
+        results = iter(list(pool.map(scenarioWorker, tasks)))
+    results = [next(results) if v else None for v in valid]
+    catalogueScenarios(results)
+    return results
+
+
+# Scenario this module used to generate whenever it was imported, now generated by running it or with the generate
+# command of the CLI.
+DEFAULT_SCENARIO = {"nDestinations": 4, "volumeOffset": 1.13, "volRatioBounds": [1, 1.13], "adrDist": [1, 0],
+                    "priorityDist": [0.94, 0.06], "fragility": True, "minVol": 0.03, "option": 0, "containerVolume": 81.6,
+                    "minDim": 25, "minWeight": 0.3, "subgroupsDist": [0.97, 0.03]}
+
+if __name__ == "__main__":
+    scenarioGeneration(**DEFAULT_SCENARIO)
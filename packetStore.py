@@ -0,0 +1,159 @@
+from itertools import chain
+from orientations import ORIENTATIONS_BY_MASK
+from lazy import lazyImport
+np = lazyImport("numpy")
+pd = lazyImport("pandas")
+
+# Packet table layout: list columns of feasible orientations become 6-bit masks (bit i stands for orientation i + 1)
+# and the sorted dimensions are stored as fixed-width integers, in hundredths of cm. Small integer columns get the
+# narrowest integer type that holds their values. dimensionUnique, the legacy tuple of sorted dimensions that no stage
+# writes any more, is dropped: dimensionKeys gives the same grouping out of the dimension columns.
+MASK_SUFFIX = "Mask"
+DIMENSION_COLUMNS = ["dim1", "dim2", "dim3"]
+DIMENSION_SCALE = 100
+# Bits used by each sorted dimension when packed into a single key, up to ~20000 cm per dimension.
+DIMENSION_BITS = 21
+ORIENTATIONS_COLUMNS = ["f_or", "feasibleOr"]
+SMALL_INT_COLUMNS = ["rounded", "fragility",
+                     "or", "dstCode", "priority", "ADR"]
+CATEGORY_COLUMNS = ["name", "description"]
+
+
+def feasibleOrientationsToMask(feasibleOrientations):
+    """
+    Encodes lists of feasible orientations as 6-bit masks.
+
+    Args:
+        feasibleOrientations ([sequence]): list of orientations of each packet.
+
+    Returns:
+        [array]: uint8 mask of each packet.
+    """
+    lengths = np.fromiter(map(len, feasibleOrientations), dtype=np.int64, count=len(feasibleOrientations))
+    orientations = np.fromiter(chain.from_iterable(feasibleOrientations), dtype=np.int64, count=int(lengths.sum()))
+    masks = np.zeros(len(feasibleOrientations), dtype=np.uint8)
+    # Bit of every orientation, or-ed into the mask of its packet.
+    np.bitwise_or.at(masks, np.repeat(np.arange(len(masks)), lengths),
+                     np.left_shift(1, orientations - 1).astype(np.uint8))
+    return masks
+
+
+def maskToFeasibleOrientations(masks):
+    """
+    Decodes 6-bit masks into sorted lists of feasible orientations.
+
+    Args:
+        masks ([array]): uint8 mask of each packet.
+    """
+    return [list(ORIENTATIONS_BY_MASK[mask]) for mask in np.asarray(masks)]
+
+
+def smallestIntType(values):
+    """
+    Narrowest signed integer type holding the given integer values, int8 for empty ones.
+    """
+    if not len(values):
+        return np.dtype(np.int8)
+    low, high = int(values.min()), int(values.max())
+    for dtype in [np.int8, np.int16, np.int32]:
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def isPacketTable(data):
+    """
+    Whether the given dataframe is in the packet table layout.
+    """
+    return all(c in data.columns for c in DIMENSION_COLUMNS)
+
+
+def sortedDimensions(data):
+    """
+    Gets the dimensions of each packet in descending order as integers in hundredths of cm.
+
+    Args:
+        data ([df]): packets dataframe or packet table.
+
+    Returns:
+        [array]: (n, 3) int32 array.
+    """
+    if isPacketTable(data):
+        return data[DIMENSION_COLUMNS].to_numpy(dtype=np.int32)
+    dimensions = np.rint(data[["width", "height", "length"]].to_numpy(
+        dtype=float) * DIMENSION_SCALE).astype(np.int32)
+    return -np.sort(-dimensions, axis=1)
+
+
+def dimensionKeys(data):
+    """
+    Integer key of the sorted dimensions of each packet, two packets share a key if they share dimensionUnique.
+
+    Args:
+        data ([df]): packets dataframe or packet table.
+
+    Returns:
+        [array]: int64 key of each packet.
+    """
+    dimensions = sortedDimensions(data).astype(np.int64)
+    return (dimensions[:, 0] << 2 * DIMENSION_BITS) | (dimensions[:, 1] << DIMENSION_BITS) | dimensions[:, 2]
+
+
+def toPacketTable(data):
+    """
+    Converts a packets dataframe in the JSON record layout to the compact packet table layout.
+
+    Args:
+        data ([df]): packets dataframe, as read from any of the generated JSON files.
+
+    Returns:
+        [df]: packet table.
+    """
+    table = data.copy()
+    for column in ORIENTATIONS_COLUMNS:
+        if column in table.columns:
+            position = table.columns.get_loc(column)
+            masks = feasibleOrientationsToMask(table.pop(column).tolist())
+            table.insert(position, column + MASK_SUFFIX, masks)
+    # The tuple column is redundant with the sorted integer dimensions.
+    table = table.drop(columns=["dimensionUnique"], errors="ignore")
+    dimensions = sortedDimensions(table)
+    for i, column in enumerate(DIMENSION_COLUMNS):
+        table[column] = dimensions[:, i]
+    for column in SMALL_INT_COLUMNS:
+        if column in table.columns and table[column].dtype.kind in "biu":
+            table[column] = table[column].astype(smallestIntType(table[column].to_numpy(dtype=np.int64)))
+    if "id" in table.columns and table["id"].dtype.kind in "iu":
+        table["id"] = table["id"].astype(np.promote_types(smallestIntType(table["id"].to_numpy(dtype=np.int64)), np.int32))
+    for column in CATEGORY_COLUMNS:
+        if column in table.columns:
+            table[column] = table[column].astype("category")
+    return table
+
+
+def fromPacketTable(table):
+    """
+    Converts a packet table back to the JSON record layout, lossless with respect to toPacketTable but for the legacy
+    dimensionUnique column, which is not rebuilt.
+
+    Args:
+        table ([df]): packet table.
+
+    Returns:
+        [df]: packets dataframe.
+    """
+    data = table.drop(columns=DIMENSION_COLUMNS)
+    for column in ORIENTATIONS_COLUMNS:
+        if column + MASK_SUFFIX in data.columns:
+            position = data.columns.get_loc(column + MASK_SUFFIX)
+            orientations = maskToFeasibleOrientations(
+                data.pop(column + MASK_SUFFIX))
+            data.insert(position, column, orientations)
+    for column in SMALL_INT_COLUMNS + ["id"]:
+        if column in data.columns and data[column].dtype.kind in "iu":
+            data[column] = data[column].astype(np.int64)
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns and isinstance(data[column].dtype, pd.CategoricalDtype):
+            data[column] = data[column].astype(
+                data[column].cat.categories.dtype)
+    return data
@@ -0,0 +1,90 @@
+import os
+import sys
+from itertools import zip_longest
+from requests.exceptions import HTTPError
+from pipeline import NOT_MODIFIED
+from measurements import normalizePages, appendRejected
+# Instrumentation of the package, see instrumentation.py.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import span  # noqa: E402
+
+# Batch loop of the scrapers, shared by both of them. Pages come out of the scrape pipeline in link order and are
+# grouped in batches, each batch is checked against the link index, its measurements are parsed at once and it is
+# committed in this order: link index, checkpoint, response cache. The link index goes first so that its entries of a
+# batch the checkpoint did not record are dropped when resuming.
+
+
+def grouper(iterable, n, fillvalue=None):
+    args = [iter(iterable)] * n
+    return zip_longest(*args, fillvalue=fillvalue)
+
+
+def recordBatch(parsedSlice, linkIndex, checkpoint, responseCache, nextLinkIndex):
+    """
+    Checks, parses and durably records a batch of pages.
+
+    Args:
+        parsedSlice ([list]): (link, url, result, err, validators) of each page, see ScrapePipeline.run.
+        linkIndex ([LinkIndex]): index of the links being scraped.
+        checkpoint ([ScrapeCheckpoint]): checkpoint of the scraper.
+        responseCache ([ResponseCache]): response cache of the scraper.
+        nextLinkIndex ([int]): index of the first link of the batch.
+
+    Returns:
+        [int]: index of the first link of the next batch.
+    """
+    with span("scrapeBatch") as batchSpan:
+        linksSlice = list(map(lambda x: x[0], parsedSlice))
+        # There is need to verify that the url is currently supported, example of failure (https://www.ikea.com/es/en/p/vattlosa-wall-decoration-home-black-40473610/)
+        wrongResponseLinks = linkIndex.redirected(parsedSlice)
+        if len(wrongResponseLinks):
+            print("There has been an error with an outdated link, it is removed from the links list at the end.")
+
+        pages = []
+        for link, url, result, err, validators in parsedSlice:
+            if link in wrongResponseLinks:
+                continue
+            if err is None and result != NOT_MODIFIED:
+                pages.append((link, validators, result))
+            elif isinstance(err, HTTPError):
+                print(f'HTTP error occurred: {err}')
+            elif err is not None:
+                print(f'Other error occurred: {err}')
+        # Measurements of the whole batch are parsed at once, packets with invalid ones are dropped and reported.
+        pagePackets, rejected = normalizePages([result[1] for _, _, result in pages])
+        appendRejected(checkpoint.dataDirectory, rejected, checkpoint.batches + 1)
+        batchPackets = []
+        for (link, validators, (payloadHash, _)), packets in zip(pages, pagePackets):
+            # Products listed in several sections are only kept once.
+            batchPackets.extend(linkIndex.newPackets(link, packets))
+            responseCache.record(link, validators, payloadHash, packets)
+
+        nextLinkIndex += len(linksSlice)
+        # Recorded first, entries of a batch the checkpoint did not record are dropped when resuming.
+        linkIndex.commit(checkpoint.batches + 1)
+        checkpoint.commitBatch(batchPackets, linksSlice[-1], nextLinkIndex)
+        responseCache.commit()
+        batchSpan.count(links=len(linksSlice), packets=len(batchPackets), outdated=len(wrongResponseLinks),
+                        rejected=len(rejected))
+    return nextLinkIndex
+
+
+def scrapeBatches(links, scrapePipeline, linkIndex, checkpoint, responseCache, batchSize):
+    """
+    Scrapes the links batch by batch, resuming right after the last recorded batch: packets of an unrecorded batch are
+    discarded.
+
+    Args:
+        links ([list]): links of the catalogue, in order.
+        scrapePipeline ([ScrapePipeline]): pipeline whose parse function is a hashedProductBuilder.
+        linkIndex ([LinkIndex]): index of the links, positions, outdated links and scraped subgroups are hashed, so
+            checking a batch does not scan the list of links.
+        checkpoint ([ScrapeCheckpoint]): checkpoint of the scraper.
+        responseCache ([ResponseCache]): response cache of the scraper.
+        batchSize ([int]): pages per batch.
+    """
+    nextLinkIndex = checkpoint.resume(links, linkIndex.positions)
+    linkIndex.load(checkpoint.batches)
+    for parsedSlice in grouper(scrapePipeline.run(links[nextLinkIndex:]), batchSize, None):
+        parsedSlice = list(filter(lambda x: x is not None, parsedSlice))
+        nextLinkIndex = recordBatch(parsedSlice, linkIndex, checkpoint, responseCache, nextLinkIndex)
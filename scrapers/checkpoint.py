@@ -0,0 +1,213 @@
+import json
+import os
+import sys
+# Atomic JSON writes of the package, see storage.py.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import writeJsonAtomic  # noqa: E402
+
+# Scraped packets are appended to <name>.jsonl, one packet per line, and every finished batch of links is recorded in
+# <name>-progress.jsonl with the size of the packets log at that point. Resuming truncates the packets log to the last
+# recorded size, so packets of a batch interrupted before being recorded are scraped again and never duplicated.
+# Compaction writes the usual <name>.json list from the log.
+
+
+def fsyncAppend(f, text):
+    f.write(text.encode() if 'b' in f.mode else text)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class ScrapeCheckpoint:
+    """
+    Append-only output and progress journal of a scraper, I/O per batch only depends on the size of the batch.
+
+    Args:
+        dataDirectory ([str]): directory of the scraped data, e.g. ikeaData.
+        name (str, optional): name of the final dataset. Defaults to "data".
+    """
+
+    def __init__(self, dataDirectory, name="data"):
+        self.dataDirectory = dataDirectory
+        self.packetsPath = os.path.join(dataDirectory, name + '.jsonl')
+        self.journalPath = os.path.join(dataDirectory, name + '-progress.jsonl')
+        self.datasetPath = os.path.join(dataDirectory, name + '.json')
+        # Legacy backup with the last scraped link, only read to resume scrapes started before the journal existed.
+        self.legacyBackupPath = os.path.join(dataDirectory, 'from.json')
+        self.packetsFile = None
+        self.journalFile = None
+        self.batches = 0
+        self.packetCount = 0
+        self.lastLink = None
+        self.nextLinkIndex = 0
+
+    # -------------- Journal ---------------------------------
+
+    def readJournal(self):
+        """
+        Last complete entry of the journal, a partially written trailing line is ignored.
+        """
+        last = None
+        if not os.path.exists(self.journalPath):
+            return last
+        with open(self.journalPath, 'r') as f:
+            for line in f:
+                try:
+                    last = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+        return last
+
+    def rewriteJournal(self, entry):
+        """
+        Atomically replaces the journal with a single entry, or with an empty one if entry is None.
+        """
+        tmpPath = self.journalPath + '.tmp'
+        with open(tmpPath, 'w') as f:
+            fsyncAppend(f, json.dumps(entry, ensure_ascii=False) + '\n' if entry is not None else "")
+        os.replace(tmpPath, self.journalPath)
+
+    def migrateLegacy(self):
+        """
+        Seeds the packets log and the journal from a data.json and from.json pair written by the previous scrapers.
+        """
+        if not (os.path.exists(self.legacyBackupPath) and os.path.exists(self.datasetPath)):
+            return None
+        try:
+            with open(self.legacyBackupPath, 'r') as f:
+                lastLink = json.load(f)[0]["link"]
+            with open(self.datasetPath, 'r') as f:
+                packets = json.load(f)
+        except (ValueError, KeyError, IndexError):
+            print("Could not read the previous backup, starting the scrape from scratch.")
+            return None
+        packets = [p for p in packets if p is not None]
+        with open(self.packetsPath, 'wb') as f:
+            fsyncAppend(f, "".join(json.dumps(p, ensure_ascii=False) + '\n' for p in packets))
+        entry = {"batch": 0, "packets": len(packets), "offset": os.path.getsize(self.packetsPath),
+                 "lastLink": lastLink, "nextLinkIndex": None}
+        self.rewriteJournal(entry)
+        print("Migrated the previous backup to the progress journal.")
+        return entry
+
+    def resume(self, links, positions=None):
+        """
+        Restores the state of the last recorded batch and opens the log for appending.
+
+        Args:
+            links ([list]): links being scraped, in order.
+            positions ([dict], optional): link to its position in links, e.g. LinkIndex.positions, so that the last
+                scraped link is located without scanning the list. Defaults to None.
+
+        Returns:
+            [int]: index of the first link not scraped yet.
+        """
+        os.makedirs(self.dataDirectory, exist_ok=True)
+        entry = self.readJournal() or self.migrateLegacy()
+        offset = 0
+        if entry is not None:
+            self.batches, self.packetCount, offset = entry["batch"], entry["packets"], entry["offset"]
+            self.lastLink = entry["lastLink"]
+            # The link itself locates the position even if the list of links was edited since then.
+            position = positions.get(self.lastLink) if positions is not None else (
+                links.index(self.lastLink) if self.lastLink in links else None)
+            if position is not None:
+                self.nextLinkIndex = position + 1
+            elif entry["nextLinkIndex"] is not None:
+                self.nextLinkIndex = min(entry["nextLinkIndex"], len(links))
+            else:
+                print("Last scraped link not found, starting the scrape from scratch.")
+                entry = None
+                self.batches, self.packetCount, offset, self.nextLinkIndex = 0, 0, 0, 0
+        # Drop whatever was appended after the last recorded batch. Truncating never extends the log: one shorter than
+        # recorded (e.g. restored from an older copy) is kept up to its last complete packet instead of padded with NULs.
+        size = os.path.getsize(self.packetsPath) if os.path.exists(self.packetsPath) else 0
+        if offset > size:
+            print("The packets log is shorter than recorded, resuming from its last complete packet.")
+            offset, self.packetCount = self.completePackets()
+            entry = dict(entry, packets=self.packetCount, offset=offset)
+        if offset < size:
+            with open(self.packetsPath, 'r+b') as f:
+                f.truncate(offset)
+        self.packetsFile = open(self.packetsPath, 'ab')
+        # Rewriting the journal also drops a partially written trailing line, later entries would be unreadable after it.
+        self.rewriteJournal(entry)
+        self.journalFile = open(self.journalPath, 'a')
+        return self.nextLinkIndex
+
+    def completePackets(self):
+        """
+        Size and number of the complete lines of the packets log, a partially written trailing line is left out.
+        """
+        if not os.path.exists(self.packetsPath):
+            return 0, 0
+        with open(self.packetsPath, 'rb') as f:
+            content = f.read()
+        offset = content.rfind(b'\n') + 1
+        return offset, content.count(b'\n', 0, offset)
+
+    def commitBatch(self, packets, lastLink, nextLinkIndex):
+        """
+        Appends the packets of a finished batch and records it in the journal, both durably.
+
+        Args:
+            packets ([list]): packets scraped in the batch, None values are skipped.
+            lastLink ([str]): last link of the batch.
+            nextLinkIndex ([int]): index of the first link of the next batch.
+        """
+        packets = [p for p in packets if p is not None]
+        fsyncAppend(self.packetsFile, "".join(json.dumps(p, ensure_ascii=False) + '\n' for p in packets))
+        self.batches += 1
+        self.packetCount += len(packets)
+        self.lastLink, self.nextLinkIndex = lastLink, nextLinkIndex
+        entry = {"batch": self.batches, "packets": self.packetCount, "offset": self.packetsFile.tell(),
+                 "lastLink": lastLink, "nextLinkIndex": nextLinkIndex}
+        fsyncAppend(self.journalFile, json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def replace(self, packets, lastLink, nextLinkIndex):
+        """
+        Replaces the log with the given packets as a single finished batch, e.g. after refreshing the catalogue.
+        """
+        self.close()
+        packets = [p for p in packets if p is not None]
+        tmpPath = self.packetsPath + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            fsyncAppend(f, "".join(json.dumps(p, ensure_ascii=False) + '\n' for p in packets))
+        os.replace(tmpPath, self.packetsPath)
+        self.batches, self.packetCount = 1, len(packets)
+        self.lastLink, self.nextLinkIndex = lastLink, nextLinkIndex
+        self.rewriteJournal({"batch": 1, "packets": len(packets), "offset": os.path.getsize(self.packetsPath),
+                             "lastLink": lastLink, "nextLinkIndex": nextLinkIndex})
+
+    def close(self):
+        for f in [self.packetsFile, self.journalFile]:
+            if f is not None:
+                f.close()
+        self.packetsFile = self.journalFile = None
+
+    # -------------- Compaction ---------------------------------
+
+    def compact(self):
+        """
+        Writes the recorded packets as the final JSON list, atomically, and shortens the journal to its last entry.
+
+        Returns:
+            [int]: number of packets in the dataset.
+        """
+        entry = self.readJournal()
+        offset = entry["offset"] if entry is not None else 0
+        packets = []
+        with open(self.packetsPath, 'rb') as f:
+            # Split on newlines only: str.splitlines also breaks on characters such as \u2028 that names may contain.
+            for line in f.read(offset).split(b'\n'):
+                if line:
+                    packets.append(json.loads(line))
+        writeJsonAtomic(packets, self.datasetPath)
+        if entry is not None:
+            reopen = self.journalFile is not None
+            if reopen:
+                self.journalFile.close()
+            self.rewriteJournal(entry)
+            if reopen:
+                self.journalFile = open(self.journalPath, 'a')
+        return len(packets)
+
@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class FetchEngine:
+    """
+    Shared HTTP fetch engine of the scrapers: a persistent pool of workers, each with its own keep-alive Session, a sliding
+    window of requests in flight and a cap on the concurrent requests to the same host.
+
+    Args:
+        maxInFlight (int, optional): requests in flight at any time, it is also the number of workers. Defaults to 32.
+        maxPerHost (int, optional): concurrent requests to the same host. Defaults to 16.
+        timeout (tuple, optional): (connect, read) timeouts in seconds. Defaults to (5, 30).
+        retries (int, optional): retries of failed connections, see urllib3. Defaults to 2.
+        headers ([dict], optional): headers added to every request. Defaults to None.
+    """
+
+    def __init__(self, maxInFlight=32, maxPerHost=16, timeout=(5, 30), retries=2, headers=None):
+        self.maxInFlight = maxInFlight
+        self.maxPerHost = maxPerHost
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = headers or {}
+        self.pool = ThreadPoolExecutor(max_workers=maxInFlight)
+        self.local = threading.local()
+        self.sessions = []
+        self.hostSlots = {}
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        for session in self.sessions:
+            session.close()
+
+    def session(self):
+        """
+        Session of the current worker, Sessions are not shared between threads.
+        """
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            # A single worker never uses more than one connection per host at once.
+            adapter = HTTPAdapter(pool_connections=8,
+                                  pool_maxsize=1, max_retries=self.retries)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def hostSlot(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.hostSlots:
+                self.hostSlots[host] = threading.BoundedSemaphore(
+                    self.maxPerHost)
+            return self.hostSlots[host]
+
+    def get(self, url, **kwargs):
+        """
+        Blocking GET through the pooled Session of the calling worker, within the per-host cap.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        with self.hostSlot(url):
+            return self.session().get(url, **kwargs)
+
+    def fetchAll(self, urls, maxBuffered=None, requestOptions=None, **kwargs):
+        """
+        Fetches the urls keeping maxInFlight requests in flight, a slow page delays the pages after it from being yielded
+        but not from being fetched, up to maxBuffered pages waiting for it.
+
+        Args:
+            urls ([iterable]): urls to fetch, consumed lazily.
+            maxBuffered ([int], optional): finished pages kept waiting for a slower one. Defaults to 4 * maxInFlight.
+            requestOptions ([function], optional): url to extra keyword arguments of its request, e.g. conditional
+                headers. Defaults to None.
+
+        Yields:
+            [tuple]: (url, response, error) in the order of urls, exactly one of response and error is None.
+        """
+        maxBuffered = 4 * self.maxInFlight if maxBuffered is None else maxBuffered
+        urls = enumerate(urls)
+        inFlight, finished = {}, {}
+        nextToYield, exhausted = 0, False
+        while True:
+            # Fill the window, unless too many pages are already waiting for the next one to be yielded.
+            while not exhausted and len(inFlight) < self.maxInFlight and len(finished) < maxBuffered:
+                item = next(urls, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    options = dict(kwargs, **requestOptions(item[1])) if requestOptions else kwargs
+                    inFlight[self.pool.submit(
+                        self.get, item[1], **options)] = item
+            if not inFlight and nextToYield not in finished:
+                return
+            if nextToYield not in finished:
+                done, _ = wait(list(inFlight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    position, url = inFlight.pop(future)
+                    try:
+                        finished[position] = (url, future.result(), None)
+                    except Exception as err:
+                        finished[position] = (url, None, err)
+            while nextToYield in finished:
+                yield finished.pop(nextToYield)
+                nextToYield += 1
@@ -0,0 +1,112 @@
+import html
+import json
+import re
+
+# Product pages are parsed in worker processes, this module has no import-time side effects and BeautifulSoup is only
+# imported by the fallbacks.
+# Only the opening tag of the product information section is located, it carries the packaging data as JSON.
+PRODUCT_SECTION_TAG = re.compile(
+    rb'<div\b[^>]*\bclass="js-product-information-section range-revamp-product-information-section"[^>]*>')
+INITIAL_PROPS_ATTRIBUTE = re.compile(rb'\bdata-initial-props="([^"]*)"')
+# Measurement of each label of the packaging, and the usual order of the measurements of box and cylindrical ones.
+MEASUREMENT_LABELS = {"Width": "width", "Height": "height", "Length": "length", "Weight": "weight", "Diameter": "diameter"}
+BOX_FIELDS = ["width", "height", "length", "weight"]
+ROUNDED_FIELDS = ["length", "weight", "diameter"]
+
+
+# --------------------- Mappping functions ---------------------------------
+
+
+def productToPackets(packageData, subgroupId):
+    """
+    Packets of a package, one per unit, with the measurements as scraped (e.g. "24 cm"), they are parsed by batches,
+    see measurements.py.
+    """
+    measurements = packageData['measurements'][0]
+    rounded = "Diameter" in list(map(lambda x: x["label"], measurements))
+    fields = [MEASUREMENT_LABELS.get(m["label"].strip().rstrip(":")) for m in measurements]
+    if None in fields or len(set(fields)) != len(fields):
+        # Unknown labels, the measurements are in the usual order.
+        fields = ROUNDED_FIELDS if rounded else BOX_FIELDS
+    packets = []
+    for i in range(packageData['quantity']['value']):
+        packet = {}
+        packet["id"] = ""
+        packet["name"] = packageData["name"]
+        packet["description"] = packageData["typeName"]
+        packet["productId"] = int(
+            packageData["articleNumber"]["value"].translate({ord("."): None}))
+        packet["subgroupId"] = subgroupId
+        packet["rounded"] = int(rounded)
+        for field, measurement in zip(fields, measurements):
+            packet[field] = measurement["value"]
+        packets.append(packet)
+    return packets
+
+
+def packagingToPackets(packagingDataSource):
+    packagingData = packagingDataSource['productDetailsProps'][
+        'accordionObject']['packaging']['contentProps']['packages']
+    # Get the names of the subproducts.
+    packets = []
+    subgroupId = int(packagingData[0]['articleNumber']
+                     ['value'].translate({ord("."): None}))
+    # Case where there are several product forming a product itself.
+    if len(packagingData) > 1:
+        # Got to do this distiction because first 'measurements' key is empty in a combined product.
+        for i in packagingData[1:]:
+            packets.extend(productToPackets(i, subgroupId))
+    else:
+        packets.extend(productToPackets(packagingData[0], subgroupId))
+    return packets
+
+
+def extractPayload(content):
+    """
+    Gets the data-initial-props attribute of the product information section without building the DOM, it is the only
+    part of the page the packets depend on.
+
+    Args:
+        content ([bytes]): product page.
+
+    Returns:
+        [str]: packaging data source as JSON, None if the section is not found.
+    """
+    tag = PRODUCT_SECTION_TAG.search(content)
+    attribute = INITIAL_PROPS_ATTRIBUTE.search(
+        tag.group(0)) if tag is not None else None
+    if attribute is not None:
+        return html.unescape(attribute.group(1).decode())
+    # Unusual markup, e.g. unquoted attributes, fall back to the full parser.
+    from bs4 import BeautifulSoup as bsp
+    section = bsp(content, 'html.parser').find(
+        'div', class_="js-product-information-section range-revamp-product-information-section")
+    return section.get('data-initial-props') if section is not None else None
+
+
+def payloadToPackets(payload):
+    return packagingToPackets(json.loads(payload))
+
+
+def productBuilder(content):
+    """
+    Packets of a product page.
+
+    Args:
+        content ([bytes]): product page.
+    """
+    return payloadToPackets(extractPayload(content))
+
+
+def soupProductBuilder(content):
+    """
+    Former productBuilder, it parses the whole page with BeautifulSoup.
+
+    Args:
+        content ([bytes]): product page.
+    """
+    from bs4 import BeautifulSoup as bsp
+    soup = bsp(content, 'html.parser')
+    packagingDataSource = json.loads(soup.find(
+        'div', class_="js-product-information-section range-revamp-product-information-section").get('data-initial-props'))
+    return packagingToPackets(packagingDataSource)
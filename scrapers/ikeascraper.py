@@ -1,20 +1,25 @@
-import requests
-import json
-from bs4 import BeautifulSoup as bsp
 from requests.exceptions import HTTPError
 import os
 import pathlib
-from concurrent.futures import ThreadPoolExecutor
-from itertools import zip_longest
+from checkpoint import ScrapeCheckpoint
+from fetcher import FetchEngine
+import sys
+from functools import partial
+from pipeline import ScrapePipeline
+from responseCache import ResponseCache, hashedProductBuilder, refreshCatalogue
+from linkIndex import LinkIndex
+from batch import scrapeBatches
+import ikeaParser
 
 # ---------------------- Links related functions --------------------------------------------
 
 
-def getFullListOfProducts():
+def getFullListOfProducts(fetchEngine):
+    from bs4 import BeautifulSoup as bsp
     # Scraping ikea means going by Section (Muebles) -> Subsection (Camas) -> Subsubsection (Camas tapizadas) -> Products (TUFJORD)
     # Fetch the whole products list.
     try:
-        mainPage = requests.get(
+        mainPage = fetchEngine.get(
             'https://www.ikea.com/es/en/cat/productos-products/')
         mainPage.raise_for_status()
     except HTTPError as http_err:
@@ -34,7 +39,7 @@ def getFullListOfProducts():
     def getProductsFromMainSection(sectionId):
         maxProducts = 50000
         try:
-            sectionProducts = requests.get(
+            sectionProducts = fetchEngine.get(
                 "https://sik.search.blue.cdtapps.com/es/en/product-list-page/more-products?category=" + sectionId + "&start=0&end=" + str(maxProducts))
         except HTTPError as http_err:
             print(f'HTTP error occurred: {http_err}')
@@ -65,74 +70,8 @@ def updateLinks(links):
             file.write(s + '\n')
 
 
-try:
-    productsLinks = fetchLinks()
-except:
-    print("Creating a new list of all the links in the ikea page.")
-    getFullListOfProducts()
-    productsLinks = fetchLinks()
-    print("Fetched all links.")
-
-# --------------------- Mappping functions ---------------------------------
-
-
-def productToPackets(packageData, subgroupId):
-    packets = []
-    for i in range(packageData['quantity']['value']):
-        packet = {}
-        packet["id"] = ""
-        packet["name"] = packageData["name"]
-        packet["description"] = packageData["typeName"]
-        packet["productId"] = int(
-            packageData["articleNumber"]["value"].translate({ord("."): None}))
-        packet["subgroupId"] = subgroupId
-        if "Diameter" in list(map(lambda x: x["label"], packageData['measurements'][0])):
-            packet["rounded"] = 1
-            packet["length"], packet["weight"], packet["diameter"] = list(
-                map(lambda x: x["value"].split(" ")[0], packageData["measurements"][0]))
-        else:
-            packet["rounded"] = 0
-            packet["width"], packet["height"], packet["length"], packet["weight"] = list(
-                map(lambda x: x["value"].split(" ")[0], packageData["measurements"][0]))
-        packets.append(packet)
-    return packets
-
-
-def productBuilder(linkResponse):
-    soup = bsp(linkResponse.content, 'html.parser')
-    packagingDataSource = json.loads(soup.find(
-        'div', class_="js-product-information-section range-revamp-product-information-section").get('data-initial-props'))
-    packagingData = packagingDataSource['productDetailsProps'][
-        'accordionObject']['packaging']['contentProps']['packages']
-    # Get the names of the subproducts.
-    packets = []
-    subgroupId = int(packagingData[0]['articleNumber']
-                     ['value'].translate({ord("."): None}))
-    # Case where there are several product forming a product itself.
-    if len(packagingData) > 1:
-        # Got to do this distiction because first 'measurements' key is empty in a combined product.
-        for i in packagingData[1:]:
-            packets.extend(productToPackets(i, subgroupId))
-    else:
-        packets.extend(productToPackets(packagingData[0], subgroupId))
-    return packets
-
-
 # -------------- Main --------------------------------------
-mainPacketsList = []
-dataFilename = os.path.dirname(
-    __file__) + os.path.sep + 'ikeaData' + os.path.sep + 'data.json'
-backupFilename = os.path.dirname(
-    __file__) + os.path.sep + 'ikeaData' + os.path.sep + 'from.json'
-
 
-def get_url(url):
-    return requests.get(url)
-
-
-def grouper(iterable, n, fillvalue=None):
-    args = [iter(iterable)] * n
-    return zip_longest(*args, fillvalue=fillvalue)
 
 # ----- Scrapper API altenative ---------------
 # def get_url_ScrapperAPI(payload):
@@ -144,55 +83,66 @@ def grouper(iterable, n, fillvalue=None):
 maxApiConcurrentCalls = os.cpu_count()*5
 
 
-def chargeCurrentMaxLinkIndex():
+def main(refresh=False):
+    """
+    Scrapes the whole catalogue, resuming right after the last recorded batch.
+
+    Args:
+        refresh (bool, optional): update the list of links and refresh the scraped catalogue with conditional requests
+            instead, writing the delta as well. Defaults to False.
+    """
+    # Shared by every request of the scraper, it keeps the connections to the site alive.
+    fetchEngine = FetchEngine(maxInFlight=maxApiConcurrentCalls)
+    if refresh:
+        print("Updating the list of all the links in the ikea page.")
+        getFullListOfProducts(fetchEngine)
     try:
-        with open(os.path.dirname(__file__) + os.path.sep + 'ikeaData' + os.path.sep + 'from.json', 'r') as f:
-            currentMaxLinkIndex = productsLinks.index(
-                json.load(f)[0]["link"]) + 1
-        return currentMaxLinkIndex
+        productsLinks = fetchLinks()
     except:
-        return 0
-
-
-currentStartingLinkIndex = chargeCurrentMaxLinkIndex()
-# Reload current extracted data.
-if currentStartingLinkIndex:
-    with open(os.path.dirname(__file__) + os.path.sep + 'ikeaData' + os.path.sep + 'data.json', 'r') as f:
-        mainPacketsList = json.load(f)
-for linksSlice in grouper(productsLinks[currentStartingLinkIndex:], maxApiConcurrentCalls, None):
-    # ---------- Scraper API alternative, slow unfortunatelly --------------------
-    # Configure ScrapperAPI
-    # Create an account in ScrapperAPI and get the API key. It is valid for 5k requests.
-    #apiKey = '<value>' if count < apikeyChangerPivot else '<value>'
-    #payloads = list(map(lambda x: {'api_key': apiKey, 'url': x}, linksSlice))
-    linksSlice = list(filter(lambda x: x is not None, linksSlice))
-    responses = []
-    try:
-        with ThreadPoolExecutor(max_workers=maxApiConcurrentCalls) as pool:
-            responses = list(pool.map(get_url, linksSlice))
-    except HTTPError as http_err:
-        print(f'HTTP error occurred: {http_err}')
-    except Exception as err:
-        print(f'Other error occurred: {err}')
-
-    # There is need to verify that the url is currently supported, example of failure (https://www.ikea.com/es/en/p/vattlosa-wall-decoration-home-black-40473610/)
-    wrongResponseLinks = list(
-        filter(lambda x: x not in linksSlice, list(map(lambda y: y.url, responses))))
-    actualProductLinks = productsLinks
-    if len(wrongResponseLinks):
-        print("There has been an error with an outdated link.")
-        responses = list(
-            filter(lambda x: x.url not in wrongResponseLinks, responses))
-        actualProductLinks = list(
-            filter(lambda x: x not in wrongResponseLinks, productsLinks))
-        updateLinks(productsLinks)
-        print("Links list updated, remove outdated link.")
-
-    for i in responses:
-        mainPacketsList.extend(productBuilder(i))
-
-    with open(dataFilename, 'w+') as file:
-        json.dump(mainPacketsList, file, indent=2, ensure_ascii=False)
-    with open(backupFilename, 'w+') as file:
-        backup = [{"link": linksSlice[-1]}]
-        json.dump(backup, file, indent=2, ensure_ascii=False)
+        print("Creating a new list of all the links in the ikea page.")
+        getFullListOfProducts(fetchEngine)
+        productsLinks = fetchLinks()
+        print("Fetched all links.")
+
+    # Packets are appended to ikeaData/data.jsonl batch by batch, data.json is compacted from it at the end.
+    checkpoint = ScrapeCheckpoint(os.path.dirname(
+        __file__) + os.path.sep + 'ikeaData')
+    # Packets of a page along with the hash of its packaging payload, kept in the response cache for later refreshes.
+    productBuilder = partial(
+        hashedProductBuilder, ikeaParser.extractPayload, ikeaParser.payloadToPackets)
+    responseCache = ResponseCache(checkpoint.dataDirectory)
+    # Pages are fetched with a sliding window of requests in flight and parsed in other processes meanwhile, the batches
+    # only delimit the checkpoints.
+    scrapePipeline = ScrapePipeline(fetchEngine, productBuilder)
+    if refresh:
+        delta = refreshCatalogue(productsLinks, responseCache,
+                                 scrapePipeline, checkpoint, maxApiConcurrentCalls)
+        fetchEngine.close()
+        print(scrapePipeline.report())
+        print(f"Refreshed {len(productsLinks)} links: {delta['added']} added, {delta['changed']} changed, {delta['removed']} removed, "
+              f"{delta['unchanged']} unchanged ({delta['notModified']} not modified), {delta['failed']} failed, "
+              f"{delta['rejected']} measurements rejected.")
+    else:
+        # ---------- Scraper API alternative, slow unfortunatelly --------------------
+        # Configure ScrapperAPI
+        # Create an account in ScrapperAPI and get the API key. It is valid for 5k requests.
+        #apiKey = '<value>' if count < apikeyChangerPivot else '<value>'
+        #payloads = list(map(lambda x: {'api_key': apiKey, 'url': x}, linksSlice))
+        # Resume right after the last recorded batch, packets of an unrecorded batch are discarded.
+        linkIndex = LinkIndex(checkpoint.dataDirectory, productsLinks)
+        scrapeBatches(productsLinks, scrapePipeline, linkIndex, checkpoint, responseCache, maxApiConcurrentCalls)
+
+        fetchEngine.close()
+        checkpoint.close()
+        print(scrapePipeline.report())
+        print("Scraped " + str(checkpoint.compact()) + " packets.")
+        currentLinks = linkIndex.currentLinks()
+        if len(currentLinks) < len(productsLinks):
+            updateLinks(currentLinks)
+            print("Links list updated, removed " + str(len(productsLinks) - len(currentLinks)) + " outdated links.")
+        responseCache.publish(currentLinks)
+
+
+if __name__ == "__main__":
+    # Run with the refresh argument to refresh a scraped catalogue with conditional requests, writing the delta as well.
+    main(len(sys.argv) > 1 and sys.argv[1] == "refresh")
@@ -0,0 +1,122 @@
+import json
+import os
+from checkpoint import fsyncAppend
+
+# Hashed index of the links being scraped and of the subgroups already scraped, shared by both scrapers. Membership and
+# position checks are dictionary lookups, so checking a batch only depends on the size of the batch.
+# Every subgroup belongs to the first link it was scraped from, the packets other links give for it (e.g. a product
+# listed in several sections) are dropped. Owners and outdated links are appended to <dataDirectory>/link-index.jsonl
+# one line per batch, numbered as the batches of the checkpoint, so that they survive resumed scrapes.
+
+
+class LinkIndex:
+    """
+    Args:
+        dataDirectory ([str]): directory of the scraped data.
+        links ([list]): links being scraped, in order.
+    """
+
+    def __init__(self, dataDirectory, links):
+        self.path = os.path.join(dataDirectory, 'link-index.jsonl')
+        self.links = links
+        # Reversed so that the first position of a repeated link wins, as with list.index.
+        self.positions = dict(zip(reversed(links), range(len(links) - 1, -1, -1)))
+        self.subgroupOwners = {}
+        self.outdated = set()
+        self.pendingOwners = {}
+        self.pendingOutdated = []
+
+    def __contains__(self, link):
+        return link in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def position(self, link):
+        """
+        Position of the link in the list of links, None if it is not in it.
+        """
+        return self.positions.get(link)
+
+    # -------------- Persistence ---------------------------------
+
+    def load(self, batches):
+        """
+        Restores the owners and the outdated links of the first batches, those of later (unrecorded) batches are dropped.
+
+        Args:
+            batches ([int]): batches recorded by the checkpoint, see ScrapeCheckpoint.resume.
+        """
+        entries = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written trailing line.
+                        break
+                    if entry["batch"] <= batches:
+                        entries.append(entry)
+        for entry in entries:
+            self.subgroupOwners.update((subgroupId, link) for subgroupId, link in entry["subgroups"])
+            self.outdated.update(entry["outdated"])
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'w') as f:
+            fsyncAppend(f, "".join(json.dumps(e, ensure_ascii=False) + '\n' for e in entries))
+        os.replace(tmpPath, self.path)
+
+    def commit(self, batch):
+        """
+        Durably appends the owners and outdated links recorded since the last commit as those of the given batch, to be
+        called before recording the batch in the checkpoint.
+        """
+        entry = {"batch": batch, "subgroups": list(map(list, self.pendingOwners.items())), "outdated": self.pendingOutdated}
+        with open(self.path, 'a') as f:
+            fsyncAppend(f, json.dumps(entry, ensure_ascii=False) + '\n')
+        self.pendingOwners = {}
+        self.pendingOutdated = []
+
+    # -------------- Checks ---------------------------------
+
+    def redirected(self, parsedSlice):
+        """
+        Links of a batch whose response was redirected to a page that is not a link of the catalogue, e.g. an outdated
+        product redirected to its section. They are marked as outdated.
+
+        Args:
+            parsedSlice ([list]): (link, url, result, error, validators) of each page, as the pipeline yields them.
+
+        Returns:
+            [set]: redirected links.
+        """
+        redirected = set(link for link, url, *_ in parsedSlice
+                         if url is not None and url != link and url not in self.positions)
+        self.pendingOutdated.extend(sorted(redirected - self.outdated))
+        self.outdated |= redirected
+        return redirected
+
+    def newPackets(self, link, packets):
+        """
+        Packets of the subgroups that no other link has given yet, the link becomes the owner of their subgroups.
+
+        Args:
+            link ([str]): link the packets were scraped from.
+            packets ([list]): packets of the link, None values are skipped.
+        """
+        kept = []
+        for packet in packets:
+            if packet is None:
+                continue
+            subgroupId = packet["subgroupId"]
+            if subgroupId not in self.subgroupOwners:
+                self.subgroupOwners[subgroupId] = self.pendingOwners[subgroupId] = link
+            if self.subgroupOwners[subgroupId] == link:
+                kept.append(packet)
+        return kept
+
+    def currentLinks(self):
+        """
+        Links without the outdated ones, in order.
+        """
+        return [link for link in self.links if link not in self.outdated]
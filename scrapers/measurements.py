@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+# Lazy imports of the package, see lazy.py.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lazy import lazyImport  # noqa: E402
+np = lazyImport("numpy")
+pd = lazyImport("pandas")
+
+# The parsers keep the measurements of the packets as scraped, e.g. "12,5 cm" or "800 g", and the scrapers parse those
+# of a whole batch at once with vectorised string operations into float32 columns in cm and kg. Packets with a missing
+# or invalid measurement are dropped and reported, along with the reason, in <dataDirectory>/rejected-measurements.jsonl.
+# Values without a unit are taken in cm and kg, which is how packets were stored before, so parsing already parsed
+# packets (e.g. those of the response cache) gives them back unchanged.
+LENGTH_UNITS = {"": 1, "mm": 0.1, "cm": 1, "m": 100}
+MASS_UNITS = {"": 1, "g": 0.001, "gr": 0.001, "kg": 1}
+MEASUREMENT_UNITS = {"width": LENGTH_UNITS, "height": LENGTH_UNITS, "length": LENGTH_UNITS, "weight": MASS_UNITS,
+                     "diameter": LENGTH_UNITS}
+# Number with a decimal point or comma, thousands separators allowed, and an optional unit, possibly abbreviated.
+MEASUREMENT_PATTERN = r"^\s*(\d+(?:[.,]\d+)*)\s*([a-z]*)\.?\s*$"
+# Every separator but the last one is a thousands separator.
+THOUSANDS_SEPARATOR = r"[.,](?=.*[.,])"
+REJECTED_FILENAME = 'rejected-measurements.jsonl'
+
+
+def requiredMeasurements(rounded):
+    """
+    Boolean mask of the packets that need each measurement: cylindrical packagings have a diameter instead of a width
+    and a height.
+    """
+    return {"width": ~rounded, "height": ~rounded, "length": np.ones(rounded.size, dtype=bool),
+            "weight": np.ones(rounded.size, dtype=bool), "diameter": rounded}
+
+
+def parseMeasurements(packets):
+    """
+    Parses the measurements of a batch of packets.
+
+    Args:
+        packets ([list]): packets with their measurements as scraped.
+
+    Returns:
+        [df]: float32 column of each measurement, in cm and kg, NaN where missing or rejected, a row per packet.
+        [df]: rejected measurements: position of the packet, field, raw value and reason.
+    """
+    raw = pd.DataFrame([{field: p.get(field) for field in MEASUREMENT_UNITS} for p in packets],
+                       columns=list(MEASUREMENT_UNITS), dtype=object)
+    rounded = np.array([p.get("rounded") == 1 for p in packets], dtype=bool)
+    required = requiredMeasurements(rounded)
+    parsed, rejected = {}, []
+    for field, units in MEASUREMENT_UNITS.items():
+        column = raw[field]
+        text = column.astype(str).str.strip().str.lower()
+        missing = column.isna().to_numpy() | (text == "").to_numpy()
+        parts = text.str.extract(MEASUREMENT_PATTERN)
+        numbers = pd.to_numeric(parts[0].str.replace(THOUSANDS_SEPARATOR, "", regex=True).str.replace(",", ".", regex=False),
+                                errors="coerce").to_numpy(dtype=float)
+        factors = parts[1].map(units).to_numpy(dtype=float)
+        values = (numbers * factors).astype(np.float32)
+        reasons = np.select([missing, np.isnan(numbers), np.isnan(factors), ~(values > 0)],
+                            ["missing", "not a number", "unknown unit", "not positive"], "")
+        invalid = reasons != ""
+        values[invalid] = np.nan
+        parsed[field] = values
+        for position in np.flatnonzero(invalid & required[field]):
+            value = column.iat[position]
+            rejected.append((position, field, value if isinstance(value, str) or not missing[position] else None,
+                             str(reasons[position])))
+    parsed = pd.DataFrame(parsed)
+    # Placeholder packaging of products without actual dimensions.
+    placeholder = ((parsed["width"] == 1) & (parsed["height"] == 1) & (parsed["length"] == 1)).to_numpy()
+    for position in np.flatnonzero(placeholder):
+        rejected.append((position, "width", raw["width"].iat[position], "placeholder"))
+    rejected = pd.DataFrame(rejected, columns=["position", "field", "value", "reason"]).sort_values(
+        "position", kind="stable").reset_index(drop=True)
+    return parsed, rejected
+
+
+def normalizeMeasurements(packets):
+    """
+    Packets of a batch with their measurements parsed, see parseMeasurements.
+
+    Args:
+        packets ([list]): packets with their measurements as scraped, None values are skipped.
+
+    Returns:
+        [list]: packets whose measurements are all valid, as floats in cm and kg, None for the rejected ones, in the
+            same order.
+        [list]: one record per rejected measurement, with the productId and subgroupId of the packet.
+    """
+    packets = [p for p in packets if p is not None]
+    if not packets:
+        return [], []
+    parsed, rejected = parseMeasurements(packets)
+    # Shortest representation of the float32 values, e.g. 12.3 and not 12.300000190734863.
+    columns = {field: parsed[field].astype(str).astype(float).tolist() for field in MEASUREMENT_UNITS}
+    rejectedPositions = set(rejected["position"].tolist())
+    normalized = []
+    for position, packet in enumerate(packets):
+        if position in rejectedPositions:
+            normalized.append(None)
+            continue
+        packet = dict(packet)
+        for field, values in columns.items():
+            if values[position] != values[position]:
+                # Measurements a packet does not need, e.g. the width of a cylindrical packaging, are left out.
+                packet.pop(field, None)
+            else:
+                packet[field] = values[position]
+        normalized.append(packet)
+    report = [{"productId": packets[position].get("productId"), "subgroupId": packets[position].get("subgroupId"),
+               "field": field, "value": value, "reason": reason}
+              for position, field, value, reason in rejected.itertuples(index=False)]
+    return normalized, report
+
+
+def normalizePages(pagePackets):
+    """
+    Normalizes the packets of several pages in a single batch, see normalizeMeasurements.
+
+    Args:
+        pagePackets ([list]): list of packets of each page.
+
+    Returns:
+        [list]: list of valid packets of each page.
+        [list]: rejected measurements.
+    """
+    pagePackets = [[p for p in packets if p is not None] for packets in pagePackets]
+    normalized, report = normalizeMeasurements([p for packets in pagePackets for p in packets])
+    pages, start = [], 0
+    for packets in pagePackets:
+        pages.append([p for p in normalized[start:start + len(packets)] if p is not None])
+        start += len(packets)
+    return pages, report
+
+
+def appendRejected(dataDirectory, report, batch):
+    """
+    Appends the rejected measurements of a batch to the report of the scrape, see REJECTED_FILENAME. Refreshes record
+    them with batch None.
+    """
+    if not report:
+        return
+    with open(os.path.join(dataDirectory, REJECTED_FILENAME), 'a') as f:
+        f.write("".join(json.dumps(dict(r, batch=batch), ensure_ascii=False, default=str) + '\n' for r in report))
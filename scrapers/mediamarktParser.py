@@ -0,0 +1,157 @@
+import html
+import json
+import re
+
+# Product pages are parsed in worker processes, this module has no import-time side effects and BeautifulSoup is only
+# imported by the fallbacks.
+# Only the MRParams script and the table rows of the packaging characteristics are located, the DOM is never built.
+PACKAGING_PHRASES = ["del embalaje", "embalado"]
+PACKAGING_PHRASE = re.compile("del embalaje|embalado")
+SPEC_VALUE_CELL = re.compile(
+    r'<td\b[^>]*\bclass="(?:[^"]*\s)?spec-line-value(?:\s[^"]*)?"[^>]*>(.*?)</td>', re.S)
+TAG = re.compile(r'<[^>]*>')
+
+
+# --------------------- Mappping functions ---------------------------------
+
+
+def productToPacket(packageData, characteristics):
+    """
+    Args:
+        packageData ([dict]): product JSON of the MRParams script.
+        characteristics ([list]): value of the weight, length, height and width rows, e.g. "12.5 cm".
+
+    Returns:
+        [dict]: packet with the measurements as scraped, they are parsed by batches, see measurements.py.
+    """
+    packet = {}
+    packet["id"] = ""
+    packet["name"] = packageData["title"][:40]
+    packet["description"] = packageData["type"]
+    packet["productId"] = packageData["id"]
+    packet["subgroupId"] = packageData["id"]
+    packet["rounded"] = 0
+    for i, d in zip([3, 2, 1, 0], ["width", "height", "length", "weight"]):
+        packet[d] = characteristics[i]
+    return packet
+
+
+def productJSONFromScript(script):
+    return json.loads(script.split('"total_quantity" : "0",')[1].strip().split('"product" : ')[1][:-1])
+
+
+def decodePage(content):
+    try:
+        return content.decode()
+    except UnicodeDecodeError:
+        return content.decode('latin-1')
+
+
+def extractMRParamsScript(page):
+    """
+    Text of the script element containing MRParams, None if there is none.
+    """
+    position = page.find('MRParams')
+    while position >= 0:
+        start = page.rfind('<script', 0, position)
+        # The script must enclose the match, i.e. not be closed before it.
+        if start >= 0 and page.find('</script>', start, position) < 0:
+            start = page.find('>', start) + 1
+            end = page.find('</script>', position)
+            return page[start:end if end >= 0 else len(page)]
+        position = page.find('MRParams', position + 1)
+    return None
+
+
+def extractPackagingCharacteristics(page):
+    """
+    Value of the spec-line-value cell of every table row whose text mentions the packaging, in document order.
+    """
+    values, lastRowStart = [], -1
+    for match in PACKAGING_PHRASE.finditer(page):
+        rowStart = page.rfind('<tr', 0, match.start())
+        if rowStart < 0 or rowStart == lastRowStart:
+            continue
+        rowEnd = page.find('</tr>', match.end())
+        # The match belongs to the row only if the row is still open.
+        if page.find('</tr>', rowStart, match.start()) >= 0:
+            continue
+        lastRowStart = rowStart
+        row = page[rowStart:rowEnd if rowEnd >= 0 else len(page)]
+        rowText = html.unescape(TAG.sub('', row))
+        if not any(a in rowText for a in PACKAGING_PHRASES):
+            continue
+        cell = SPEC_VALUE_CELL.search(row)
+        values.append(html.unescape(TAG.sub('', cell.group(1))) if cell else None)
+    return values
+
+
+def extractPayload(content):
+    """
+    Gets the MRParams script and the packaging characteristics without building the DOM, they are the only parts of the
+    page the packet depends on.
+
+    Args:
+        content ([bytes]): product page.
+
+    Returns:
+        [str]: JSON list with the script and the characteristics, None if the page does not have them.
+    """
+    page = decodePage(content)
+    script = extractMRParamsScript(page)
+    if script is None:
+        return None
+    return json.dumps([script, extractPackagingCharacteristics(page)], ensure_ascii=False)
+
+
+def payloadToPacket(payload):
+    try:
+        script, characteristics = json.loads(payload)
+        productJSON = productJSONFromScript(script)
+        if len(characteristics) == 4 and None not in characteristics:
+            return productToPacket(productJSON, characteristics)
+        else:
+            return None
+    except:
+        return None
+
+
+def payloadToPackets(payload):
+    packet = payloadToPacket(payload) if payload is not None else None
+    return [packet] if packet is not None else []
+
+
+def productBuilder(content):
+    """
+    Packet of a product page, None if the page does not have the packaging characteristics.
+
+    Args:
+        content ([bytes]): product page.
+    """
+    try:
+        payload = extractPayload(content)
+    except:
+        return None
+    return payloadToPacket(payload) if payload is not None else None
+
+
+def soupProductBuilder(content):
+    """
+    Former productBuilder, it parses the whole page with BeautifulSoup.
+
+    Args:
+        content ([bytes]): product page.
+    """
+    from bs4 import BeautifulSoup as bsp
+    soup = bsp(content, 'html.parser')
+    try:
+        productJSON = productJSONFromScript(soup.find('script', string=re.compile(
+            'MRParams')).text)
+        characteristics = list(filter(lambda x: any(a in x.text for a in PACKAGING_PHRASES), soup.find_all('tr')))
+        if len(characteristics) == 4:
+            return productToPacket(productJSON, list(map(lambda x: x.find(
+                'td', class_='spec-line-value').text, characteristics)))
+        else:
+            return None
+    except:
+        return None
@@ -1,12 +1,15 @@
-import requests
-from bs4 import BeautifulSoup as bsp
-import json
 from requests.exceptions import HTTPError
 import os
-import re
 import pathlib
-from concurrent.futures import ThreadPoolExecutor
-from itertools import zip_longest
+from checkpoint import ScrapeCheckpoint
+from fetcher import FetchEngine
+import sys
+from functools import partial
+from pipeline import ScrapePipeline
+from responseCache import ResponseCache, hashedProductBuilder, refreshCatalogue
+from linkIndex import LinkIndex
+from batch import scrapeBatches
+import mediamarktParser
 
 
 # ---------------------- Links related functions --------------------------------------------
@@ -14,10 +17,11 @@ from itertools import zip_longest
 maxApiConcurrentCalls = 100
 
 
-def getFullListOfProducts():
+def getFullListOfProducts(fetchEngine):
+    from bs4 import BeautifulSoup as bsp
     baseUrl = "https://canarias.mediamarkt.es/"
     try:
-        response = requests.get(
+        response = fetchEngine.get(
             "https://canarias.mediamarkt.es/sitemap_collections_1.xml")
     except HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
@@ -28,20 +32,17 @@ def getFullListOfProducts():
     allCategoriesNames = list(
         map(lambda x: x.text.split(os.path.sep)[-1], soup.find_all('loc')))
     uniqueProductsLinks = set()
-    for catSlice in grouper(allCategoriesNames, maxApiConcurrentCalls, None):
-        catSlice = list(filter(lambda x: x is not None, catSlice))
+    for sectionUrl, response, err in fetchEngine.fetchAll(map(productsLinksUrl, allCategoriesNames)):
+        if err is not None:
+            print(f'Other error occurred: {err}')
+            continue
         try:
-            with ThreadPoolExecutor(max_workers=maxApiConcurrentCalls) as pool:
-                responses = list(
-                    pool.map(getProductsLinksResponseJSON, catSlice))
-        except HTTPError as http_err:
-            print(f'HTTP error occurred: {http_err}')
+            productsLinks = list(
+                map(lambda x: baseUrl + 'products' + os.path.sep + x["link"].split('products' + os.path.sep)[1], response.json()["items"]))
         except Exception as err:
             print(f'Other error occurred: {err}')
-        for i in responses:
-            productsLinks = list(
-                map(lambda x: baseUrl + 'products' + os.path.sep + x["link"].split('products' + os.path.sep)[1], i["items"]))
-            uniqueProductsLinks.update(productsLinks)
+            continue
+        uniqueProductsLinks.update(productsLinks)
     pathlib.Path(os.path.dirname(__file__) + os.path.sep + '..' +
                  os.path.sep + 'mediamarktData').mkdir(parents=True, exist_ok=True)
     updateLinks(uniqueProductsLinks)
@@ -61,142 +62,69 @@ def fetchLinks():
     return productsLinks
 
 
-def getUrl(url):
-    return requests.get(url)
-
-
-def getProductsLinksResponseJSON(sectionName):
-    return requests.get("https://www.searchanise.com/getresults?api_key=1W7C4E0H3O&sortBy=sales_amount&sortOrder=desc&startIndex=0&maxResults=5000&items=true&pages=true&categories=true&queryCorrection=true&pageStartIndex=0&pagesMaxResults=5000&categoryStartIndex=0&categoriesMaxResults=20&facets=true&facetsShowUnavailableOptions=false&ResultsTitleStrings=3&collection=" + sectionName + "&output=json").json()
-
-
-def grouper(iterable, n, fillvalue=None):
-    args = [iter(iterable)] * n
-    return zip_longest(*args, fillvalue=fillvalue)
-
-
-try:
-    productsLinks = fetchLinks()
-except:
-    print("Creating a new list of all the links in the ikea page.")
-    getFullListOfProducts()
-    productsLinks = fetchLinks()
-    print("Fetched all links.")
+def productsLinksUrl(sectionName):
+    return ("https://www.searchanise.com/getresults?api_key=1W7C4E0H3O&sortBy=sales_amount&sortOrder=desc&startIndex=0&maxResults=5000&items=true&pages=true&categories=true&queryCorrection=true&pageStartIndex=0&pagesMaxResults=5000&categoryStartIndex=0&categoriesMaxResults=20&facets=true&facetsShowUnavailableOptions=false&ResultsTitleStrings=3&collection=" + sectionName + "&output=json")
 
-# --------------------- Mappping functions ---------------------------------
-
-
-def productToPacket(packageData, characteristics):
-    packet = {}
-    packet["id"] = ""
-    packet["name"] = packageData["title"][:40]
-    packet["description"] = packageData["type"]
-    packet["productId"] = packageData["id"]
-    packet["subgroupId"] = packageData["id"]
-    packet["rounded"] = 0
-    characteristics = list(map(lambda x: x.find(
-        'td', class_='spec-line-value').text, characteristics))
-    for i, d in zip([3, 2, 1], ["width", "height", "length"]):
-        packet[d] = float(characteristics[i].split(' ')[0]) / \
-            unitNormalizationToCm(characteristics[i].split(' ')[1])
-    packet["weight"] = float(characteristics[0].split(' ')[0]) if characteristics[0].split(
-        ' ')[1] == 'kg' else float(characteristics[0].split(' ')[0])/1000
-    if [packet["width"], packet["height"], packet["length"]] == [1, 1, 1]:
-        return None
-    elif packet["width"] and packet["height"] and packet["length"]:
-        return packet
-    else:
-        return None
-
-
-def unitNormalizationToCm(unit):
-    if unit == "cm":
-        return 1
-    if unit == "m":
-        return 0.01
-    if unit == "mm":
-        return 10
-
-
-def productBuilder(linkResponse):
-    soup = bsp(linkResponse.content, 'html.parser')
-    try:
-        productJSON = json.loads(soup.find('script', text=re.compile(
-            'MRParams')).text.split('"total_quantity" : "0",')[1].strip().split('"product" : ')[1][:-1])
-        characteristics = list(filter(lambda x: any(a in x.text for a in [
-            "del embalaje", "embalado"]), soup.find_all('tr')))
-        if len(characteristics) == 4:
-            return productToPacket(productJSON, characteristics)
-        else:
-            return None
-    except:
-        return None
 
 
 # -------------- Main --------------------------------------
-mainPacketsList = []
-dataFilename = os.path.dirname(
-    __file__) + os.path.sep + '..' + os.path.sep + 'mediamarktData' + os.path.sep + 'data.json'
-backupFilename = os.path.dirname(
-    __file__) + os.path.sep + '..' + os.path.sep + 'mediamarktData' + os.path.sep + 'from.json'
-
-
-def get_url(url):
-    return requests.get(url)
-
 
-def grouper(iterable, n, fillvalue=None):
-    args = [iter(iterable)] * n
-    return zip_longest(*args, fillvalue=fillvalue)
 
+def main(refresh=False):
+    """
+    Scrapes the whole catalogue, resuming right after the last recorded batch.
 
-maxApiConcurrentCalls = os.cpu_count()*5
-
-
-def chargeCurrentMaxLinkIndex():
+    Args:
+        refresh (bool, optional): update the list of links and refresh the scraped catalogue with conditional requests
+            instead, writing the delta as well. Defaults to False.
+    """
+    # Shared by every request of the scraper, it keeps the connections to the sites alive.
+    fetchEngine = FetchEngine(maxInFlight=maxApiConcurrentCalls, maxPerHost=32)
+    if refresh:
+        print("Updating the list of all the links in the mediamarkt page.")
+        getFullListOfProducts(fetchEngine)
     try:
-        with open(os.path.dirname(__file__) + os.path.sep + 'mediamarktData' + os.path.sep + 'from.json', 'r') as f:
-            currentMaxLinkIndex = productsLinks.index(
-                json.load(f)[0]["link"]) + 1
-        return currentMaxLinkIndex
+        productsLinks = fetchLinks()
     except:
-        return 0
-
-
-currentStartingLinkIndex = chargeCurrentMaxLinkIndex()
-if currentStartingLinkIndex:
-    with open(os.path.dirname(__file__) + os.path.sep + 'mediamarktData' + os.path.sep + 'data.json', 'r') as f:
-        mainPacketsList = json.load(f)
-
-for linksSlice in grouper(productsLinks[currentStartingLinkIndex:], maxApiConcurrentCalls, None):
-    linksSlice = list(filter(lambda x: x is not None, linksSlice))
-    responses = []
-    try:
-        with ThreadPoolExecutor(max_workers=maxApiConcurrentCalls) as pool:
-            responses = list(pool.map(get_url, linksSlice))
-    except HTTPError as http_err:
-        print(f'HTTP error occurred: {http_err}')
-    except Exception as err:
-        print(f'Other error occurred: {err}')
-
-    wrongResponseLinks = list(
-        filter(lambda x: x not in linksSlice, list(map(lambda y: y.url, responses))))
-    actualProductLinks = productsLinks
-    if len(wrongResponseLinks):
-        print("There has been an error with an outdated link.")
-        responses = list(
-            filter(lambda x: x.url not in wrongResponseLinks, responses))
-        actualProductLinks = list(
-            filter(lambda x: x not in wrongResponseLinks, productsLinks))
-        updateLinks(productsLinks)
-        print("Remove outdated link, links list updated.")
-
-    for i in responses:
-        mainPacketsList.append(productBuilder(i))
-
-    mainPacketsList = list(filter(lambda x: x is not None, mainPacketsList))
-
-    with open(dataFilename, 'w+') as file:
-        json.dump(mainPacketsList, file, indent=2, ensure_ascii=False)
-    with open(backupFilename, 'w+') as file:
-        backup = [{"link": linksSlice[-1]}]
-        json.dump(backup, file, indent=2, ensure_ascii=False)
+        print("Creating a new list of all the links in the ikea page.")
+        getFullListOfProducts(fetchEngine)
+        productsLinks = fetchLinks()
+        print("Fetched all links.")
+
+    # Packets are appended to mediamarktData/data.jsonl batch by batch, data.json is compacted from it at the end.
+    checkpoint = ScrapeCheckpoint(os.path.dirname(
+        __file__) + os.path.sep + '..' + os.path.sep + 'mediamarktData')
+    # Packets of a page along with the hash of its packaging payload, kept in the response cache for later refreshes.
+    productBuilder = partial(
+        hashedProductBuilder, mediamarktParser.extractPayload, mediamarktParser.payloadToPackets)
+    responseCache = ResponseCache(checkpoint.dataDirectory)
+    # Pages are fetched with a sliding window of requests in flight and parsed in other processes meanwhile, the batches
+    # only delimit the checkpoints.
+    scrapePipeline = ScrapePipeline(fetchEngine, productBuilder)
+    if refresh:
+        delta = refreshCatalogue(productsLinks, responseCache,
+                                 scrapePipeline, checkpoint, maxApiConcurrentCalls)
+        fetchEngine.close()
+        print(scrapePipeline.report())
+        print(f"Refreshed {len(productsLinks)} links: {delta['added']} added, {delta['changed']} changed, {delta['removed']} removed, "
+              f"{delta['unchanged']} unchanged ({delta['notModified']} not modified), {delta['failed']} failed, "
+              f"{delta['rejected']} measurements rejected.")
+    else:
+        # Resume right after the last recorded batch, packets of an unrecorded batch are discarded.
+        linkIndex = LinkIndex(checkpoint.dataDirectory, productsLinks)
+        scrapeBatches(productsLinks, scrapePipeline, linkIndex, checkpoint, responseCache, maxApiConcurrentCalls)
+
+        fetchEngine.close()
+        checkpoint.close()
+        print(scrapePipeline.report())
+        print("Scraped " + str(checkpoint.compact()) + " packets.")
+        currentLinks = linkIndex.currentLinks()
+        if len(currentLinks) < len(productsLinks):
+            updateLinks(currentLinks)
+            print("Links list updated, removed " + str(len(productsLinks) - len(currentLinks)) + " outdated links.")
+        responseCache.publish(currentLinks)
+
+
+if __name__ == "__main__":
+    # Run with the refresh argument to refresh a scraped catalogue with conditional requests, writing the delta as well.
+    main(len(sys.argv) > 1 and sys.argv[1] == "refresh")
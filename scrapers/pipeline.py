@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Fetch -> parse -> map pipeline of the scrapers. The fetch stage runs in a thread feeding a bounded queue, pages are
+# parsed in a process pool and the caller maps and commits the results in link order, so the three stages overlap.
+END = None
+# Result of the pages answered with 304 Not Modified, they are not parsed.
+NOT_MODIFIED = "notModified"
+
+
+class StageStats:
+    """
+    Items, bytes and busy time of a pipeline stage.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy = 0.0
+
+    def throughput(self):
+        return self.items / self.busy if self.busy else 0.0
+
+    def __str__(self):
+        return f"{self.name}: {self.items} pages in {self.busy:.1f}s busy, {self.throughput():.1f} pages/s" + (
+            f", {self.bytes / 2**20:.1f} MiB" if self.bytes else "")
+
+
+def timedParse(parse, content, *context):
+    """
+    Runs in the parser processes, it returns the result along with the CPU time used.
+    """
+    start = time.process_time()
+    result = parse(content, *context)
+    return result, time.process_time() - start
+
+
+def validatorsOf(response):
+    """
+    Cache validators of a response, to make conditional requests later on.
+    """
+    return {"etag": response.headers.get("ETag"), "lastModified": response.headers.get("Last-Modified")}
+
+
+class ScrapePipeline:
+    """
+    Pipelined fetching and parsing of product pages.
+
+    Args:
+        fetchEngine ([FetchEngine]): engine used to fetch the pages.
+        parse ([function]): module level function from the page content (bytes) to its packets, it must be importable
+            by the parser processes without side effects.
+        workers ([int], optional): parser processes. Defaults to the number of CPUs.
+        queueSize (int, optional): pages buffered between stages. Defaults to 256.
+    """
+
+    def __init__(self, fetchEngine, parse, workers=None, queueSize=256):
+        self.fetchEngine = fetchEngine
+        self.parse = parse
+        self.workers = workers or os.cpu_count()
+        self.queueSize = queueSize
+        self.stats = {name: StageStats(name) for name in ["fetch", "parse", "map"]}
+        self.started = None
+
+    def fetchStage(self, links, fetched, requestOptions):
+        stats = self.stats["fetch"]
+        start = time.perf_counter()
+        try:
+            for link, response, err in self.fetchEngine.fetchAll(links, requestOptions=requestOptions):
+                if response is not None:
+                    content = None if response.status_code == 304 else response.content
+                    item = (link, response.url, content, None, validatorsOf(response))
+                    stats.bytes += len(response.content)
+                else:
+                    item = (link, None, None, err, None)
+                stats.items += 1
+                stats.busy = time.perf_counter() - start
+                # Blocks while the parsers are behind, which in turn stops fetching new pages.
+                fetched.put(item)
+        finally:
+            fetched.put(END)
+
+    @staticmethod
+    def headReady(parsing):
+        return bool(parsing) and (parsing[0][2] is None or parsing[0][2].done())
+
+    def run(self, links, requestOptions=None, parseContext=None):
+        """
+        Fetches and parses the links.
+
+        Args:
+            links ([iterable]): links to scrape.
+            requestOptions ([function], optional): link to extra keyword arguments of its request. Defaults to None.
+            parseContext ([function], optional): link to an extra argument of parse. Defaults to None.
+
+        Yields:
+            [tuple]: (link, final url, parsed result, error, validators) in the order of links, error is None on success
+                and the result of pages not modified is NOT_MODIFIED.
+        """
+        self.started = time.perf_counter()
+        fetched = queue.Queue(maxsize=self.queueSize)
+        fetchThread = threading.Thread(
+            target=self.fetchStage, args=(links, fetched, requestOptions), daemon=True)
+        parsing = deque()
+        mapStats, parseStats = self.stats["map"], self.stats["parse"]
+        # Forked parsers start without importing the scraper and its parsing libraries again. They are forked before the fetch
+        # thread starts, forking a process with running threads may leave locks held in the children.
+        context = multiprocessing.get_context(
+            "fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            pool.submit(int).result()
+            fetchThread.start()
+            fetchDone = False
+            while not fetchDone or parsing:
+                # Keep up to queueSize pages being parsed, the head is yielded as soon as it is ready.
+                while not fetchDone and len(parsing) < self.queueSize and not self.headReady(parsing):
+                    try:
+                        item = fetched.get(timeout=0.05 if parsing else None)
+                    except queue.Empty:
+                        break
+                    if item is END:
+                        fetchDone = True
+                        break
+                    link, url, content, err, validators = item
+                    parseArgs = (parseContext(link),) if parseContext else ()
+                    future = pool.submit(
+                        timedParse, self.parse, content, *parseArgs) if content is not None else None
+                    parsing.append((link, url, future, err, validators))
+                if not parsing:
+                    continue
+                link, url, future, err, validators = parsing.popleft()
+                result = NOT_MODIFIED if future is None and err is None else None
+                if future is not None:
+                    try:
+                        result, seconds = future.result()
+                        parseStats.items += 1
+                        parseStats.busy += seconds
+                    except Exception as parseErr:
+                        err = parseErr
+                start = time.perf_counter()
+                yield link, url, result, err, validators
+                mapStats.items += 1
+                mapStats.busy += time.perf_counter() - start
+        fetchThread.join()
+
+    def report(self):
+        """
+        Per-stage throughput, parse busy time is the CPU time summed over the parser processes.
+        """
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return "\n".join([str(s) for s in self.stats.values()] + [
+            f"pipeline: {self.stats['map'].items} pages in {elapsed:.1f}s, {self.stats['map'].items / elapsed if elapsed else 0.0:.1f} pages/s"])
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+from checkpoint import fsyncAppend
+from storage import writeJsonAtomic
+from linkIndex import LinkIndex
+from measurements import normalizePages, appendRejected
+
+# On-disk cache of the product pages, keyed by link, used to refresh a scraped catalogue with conditional requests.
+# Each entry keeps the HTTP validators of the last response, the hash of the packaging payload extracted from it and
+# the resulting packets; publishedHash and publishedSubgroups are the payload hash and the subgroups of the page in the
+# last published data.json, so that the delta of a refresh is exact even if a previous refresh was interrupted.
+
+
+def payloadHash(payload):
+    return hashlib.sha1(payload.encode()).hexdigest() if payload is not None else None
+
+
+def hashedProductBuilder(extractPayload, payloadToPackets, content, knownHash=None):
+    """
+    Runs in the parser processes: packets of a page along with the hash of its payload, the packets are only built if
+    the payload changed.
+
+    Args:
+        extractPayload ([function]): page content to its packaging payload.
+        payloadToPackets ([function]): packaging payload to the list of packets.
+        content ([bytes]): product page.
+        knownHash ([str], optional): payload hash of the cached version of the page. Defaults to None.
+
+    Returns:
+        [tuple]: (payload hash, packets), packets is None if the payload hash is knownHash.
+    """
+    payload = extractPayload(content)
+    currentHash = payloadHash(payload)
+    if knownHash is not None and currentHash == knownHash:
+        return currentHash, None
+    return currentHash, payloadToPackets(payload) if payload is not None else []
+
+
+class ResponseCache:
+    """
+    Append-only cache of the responses of a scraper, stored in <dataDirectory>/responses.jsonl.
+
+    Args:
+        dataDirectory ([str]): directory of the scraped data.
+    """
+
+    def __init__(self, dataDirectory):
+        self.path = os.path.join(dataDirectory, 'responses.jsonl')
+        self.entries = {}
+        self.pending = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written trailing line.
+                        break
+                    self.entries[entry["link"]] = entry
+
+    def __contains__(self, link):
+        return link in self.entries
+
+    def conditionalHeaders(self, link):
+        """
+        Keyword arguments of a conditional request for the link, empty if it is not cached.
+        """
+        entry = self.entries.get(link)
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("lastModified"):
+            headers["If-Modified-Since"] = entry["lastModified"]
+        return {"headers": headers} if headers else {}
+
+    def knownHash(self, link):
+        entry = self.entries.get(link)
+        return entry["payloadHash"] if entry is not None else None
+
+    def packets(self, link):
+        entry = self.entries.get(link)
+        return entry["packets"] if entry is not None else []
+
+    def record(self, link, validators, payloadHash=None, packets=None):
+        """
+        Updates the entry of a link after fetching it, packets None keeps the cached ones (not modified or same payload).
+        """
+        entry = dict(self.entries.get(link, {"link": link, "publishedHash": None, "packets": []}))
+        if validators:
+            entry.update({key: value for key, value in validators.items() if value is not None})
+        if payloadHash is not None:
+            entry["payloadHash"] = payloadHash
+        entry.setdefault("payloadHash", None)
+        if packets is not None:
+            entry["packets"] = packets
+        self.entries[link] = entry
+        self.pending.append(entry)
+
+    def commit(self):
+        """
+        Durably appends the entries recorded since the last commit.
+        """
+        if not self.pending:
+            return
+        with open(self.path, 'a') as f:
+            fsyncAppend(f, "".join(json.dumps(e, ensure_ascii=False) + '\n' for e in self.pending))
+        self.pending = []
+
+    def publish(self, links):
+        """
+        Marks the current payload of the links as published and drops the entries of the rest, compacting the file.
+        The published subgroups are kept too, so that the next delta replaces them even if an interrupted refresh
+        already overwrote the packets.
+        """
+        self.entries = {link: dict(self.entries[link], publishedHash=self.entries[link]["payloadHash"],
+                                   publishedSubgroups=subgroupsOf(p for p in self.entries[link]["packets"] if p is not None))
+                        for link in links if link in self.entries}
+        self.pending = []
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'w') as f:
+            fsyncAppend(f, "".join(json.dumps(e, ensure_ascii=False) + '\n' for e in self.entries.values()))
+        os.replace(tmpPath, self.path)
+
+
+def subgroupsOf(packets):
+    return sorted(set(p["subgroupId"] for p in packets))
+
+
+def refreshCatalogue(links, cache, scrapePipeline, checkpoint, batchSize=100):
+    """
+    Refreshes a scraped catalogue with conditional requests: pages not modified or whose packaging payload did not
+    change keep their cached packets. It publishes the new data.json and writes delta.json next to it, with every
+    packet of the subgroups that were added or changed and the subgroups to replace, see packetAdaptation.readDelta
+    and packetAdaptation.adaptSource.
+
+    Args:
+        links ([list]): current links of the catalogue, in order.
+        cache ([ResponseCache]): response cache of the scraper.
+        scrapePipeline ([ScrapePipeline]): pipeline whose parse function is a hashedProductBuilder.
+        checkpoint ([ScrapeCheckpoint]): checkpoint of the scraper, its log is replaced with the refreshed packets.
+        batchSize (int, optional): pages between cache commits. Defaults to 100.
+
+    Returns:
+        [dict]: delta.
+    """
+    counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "notModified": 0, "failed": 0, "rejected": 0}
+    # Changed pages, recorded once the measurements of their batch are parsed, as in the scrape.
+    pages = []
+    # Subgroups of the changed pages before recording them: a page may lose packets (all of them if its measurements
+    # are rejected) or move them to another subgroup, the subgroups it had must be replaced as well.
+    previousSubgroups = {}
+
+    def recordPages():
+        pagePackets, rejected = normalizePages([packets for _, _, _, packets in pages])
+        for (link, validators, currentHash, _), packets in zip(pages, pagePackets):
+            previousSubgroups.setdefault(link, subgroupsOf(p for p in cache.packets(link) if p is not None))
+            cache.record(link, validators, currentHash, packets)
+        appendRejected(checkpoint.dataDirectory, rejected, None)
+        counts["rejected"] += len(rejected)
+        pages.clear()
+
+    for position, (link, url, result, err, validators) in enumerate(scrapePipeline.run(
+            links, requestOptions=cache.conditionalHeaders, parseContext=cache.knownHash)):
+        if err is not None or (url is not None and url != link):
+            # Failed and redirected (outdated) pages keep their cached packets.
+            counts["failed"] += 1
+            if err is not None:
+                print(f'Other error occurred: {err}')
+            continue
+        if result == "notModified":
+            counts["notModified"] += 1
+            cache.record(link, validators)
+        else:
+            currentHash, packets = result
+            if packets is None:
+                # Same payload, the cached packets are kept.
+                cache.record(link, validators, currentHash, packets)
+            else:
+                pages.append((link, validators, currentHash, packets))
+        if (position + 1) % batchSize == 0:
+            recordPages()
+            cache.commit()
+    recordPages()
+    cache.commit()
+
+    replacedSubgroups, packets, linkSet = set(), [], set(links)
+    # The refreshed log replaces the scraped one as a single batch, so does the index of its subgroups.
+    linkIndex = LinkIndex(checkpoint.dataDirectory, links)
+    linkIndex.load(0)
+    for link in links:
+        entry = cache.entries.get(link)
+        if entry is None:
+            continue
+        linkPackets = [p for p in entry["packets"] if p is not None]
+        # Products listed in several sections are only kept once, as in the scrape.
+        packets.extend(linkIndex.newPackets(link, linkPackets))
+        if entry["publishedHash"] is None:
+            counts["added"] += 1
+        elif entry["publishedHash"] != entry["payloadHash"]:
+            counts["changed"] += 1
+        else:
+            counts["unchanged"] += 1
+            continue
+        replacedSubgroups.update(subgroupsOf(linkPackets), previousSubgroups.get(link, []),
+                                 entry.get("publishedSubgroups", []))
+    for link, entry in cache.entries.items():
+        if link not in linkSet and entry["publishedHash"] is not None:
+            counts["removed"] += 1
+            replacedSubgroups.update(subgroupsOf(entry["packets"]), entry.get("publishedSubgroups", []))
+    deltaPackets = [p for p in packets if p["subgroupId"] in replacedSubgroups]
+    # Subgroups of changed products may also have lost packets, they are replaced as a whole.
+    delta = dict(counts, replacedSubgroups=sorted(replacedSubgroups), packets=deltaPackets)
+
+    linkIndex.commit(1)
+    checkpoint.replace(packets, links[-1] if links else None, len(links))
+    checkpoint.compact()
+    writeJsonAtomic(delta, os.path.join(checkpoint.dataDirectory, 'delta.json'))
+    cache.publish(links)
+    return delta
@@ -0,0 +1,495 @@
+import glob
+import json
+import os
+from collections import OrderedDict
+from packetStore import toPacketTable, fromPacketTable, isPacketTable
+from instrumentation import traced, currentSpan
+from lazy import lazyImport
+np = lazyImport("numpy")
+pd = lazyImport("pandas")
+
+# Storage backends of the datasets, chosen by the extension of the path:
+# - json: records with indent=2, the export format every stage used to read and write.
+# - pkt: single file with the columns of the packet table, read memory-mapped.
+# - parquet: single columnar file with the packet table, needs pyarrow.
+EXTENSIONS = {"json": ".json", "pkt": ".pkt", "parquet": ".parquet"}
+# Order in which the backends are preferred when several versions of the same dataset exist.
+READ_PREFERENCE = ["pkt", "parquet", "json"]
+
+
+def writeJsonAtomic(obj, path):
+    """
+    Dumps an object as indented JSON so that readers either see the previous file or the complete new one.
+
+    Args:
+        obj ([type]): JSON serializable object.
+        path ([str]): destination path.
+    """
+    tmpPath = path + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(tmpPath, 'w') as f:
+            json.dump(obj, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+def backendOf(path):
+    """
+    Backend of a dataset path given its extension.
+    """
+    extension = os.path.splitext(path.rstrip(os.path.sep))[1]
+    for backend, backendExtension in EXTENSIONS.items():
+        if extension == backendExtension:
+            return backend
+    raise ValueError("Unknown dataset format: " + path)
+
+
+def basePathOf(path):
+    """
+    Dataset path without the extension of its backend.
+    """
+    path = path.rstrip(os.path.sep)
+    root, extension = os.path.splitext(path)
+    return root if extension in EXTENSIONS.values() else path
+
+
+@traced()
+def writeDataset(data, path, backend=None, cache=False):
+    """
+    Writes a dataset atomically with the given backend.
+
+    Args:
+        data ([df]): dataset, in the JSON record layout or as a packet table.
+        path ([str]): destination path, the extension is replaced by the one of the backend if given.
+        backend ([str], optional): one of EXTENSIONS. Defaults to the one of the path extension.
+        cache (bool, optional): keep a JSON dataset in datasetCache, for datasets the process reads again, e.g. the
+            adapted ones the mixed stage reads. Defaults to False.
+
+    Returns:
+        [str]: written path.
+    """
+    if backend is None:
+        backend = backendOf(path)
+    else:
+        path = basePathOf(path) + EXTENSIONS[backend]
+    if backend == "json":
+        records = (fromPacketTable(data) if isPacketTable(data) else data).to_dict(orient="records")
+        writeJsonAtomic(records, path)
+    elif backend == "pkt":
+        writeColumns(data if isPacketTable(data) else toPacketTable(data), path)
+    else:
+        writeParquet(data if isPacketTable(data) else toPacketTable(data), path)
+    datasetCache.discard(path)
+    if cache and backend == "json":
+        datasetCache.storeRecords(path, records)
+    return path
+
+
+@traced()
+def readDataset(path, asPacketTable=False):
+    """
+    Reads a dataset written by any of the backends.
+
+    Args:
+        path ([str]): dataset path.
+        asPacketTable (bool, optional): return the packet table, skipping the conversion of the orientation masks to
+            lists, which is the fastest way of reading the binary backends. Defaults to False.
+
+    Returns:
+        [df]: dataset.
+    """
+    backend = backendOf(path)
+    if backend == "json":
+        with open(path, 'r') as f:
+            data = pd.DataFrame(json.load(f))
+        return toPacketTable(data) if asPacketTable else data
+    table = readColumns(path) if backend == "pkt" else pd.read_parquet(
+        path, memory_map=True)
+    return table if asPacketTable else fromPacketTable(table)
+
+
+def resolveDatasetPath(path):
+    """
+    Path of the preferred up to date version of a dataset: binary versions are only used if they are not older than
+    the JSON one, so a JSON file written after converting it is never shadowed by a stale binary.
+
+    Args:
+        path ([str]): dataset path with or without extension.
+    """
+    basePath = basePathOf(path)
+    jsonPath = basePath + EXTENSIONS["json"]
+    jsonTime = os.path.getmtime(jsonPath) if os.path.exists(jsonPath) else None
+    for backend in READ_PREFERENCE:
+        candidate = basePath + EXTENSIONS[backend]
+        if os.path.exists(candidate) and (jsonTime is None or os.path.getmtime(candidate) >= jsonTime):
+            return candidate
+    raise FileNotFoundError("No dataset found for " + basePath)
+
+
+# -------------- Dataset cache ---------------------------------
+# Datasets read again and again by the same process (the reference of every scenario, the adapted datasets the mixed
+# stage reads right after writing them) are kept in a bounded LRU cache keyed by path, checked against the size and
+# modification time of the file so that a rewritten dataset is read again. Every read gets its own frame sharing the
+# buffers of the cached one: with copy-on-write (always on from pandas 3) writes to it copy the modified columns and
+# the cached frame is never modified, older pandas get a deep copy instead.
+DATASET_CACHE_SIZE = 8
+
+
+def copyOnWrite():
+    """
+    Whether pandas copies shared buffers on write, so that shallow copies are independent frames.
+    """
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    try:
+        return pd.get_option("mode.copy_on_write") is True
+    except KeyError:
+        # Option not known by this version.
+        return False
+
+
+class DatasetCache:
+    """
+    Process-level LRU cache of read datasets, see readCachedDataset.
+
+    Args:
+        maxEntries (int, optional): datasets kept, the least recently read ones are evicted. Defaults to DATASET_CACHE_SIZE.
+    """
+
+    def __init__(self, maxEntries=DATASET_CACHE_SIZE):
+        self.maxEntries = maxEntries
+        # (absolute path, asPacketTable) to (file signature, frame or written records).
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def signature(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, path, asPacketTable=False):
+        """
+        Cached frame of a dataset, read with readDataset unless the cached version is up to date.
+
+        Returns:
+            [df]: dataset, see copyOnWrite.
+        """
+        key = (os.path.abspath(path), asPacketTable)
+        # Taken before reading, a file rewritten while being read is read again next time.
+        signature = self.signature(path)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            data = entry[1]
+            if isinstance(data, list):
+                # Written records, the frame readDataset would have built out of them.
+                data = pd.DataFrame(data)
+                self.entries[key] = (signature, data)
+        else:
+            self.misses += 1
+            data = readDataset(path, asPacketTable)
+            self.put(key, signature, data)
+        return data.copy(deep=not copyOnWrite())
+
+    def put(self, key, signature, data):
+        self.entries[key] = (signature, data)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+    def storeRecords(self, path, records):
+        """
+        Keeps the records just written to a JSON dataset, the frame is only built if the dataset is read.
+        """
+        self.put((os.path.abspath(path), False), self.signature(path), records)
+
+    def discard(self, path):
+        """
+        Drops the cached versions of a dataset.
+        """
+        path = os.path.abspath(path)
+        for key in [k for k in self.entries if k[0] == path]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+
+datasetCache = DatasetCache()
+
+
+@traced()
+def readCachedDataset(path, asPacketTable=False):
+    """
+    Reads a dataset through datasetCache, parsing the file only if it changed since it was last read or written by the
+    process. Same arguments as readDataset, the cached frame itself is never returned.
+    """
+    hits = datasetCache.hits
+    data = datasetCache.get(path, asPacketTable)
+    currentSpan().count(cacheHit=int(datasetCache.hits > hits))
+    return data
+
+
+# -------------- Streamed JSON records ---------------------------------
+# Datasets too large for memory are read and written as chunks of records. The writer produces the same bytes as
+# writeJsonAtomic on the whole list of records.
+READ_BLOCK_SIZE = 1 << 20
+
+
+def iterJsonRecords(path, chunkSize=10000):
+    """
+    Reads a JSON list of records in chunks, memory only depends on the chunk size.
+
+    Args:
+        path ([str]): JSON dataset path.
+        chunkSize (int, optional): records per chunk. Defaults to 10000.
+
+    Yields:
+        [list]: chunk of records.
+    """
+    decoder = json.JSONDecoder()
+    chunk, buffer, position, started = [], "", 0, False
+    with open(path, 'r') as f:
+        while True:
+            # Skip the separators before the next record.
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != "[":
+                    raise ValueError("Not a JSON list: " + path)
+                started, position = True, position + 1
+                continue
+            if position < len(buffer) and buffer[position] == "]":
+                break
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The record continues in the next block.
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    if buffer[position:].strip():
+                        raise
+                    break
+                buffer, position = buffer[position:] + block, 0
+                continue
+            if end == len(buffer):
+                # A number could be cut at the end of the block, decode it again with more text.
+                block = f.read(READ_BLOCK_SIZE)
+                if block:
+                    buffer, position = buffer[position:] + block, 0
+                    continue
+            chunk.append(record)
+            position = end
+            if len(chunk) == chunkSize:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class JsonRecordsWriter:
+    """
+    Writes a JSON dataset chunk by chunk, atomically once closed, with the layout of writeJsonAtomic.
+
+    Args:
+        path ([str]): destination path.
+        assignIds (bool, optional): set the id column to the position of each record in the dataset. Defaults to True.
+    """
+
+    def __init__(self, path, assignIds=True):
+        self.path = path
+        self.tmpPath = path + '.' + str(os.getpid()) + '.tmp'
+        self.assignIds = assignIds
+        self.count = 0
+        self.file = open(self.tmpPath, 'w')
+
+    def write(self, data):
+        """
+        Appends the records of a dataframe, in the JSON record layout or as a packet table, None is ignored.
+        """
+        if data is None or not len(data):
+            return
+        data = fromPacketTable(data) if isPacketTable(data) else data
+        if self.assignIds:
+            data = data.reset_index(drop=True)
+            data.index += self.count
+            data["id"] = data.index
+        self.file.write("".join(("[\n  " if self.count + i == 0 else ",\n  ") + json.dumps(
+            record, indent=2, ensure_ascii=False).replace("\n", "\n  ") for i, record in enumerate(data.to_dict(orient="records"))))
+        self.count += len(data)
+
+    def close(self):
+        self.file.write("\n]" if self.count else "[]")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmpPath, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmpPath):
+            os.remove(self.tmpPath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# -------------- pkt backend ---------------------------------
+# Single file: magic, header length (uint64), JSON header and the raw buffers of the numeric columns, 8-byte aligned.
+# String columns are kept in the header, categorical ones as their categories plus an integer codes buffer.
+MAGIC = b"PKTTABLE"
+
+
+def writeColumns(table, path):
+    """
+    Writes a packet table in the pkt format, atomically.
+    """
+    columns, buffers, offset = [], [], 0
+    for name, values in table.items():
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            column = {"name": name, "kind": "category", "categories": [
+                str(c) for c in values.cat.categories]}
+            values = values.cat.codes
+        elif values.dtype.kind in "biuf":
+            column = {"name": name, "kind": "numeric"}
+        else:
+            columns.append({"name": name, "kind": "string",
+                            "values": values.astype(object).tolist()})
+            continue
+        buffer = np.ascontiguousarray(values.to_numpy()).tobytes()
+        column.update({"dtype": values.dtype.str, "offset": offset})
+        columns.append(column)
+        buffers.append(buffer + b"\0" * (-len(buffer) % 8))
+        offset += len(buffers[-1])
+    header = json.dumps({"rows": len(table), "columns": columns},
+                        ensure_ascii=False).encode()
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+    tmpPath = path + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(tmpPath, 'wb') as f:
+            f.write(MAGIC + np.uint64(len(header)).tobytes() + header)
+            for buffer in buffers:
+                f.write(buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+def readColumns(path):
+    """
+    Reads a packet table written by writeColumns, numeric columns are views over a memory map of the file.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a pkt file: " + path)
+        headerLength = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(headerLength))
+    dataStart = len(MAGIC) + 8 + headerLength
+    rows = header["rows"]
+    fileMap = np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) > dataStart else None
+    columns = {}
+    for column in header["columns"]:
+        if column["kind"] == "string":
+            columns[column["name"]] = column["values"]
+            continue
+        dtype = np.dtype(column["dtype"])
+        start = dataStart + column["offset"]
+        values = fileMap[start:start + rows * dtype.itemsize].view(dtype) if rows else np.empty(0, dtype)
+        if column["kind"] == "category":
+            values = pd.Categorical.from_codes(
+                values, pd.Index(column["categories"], dtype=str))
+        columns[column["name"]] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+# -------------- parquet backend ---------------------------------
+
+
+def writeParquet(table, path):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "The parquet backend needs pyarrow, install it or use the pkt backend.")
+    tmpPath = path + '.' + str(os.getpid()) + '.tmp'
+    try:
+        table.to_parquet(tmpPath, index=False)
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+# -------------- Conversion of existing datasets ---------------------------------
+
+
+def convertDataset(path, backend="pkt", force=False):
+    """
+    Converts a dataset to another backend, next to the original one.
+
+    Args:
+        path ([str]): dataset path.
+        backend (str, optional): destination backend. Defaults to "pkt".
+        force (bool, optional): convert it even if the destination is up to date. Defaults to False.
+
+    Returns:
+        [str]: destination path.
+    """
+    destination = basePathOf(path) + EXTENSIONS[backend]
+    if not force and os.path.exists(destination) and os.path.getmtime(destination) >= os.path.getmtime(path):
+        return destination
+    return writeDataset(readDataset(path), destination)
+
+
+def convertScenarioRounds(datasetsPath, backend="pkt", pattern="round*", force=False):
+    """
+    Converts every JSON dataset in the round directories of datasetsPath, e.g. scenarios/datasets/round*.
+
+    Args:
+        datasetsPath ([str]): directory containing the rounds.
+        backend (str, optional): destination backend. Defaults to "pkt".
+        pattern (str, optional): glob of the round directories. Defaults to "round*".
+        force (bool, optional): convert also up to date datasets. Defaults to False.
+
+    Returns:
+        [list]: destination paths.
+    """
+    return [convertDataset(path, backend, force)
+            for path in sorted(glob.glob(os.path.join(datasetsPath, pattern, "*" + EXTENSIONS["json"])))]
+
+
+def readRound(roundPath, asPacketTable=True):
+    """
+    Reads every dataset of a round, each of them from its preferred up to date version.
+
+    Args:
+        roundPath ([str]): round directory.
+        asPacketTable (bool, optional): see readDataset. Defaults to True.
+
+    Returns:
+        [dict]: dataset name (filename without extension) to dataset.
+    """
+    names = sorted(set(os.path.basename(basePathOf(path)) for path in glob.glob(os.path.join(roundPath, "*"))
+                       if os.path.splitext(path)[1] in EXTENSIONS.values()))
+    return {name: readDataset(resolveDatasetPath(os.path.join(roundPath, name)), asPacketTable) for name in names}
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules of the repo and of the scrapers import each other by name, as when run from their directories.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in [ROOT, os.path.join(ROOT, 'scrapers')]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,45 @@
+import json
+import os
+from catalogue import ScenarioCatalogue
+
+DATASETS = ["round1/10125726-456-451-407-1.1-4-0-46-42-0.01534-i.json",
+            "round3pso/26025824-445-438-294-1.15-3-0-25-4-0.03053-m.json",
+            "round3pso/RPSO26025824-445-438-294-1.15-3-0-25-4-0.03053-m.json",
+            "18162950-454-448-369-1.06-4-0-19-106-1e-05-m.json"]
+DESCRIPTIONS = ["round1/10125726.json", "round3/26025824.json", "round3/R26025824.json", "18162950.json"]
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(content, f)
+
+
+def scenarioTree(root):
+    for name in DATASETS:
+        write(os.path.join(root, 'datasets', name), [])
+    for name in DESCRIPTIONS:
+        write(os.path.join(root, 'description', name), {"ID": os.path.basename(name)[:-5], "n_dst": 4})
+
+
+def test_refresh_joins_datasets_and_descriptions_of_every_round(tmp_path):
+    scenarioTree(str(tmp_path))
+    with ScenarioCatalogue(str(tmp_path)) as catalogue:
+        assert catalogue.refresh() == {"updated": 4, "removed": 0, "unchanged": 0}
+        rows = catalogue.query()
+        assert rows[["round", "ID"]].values.tolist() == [["", "18162950"], ["round1", "10125726"],
+                                                        ["round3", "26025824"], ["round3", "R26025824"]]
+        assert rows["dataset"].tolist() == [os.path.join('datasets', name) for name in [DATASETS[3], DATASETS[0], DATASETS[1], DATASETS[2]]]
+        assert rows["description"].notna().all()
+        assert rows["min_vol"].tolist()[0] == 1e-05
+        assert catalogue.refresh() == {"updated": 0, "removed": 0, "unchanged": 4}
+
+
+def test_refresh_removes_deleted_scenarios(tmp_path):
+    scenarioTree(str(tmp_path))
+    with ScenarioCatalogue(str(tmp_path)) as catalogue:
+        catalogue.refresh()
+        os.remove(os.path.join(str(tmp_path), 'datasets', DATASETS[0]))
+        os.remove(os.path.join(str(tmp_path), 'description', DESCRIPTIONS[0]))
+        assert catalogue.refresh() == {"updated": 0, "removed": 1, "unchanged": 3}
+        assert len(catalogue.datasetPaths(n_dst=4)) == 3
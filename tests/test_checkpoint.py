@@ -0,0 +1,55 @@
+import json
+import os
+from checkpoint import ScrapeCheckpoint
+
+
+def scrape(directory, batches):
+    checkpoint = ScrapeCheckpoint(directory)
+    checkpoint.resume(["a", "b", "c"])
+    for i, packets in enumerate(batches):
+        checkpoint.commitBatch(packets, "abc"[i], i + 1)
+    return checkpoint
+
+
+def test_compact_keeps_names_with_unicode_line_breaks(tmp_path):
+    names = ["Lamp\u2028XL", "Shelf\u2029", "Box\x85\x1c\x1d\x1e\x0b\x0c", "Chair\r\nStool"]
+    checkpoint = scrape(str(tmp_path), [[{"name": n, "subgroupId": i} for i, n in enumerate(names[:2])],
+                                        [{"name": n, "subgroupId": i + 2} for i, n in enumerate(names[2:])]])
+    assert checkpoint.compact() == len(names)
+    checkpoint.close()
+    with open(checkpoint.datasetPath) as f:
+        assert [p["name"] for p in json.load(f)] == names
+
+
+def test_resume_drops_unrecorded_packets(tmp_path):
+    checkpoint = scrape(str(tmp_path), [[{"subgroupId": 0}], [{"subgroupId": 1}]])
+    checkpoint.packetsFile.write(b'{"subgroupId": 2}\n{"subgro')
+    checkpoint.close()
+    checkpoint = ScrapeCheckpoint(str(tmp_path))
+    assert checkpoint.resume(["a", "b", "c"]) == 2
+    assert checkpoint.compact() == 2
+    checkpoint.close()
+
+
+def test_resume_never_extends_a_shorter_log(tmp_path):
+    checkpoint = scrape(str(tmp_path), [[{"subgroupId": 0}], [{"subgroupId": 1}]])
+    checkpoint.close()
+    with open(checkpoint.packetsPath, 'r+b') as f:
+        f.truncate(len(b'{"subgroupId": 0}\n{"sub'))
+    checkpoint = ScrapeCheckpoint(str(tmp_path))
+    checkpoint.resume(["a", "b", "c"])
+    assert b'\x00' not in open(checkpoint.packetsPath, 'rb').read()
+    assert checkpoint.packetCount == 1
+    assert checkpoint.compact() == 1
+    checkpoint.close()
+
+
+def test_resume_with_a_missing_log(tmp_path):
+    checkpoint = scrape(str(tmp_path), [[{"subgroupId": 0}]])
+    checkpoint.close()
+    os.remove(checkpoint.packetsPath)
+    checkpoint = ScrapeCheckpoint(str(tmp_path))
+    checkpoint.resume(["a", "b", "c"])
+    assert os.path.getsize(checkpoint.packetsPath) == 0
+    assert checkpoint.compact() == 0
+    checkpoint.close()
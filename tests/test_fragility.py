@@ -0,0 +1,61 @@
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from fragility import FragilityMatcher, assignFragility, trieExpression
+
+VOCABULARY = ["Glass", "glass", "Glassware", "Lamp", "Lamps", "Mirror", "Vase", "Vases", "Box", "a.b", "(x)", "C++",
+              "Shelf", "Glas", "Lámpara", "", "Vase\n", "Mirror,"]
+
+
+def tokenLookup(data, fragileWords, where="description"):
+    # Former assignFragility, every space-separated token is looked up in the list.
+    return data.apply(lambda x: 1 if any(list(
+        map(lambda y: y in fragileWords, x[where].split(" ")))) else 0, axis=1)
+
+
+def descriptions(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    separators = np.array([" ", " ", " ", "  "], dtype=object)
+    texts = []
+    for _ in range(n):
+        tokens = rng.choice(VOCABULARY, rng.integers(0, 6))
+        text = "".join(t + s for t, s in zip(tokens, rng.choice(separators, len(tokens))))
+        texts.append(text if rng.random() < 0.5 else text.strip())
+    return pd.DataFrame({"description": texts})
+
+
+@pytest.mark.parametrize("fragileWords", [["Glass"], ["Glass", "Glassware", "Glas", "Lamp", "Lamps"],
+                                          ["a.b", "(x)", "C++", "Lámpara"], ["Vase", "Mirror"], ["Unused"]])
+def test_flags_match_the_token_lookup(fragileWords):
+    data = descriptions()
+    expected = tokenLookup(data, fragileWords).tolist()
+    assert FragilityMatcher(fragileWords).flags(data["description"]).tolist() == expected
+    assert assignFragility(data.copy(), fragileWords)["fragility"].tolist() == expected
+    assert [int(FragilityMatcher(fragileWords).matches(t)) for t in data["description"]] == expected
+
+
+def test_case_insensitive_flags_match_the_lowercase_token_lookup():
+    data = descriptions()
+    fragileWords = ["GLASS", "lamp", "Vase"]
+    expected = tokenLookup(data.assign(description=data["description"].str.lower()), [w.lower() for w in fragileWords])
+    assert assignFragility(data, fragileWords, caseSensitive=False)["fragility"].tolist() == expected.tolist()
+
+
+def test_phrases_match_consecutive_tokens():
+    matcher = FragilityMatcher(["Glass Vase", "Lamp"])
+    texts = pd.Series(["Big Glass Vase", "Glass  Vase", "Glass Vases", "Vase Glass", "Glass Vase Box", None, ""])
+    assert matcher.flags(texts).tolist() == [1, 0, 0, 0, 1, 0, 0]
+
+
+def test_trie_expression_matches_exactly_the_words():
+    words = ["Glass", "Glas", "Glassware", "Gl", "Lamp", "C++"]
+    pattern = re.compile(trieExpression(words))
+    for candidate in words + ["G", "Glasswar", "Glasses", "Lam", "C+", "Lamps"]:
+        assert (pattern.fullmatch(candidate) is not None) == (candidate in words)
+
+
+def test_no_words():
+    data = descriptions(10)
+    assert assignFragility(data, [])["fragility"].tolist() == [0] * 10
+    assert not FragilityMatcher([""]).matches("")
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from container import Container
+from generator import SubgroupIndex, packetFilterMask
+
+
+def reference(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    subgroupId = rng.choice([7, 3, 11, 5, 2, 13, 17, 19], size=rows)
+    # Only item subgroups have all their packets belonging to the subgroup product.
+    productId = np.where(np.isin(subgroupId, [3, 5, 13]), subgroupId, rng.integers(100, 200, size=rows))
+    data = pd.DataFrame({"subgroupId": subgroupId, "productId": productId,
+                         "width": rng.uniform(1, 120, rows), "height": rng.uniform(1, 120, rows),
+                         "length": rng.uniform(1, 120, rows), "weight": rng.uniform(0.01, 50, rows),
+                         "f_or": [[1, 2, 3, 4, 5, 6]] * rows, "id": np.arange(rows)})
+    return data.assign(volume=data["width"] * data["height"] * data["length"] / 1e6)
+
+
+def naiveIndex(data, rowMask=None):
+    # Aggregates scanning the whole dataset, in the order pd.factorize gives to the subgroups.
+    ids = pd.factorize(data["subgroupId"])[1]
+    indexed = data if rowMask is None else data[rowMask]
+    groups = indexed.groupby("subgroupId")
+    return (groups.size().reindex(ids, fill_value=0).to_numpy(), groups["volume"].sum().reindex(ids, fill_value=0).to_numpy(),
+            groups["weight"].sum().reindex(ids, fill_value=0).to_numpy(),
+            (indexed["subgroupId"] == indexed["productId"]).groupby(indexed["subgroupId"]).all()
+            .reindex(ids, fill_value=True).to_numpy())
+
+
+def test_aggregates_match_a_scan_of_the_dataset():
+    data = reference()
+    index = SubgroupIndex(data)
+    itemCount, volume, weight, onlyItem = naiveIndex(data)
+    assert len(index) == 8
+    assert index.itemCount.tolist() == itemCount.tolist()
+    assert np.allclose(index.volume, volume) and np.allclose(index.weight, weight)
+    assert index.onlyItem.tolist() == onlyItem.tolist()
+    assert index.available().tolist() == list(range(8))
+
+
+def test_gather_matches_selecting_the_subgroups():
+    data = reference()
+    index = SubgroupIndex(data)
+    selected = [5, 0, 3]
+    partition = index.gather(selected)
+    expected = data[data["subgroupId"].isin(index.subgroupIds[selected])].drop(columns=["id"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(partition, expected.assign(id=expected.index))
+    assert len(index.gather([])) == 0
+
+
+def test_gather_assigns_the_values_of_each_subgroup():
+    data = reference()
+    index = SubgroupIndex(data)
+    dstCode = np.arange(len(index)) * 10
+    partition = index.gather([1, 2], {"dstCode": dstCode})
+    codes = pd.Index(index.subgroupIds).get_indexer(partition["subgroupId"])
+    assert partition["dstCode"].tolist() == (codes * 10).tolist()
+
+
+def test_filtered_indexes_keep_the_subgroup_positions():
+    data = reference()
+    index = SubgroupIndex(data)
+    container = Container("test", 100, 100, 100, 30)
+    filtered = index.filtered(container=container)
+    assert index.filtered(container=container) is filtered
+    rowMask = packetFilterMask(data) & (data[["width", "height", "length"]].max(axis=1) <= 100).to_numpy() & \
+        (data["weight"] <= 30).to_numpy()
+    itemCount, volume, _, _ = naiveIndex(data, rowMask)
+    assert filtered.itemCount.tolist() == itemCount.tolist() and np.allclose(filtered.volume, volume)
+    assert (filtered.subgroupIds == index.subgroupIds).all()
+    partition = filtered.gather(filtered.available())
+    pd.testing.assert_frame_equal(partition.drop(columns=["id"]), data[rowMask].drop(columns=["id"]).reset_index(drop=True))
@@ -0,0 +1,46 @@
+from linkIndex import LinkIndex
+
+
+def packet(subgroupId):
+    return {"subgroupId": subgroupId, "productId": subgroupId}
+
+
+def test_positions_of_repeated_links_are_the_first_ones(tmp_path):
+    links = ["a", "b", "a", "c", "b"]
+    index = LinkIndex(str(tmp_path), links)
+    assert all(index.position(link) == links.index(link) for link in links)
+    assert index.position("d") is None and "d" not in index and len(index) == 3
+
+
+def test_subgroups_belong_to_the_first_link(tmp_path):
+    index = LinkIndex(str(tmp_path), ["a", "b"])
+    assert index.newPackets("a", [packet(1), None, packet(2), packet(1)]) == [packet(1), packet(2), packet(1)]
+    assert index.newPackets("b", [packet(2), packet(3)]) == [packet(3)]
+    # The owner link keeps its subgroups when it is scraped again.
+    assert index.newPackets("a", [packet(2), packet(3)]) == [packet(2)]
+
+
+def test_redirected_links(tmp_path):
+    index = LinkIndex(str(tmp_path), ["a", "b", "c"])
+    parsedSlice = [("a", "a", None, None, {}), ("b", "c", None, None, {}), ("c", "section", None, None, {}),
+                   ("d", None, None, Exception(), {})]
+    assert index.redirected(parsedSlice) == {"c"}
+    assert index.currentLinks() == ["a", "b"]
+
+
+def test_load_drops_the_entries_of_unrecorded_batches(tmp_path):
+    index = LinkIndex(str(tmp_path), ["a", "b", "c"])
+    for batch, link in enumerate(["a", "b", "c"], 1):
+        index.newPackets(link, [packet(batch)])
+        index.redirected([(link, link + "-section", None, None, {})])
+        index.commit(batch)
+    with open(index.path, 'a') as f:
+        f.write('{"batch": 4, "subgro')
+
+    index = LinkIndex(str(tmp_path), ["a", "b", "c"])
+    index.load(2)
+    assert index.outdated == {"a", "b"} and index.currentLinks() == ["c"]
+    # Subgroup 3 was given by the unrecorded batch, it has no owner.
+    assert index.newPackets("a", [packet(2), packet(3)]) == [packet(3)]
+    with open(index.path) as f:
+        assert [line.startswith('{"batch": %d' % b) for b, line in enumerate(f, 1)] == [True, True]
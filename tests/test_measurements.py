@@ -0,0 +1,68 @@
+import json
+import os
+import numpy as np
+import pytest
+from measurements import parseMeasurements, normalizeMeasurements, normalizePages, appendRejected, REJECTED_FILENAME
+
+
+def packet(width="10 cm", height="20 cm", length="30 cm", weight="2 kg", **fields):
+    return dict({"productId": 1, "subgroupId": 1, "width": width, "height": height, "length": length,
+                 "weight": weight, "rounded": 0}, **fields)
+
+
+def records(rejected):
+    # Missing values are NaN or None depending on the pandas version.
+    return rejected.astype(object).where(rejected.notna(), None).values.tolist()
+
+
+@pytest.mark.parametrize("raw, expected", [("12,5 cm", 12.5), ("1 m", 100), ("300 mm", 30), ("4400.3 cm", 4400.3),
+                                           (" 7 CM ", 7), ("15", 15), (15.5, 15.5), ("1.234,5 cm", 1234.5),
+                                           ("1,234.5 cm", 1234.5)])
+def test_lengths(raw, expected):
+    parsed, rejected = parseMeasurements([packet(length=raw)])
+    assert parsed["length"].dtype == np.float32
+    assert parsed["length"][0] == np.float32(expected) and rejected.empty
+
+
+@pytest.mark.parametrize("raw, expected", [("800 g", 0.8), ("1.234,5 g", 1.2345), ("2 Kg.", 2), ("250 gr", 0.25),
+                                           ("3", 3)])
+def test_weights(raw, expected):
+    parsed, rejected = parseMeasurements([packet(weight=raw)])
+    assert parsed["weight"][0] == np.float32(expected) and rejected.empty
+
+
+def test_rejection_reasons():
+    packets = [packet(width=None), packet(height="  "), packet(length="abc cm"), packet(weight="3 lb"),
+               packet(width="0 cm"), packet(width="1 cm", height="1 cm", length="1 cm")]
+    parsed, rejected = parseMeasurements(packets)
+    assert records(rejected) == [[0, "width", None, "missing"], [1, "height", "  ", "missing"],
+                                 [2, "length", "abc cm", "not a number"], [3, "weight", "3 lb", "unknown unit"],
+                                 [4, "width", "0 cm", "not positive"], [5, "width", "1 cm", "placeholder"]]
+    assert np.isnan(parsed["width"][0]) and parsed["length"][5] == 1
+
+
+def test_rounded_packets_need_a_diameter():
+    parsed, rejected = parseMeasurements([packet(width=None, height=None, diameter="40 cm", rounded=1),
+                                          packet(width=None, height=None, rounded=1)])
+    assert parsed["diameter"][0] == 40
+    assert records(rejected) == [[1, "diameter", None, "missing"]]
+
+
+def test_normalized_packets():
+    normalized, report = normalizeMeasurements([packet(width="12,3 cm", weight="800 g"), None,
+                                                packet(weight="heavy", productId=2, subgroupId=3)])
+    assert normalized == [packet(width=12.3, height=20.0, length=30.0, weight=0.8), None]
+    assert report == [{"productId": 2, "subgroupId": 3, "field": "weight", "value": "heavy", "reason": "not a number"}]
+    # Already parsed packets come back unchanged.
+    assert normalizeMeasurements(normalized[:1])[0] == normalized[:1]
+    assert normalizeMeasurements([None]) == ([], [])
+
+
+def test_pages_keep_their_valid_packets(tmp_path):
+    pages, report = normalizePages([[packet(), None, packet(weight="-")], [], [packet(length="5 m")]])
+    assert pages == [[packet(width=10.0, height=20.0, length=30.0, weight=2.0)], [],
+                     [packet(width=10.0, height=20.0, length=500.0, weight=2.0)]]
+    appendRejected(str(tmp_path), report, 3)
+    appendRejected(str(tmp_path), [], 4)
+    with open(os.path.join(str(tmp_path), REJECTED_FILENAME)) as f:
+        assert [json.loads(line) for line in f] == [dict(report[0], batch=3)]
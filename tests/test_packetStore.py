@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from packetStore import feasibleOrientationsToMask, maskToFeasibleOrientations, toPacketTable, fromPacketTable
+
+
+def packets():
+    return pd.DataFrame({"width": [10.5, 20.0, 30.25], "height": [5.0, 40.0, 1.5], "length": [7.0, 3.0, 80.0],
+                         "dstCode": [1, 200, 3], "priority": [0, 1, 300], "ADR": [0, 1, 0], "id": [0, 1, 2**40],
+                         "f_or": [[1, 2], [], [1, 2, 3, 4, 5, 6]], "name": ["a", "b", "a"]})
+
+
+def test_masks_match_the_orientation_bits():
+    orientations = [[1], [6, 2], [], (3, 4, 5), [1, 2, 3, 4, 5, 6]]
+    expected = [sum(1 << (o - 1) for o in os) for os in orientations]
+    assert feasibleOrientationsToMask(orientations).tolist() == expected
+    assert maskToFeasibleOrientations(expected) == [sorted(os) for os in orientations]
+    assert feasibleOrientationsToMask([]).tolist() == []
+
+
+def test_small_integers_keep_their_values():
+    table = toPacketTable(packets())
+    assert table["ADR"].dtype == np.int8
+    assert table["dstCode"].dtype == np.int16 and table["priority"].dtype == np.int16
+    assert table["id"].dtype == np.int64
+
+
+def test_round_trip():
+    data = packets()
+    pd.testing.assert_frame_equal(fromPacketTable(toPacketTable(data)), data)
+    # The legacy tuple column is dropped, the dimension columns give the same grouping.
+    withTuples = data.assign(dimensionUnique=[(10.5, 7.0, 5.0), (40.0, 20.0, 3.0), (80.0, 30.25, 1.5)])
+    pd.testing.assert_frame_equal(fromPacketTable(toPacketTable(withTuples)), data)
@@ -0,0 +1,50 @@
+from checkpoint import ScrapeCheckpoint
+from responseCache import ResponseCache, refreshCatalogue
+
+
+def packet(subgroupId, weight="2 kg"):
+    return {"productId": subgroupId, "subgroupId": subgroupId, "width": "10 cm", "height": "20 cm",
+            "length": "30 cm", "weight": weight, "rounded": 0}
+
+
+class ScriptedPipeline:
+    """
+    Scrape pipeline answering each link with the given (payload hash, packets), see ScrapePipeline.run.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def run(self, links, requestOptions=None, parseContext=None):
+        for link in links:
+            yield link, link, self.pages[link], None, {}
+
+
+def refresh(directory, links, pages):
+    checkpoint = ScrapeCheckpoint(directory)
+    checkpoint.resume(links)
+    delta = refreshCatalogue(links, ResponseCache(directory), ScriptedPipeline(pages), checkpoint)
+    checkpoint.close()
+    return delta
+
+
+def test_refresh_replaces_subgroups_of_rejected_packets(tmp_path):
+    links = ["a", "b", "c"]
+    refresh(str(tmp_path), links, {"a": ("a1", [packet(1)]), "b": ("b1", [packet(2)]), "c": ("c1", [packet(3)])})
+    delta = refresh(str(tmp_path), links, {"a": ("a2", [packet(1, weight="heavy")]), "b": ("b2", [packet(4)]),
+                                           "c": ("c1", None)})
+    assert delta["changed"] == 2 and delta["rejected"] == 1
+    # Page a lost its only packet and page b moved it to another subgroup, both old subgroups go away.
+    assert delta["replacedSubgroups"] == [1, 2, 4]
+    assert [p["subgroupId"] for p in delta["packets"]] == [4]
+
+
+def test_refresh_replaces_subgroups_published_before_an_interrupted_refresh(tmp_path):
+    links = ["a"]
+    refresh(str(tmp_path), links, {"a": ("a1", [packet(1)])})
+    cache = ResponseCache(str(tmp_path))
+    # An interrupted refresh recorded the new packets but did not publish them.
+    cache.record("a", {}, "a2", [packet(2)])
+    cache.commit()
+    delta = refresh(str(tmp_path), links, {"a": ("a2", None)})
+    assert delta["replacedSubgroups"] == [1, 2]
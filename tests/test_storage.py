@@ -0,0 +1,139 @@
+import json
+import os
+import pandas as pd
+import pytest
+import storage
+from storage import writeDataset, readDataset, resolveDatasetPath, writeJsonAtomic, iterJsonRecords, JsonRecordsWriter, \
+    DatasetCache, datasetCache, readCachedDataset
+
+
+def packets(rows=5):
+    return pd.DataFrame({"name": ["Lamp XL", "Shelf", "Lamp XL", "Chair", "Box"][:rows],
+                         "productId": [10, 11, 12, 13, 14][:rows], "subgroupId": [10, 11, 11, 13, 14][:rows],
+                         "width": [10.5, 20.0, 30.25, 1.0, 2.0][:rows], "height": [5.0, 40.0, 1.5, 1.0, 2.0][:rows],
+                         "length": [7.0, 3.0, 80.0, 1.0, 2.0][:rows], "weight": [0.5, 12.0, 3.25, 0.1, 0.2][:rows],
+                         "volume": [0.00037, 0.0024, 0.00363, 0.000001, 0.000008][:rows],
+                         "fragility": [1, 0, 1, 0, 0][:rows], "or": [1, 6, 2, 1, 3][:rows],
+                         "dstCode": [0, 1, 1, 2, 3][:rows], "priority": [0, 0, 1, 0, 0][:rows],
+                         "ADR": [0, 0, 0, 1, 0][:rows], "id": list(range(rows)),
+                         "f_or": [[1, 2], [1, 2, 3, 4, 5, 6], [2], [1], [3, 4]][:rows]})
+
+
+@pytest.mark.parametrize("backend", ["json", "pkt", "parquet"])
+@pytest.mark.parametrize("rows", [5, 0])
+def test_round_trip(tmp_path, backend, rows):
+    if backend == "parquet":
+        pytest.importorskip("pyarrow")
+    data = packets(rows)
+    path = writeDataset(data, str(tmp_path / "data.json"), backend)
+    assert path.endswith("." + backend)
+    # Deep copies, numeric columns of the pkt backend are memory-mapped arrays.
+    read = readDataset(path).copy()
+    if rows:
+        pd.testing.assert_frame_equal(read, data)
+    else:
+        assert len(read) == 0
+
+
+@pytest.mark.parametrize("backend", ["json", "pkt"])
+def test_packet_tables_match_across_backends(tmp_path, backend):
+    data = packets()
+    jsonTable = readDataset(writeDataset(data, str(tmp_path / "data.json")), asPacketTable=True)
+    table = readDataset(writeDataset(data, str(tmp_path / "data.json"), backend), asPacketTable=True)
+    pd.testing.assert_frame_equal(table.copy(), jsonTable)
+
+
+def test_binary_versions_older_than_the_json_are_not_preferred(tmp_path):
+    path = str(tmp_path / "data.json")
+    writeDataset(packets(), path, "pkt")
+    assert resolveDatasetPath(path).endswith(".pkt")
+    writeDataset(packets(3), path)
+    # Older by a second, whatever the timestamp resolution of the file system.
+    pktTime = os.stat(str(tmp_path / "data.pkt")).st_mtime
+    os.utime(str(tmp_path / "data.pkt"), (pktTime - 1, pktTime - 1))
+    assert resolveDatasetPath(path).endswith(".json")
+    assert len(readDataset(resolveDatasetPath(path))) == 3
+
+
+def records():
+    # Unicode, escapes, nested lists and numbers of every kind, so that records are cut anywhere by small blocks.
+    return [{"name": "Lamp XL \"big\" \\ ñ", "f_or": [1, 2, 3], "weight": 12.5 + i, "id": i, "big": 10**15 + i,
+             "exponent": 1e-05 * (i + 1), "empty": [], "none": None} for i in range(200)]
+
+
+@pytest.mark.parametrize("blockSize", [1, 7, 64, 1 << 20])
+@pytest.mark.parametrize("chunkSize", [1, 3, 1000])
+def test_streamed_records_match_json_load(tmp_path, monkeypatch, blockSize, chunkSize):
+    monkeypatch.setattr(storage, "READ_BLOCK_SIZE", blockSize)
+    path = str(tmp_path / "data.json")
+    writeJsonAtomic(records(), path)
+    chunks = list(iterJsonRecords(path, chunkSize))
+    assert all(len(c) == chunkSize for c in chunks[:-1])
+    with open(path, 'r') as f:
+        assert [r for c in chunks for r in c] == json.load(f)
+
+
+@pytest.mark.parametrize("content", ["[]", "[\n]", " [ ] "])
+def test_streamed_empty_lists(tmp_path, content):
+    path = tmp_path / "data.json"
+    path.write_text(content)
+    assert list(iterJsonRecords(str(path))) == []
+
+
+def test_records_writer_matches_write_json_atomic(tmp_path):
+    data = pd.DataFrame(records())
+    whole, chunked = str(tmp_path / "whole.json"), str(tmp_path / "chunked.json")
+    writeJsonAtomic(data.to_dict(orient="records"), whole)
+    with JsonRecordsWriter(chunked) as writer:
+        for start in range(0, len(data), 64):
+            writer.write(data.iloc[start:start + 64])
+    with open(whole, 'rb') as f, open(chunked, 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_cache_reads_a_dataset_again_when_it_changes(tmp_path):
+    cache = DatasetCache()
+    path = writeDataset(packets(), str(tmp_path / "data.json"))
+    cache.get(path)
+    assert len(cache.get(path)) == 5 and (cache.hits, cache.misses) == (1, 1)
+    # Different size.
+    writeDataset(packets(3), path)
+    assert len(cache.get(path)) == 3 and cache.misses == 2
+    # Same size, only the modification time changes.
+    writeDataset(packets(3).assign(fragility=[0, 1, 0]), path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.get(path)["fragility"].tolist() == [0, 1, 0] and cache.misses == 3
+
+
+def test_cached_frames_are_not_shared(tmp_path):
+    cache = DatasetCache()
+    path = writeDataset(packets(), str(tmp_path / "data.json"))
+    data = cache.get(path)
+    data.loc[0, "weight"] = 100.0
+    assert cache.get(path).loc[0, "weight"] == 0.5
+
+
+def test_cache_evicts_the_least_recently_read_dataset(tmp_path):
+    cache = DatasetCache(maxEntries=2)
+    paths = [writeDataset(packets(), str(tmp_path / f"data{i}.json")) for i in range(3)]
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+    assert len(cache) == 2
+    cache.get(paths[0])
+    cache.get(paths[1])
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_written_records_are_read_from_the_cache(tmp_path):
+    datasetCache.clear()
+    path = writeDataset(packets(), str(tmp_path / "data.json"), cache=True)
+    misses = datasetCache.misses
+    pd.testing.assert_frame_equal(readCachedDataset(path), readDataset(path))
+    assert datasetCache.misses == misses
+    # Rewritten without caching, the stale records are dropped.
+    writeDataset(packets(3), path)
+    assert len(readCachedDataset(path)) == 3 and datasetCache.misses == misses + 1
+    datasetCache.clear()